@@ -0,0 +1,79 @@
+"""
+Stress benchmark: submit transactions from many threads while blocks are
+mined and predictions run concurrently, then check that every submitted
+transaction ended up in exactly one block.
+
+    python -m benchmarks.stress_mempool --threads 8 --per-thread 500
+"""
+import argparse
+import threading
+import time
+
+from src.blockchain import Blockchain
+from src.transaction import Transaction
+
+
+def run(threads=8, per_thread=500, difficulty=3):
+    blockchain = Blockchain(difficulty=difficulty)
+    submitted = threading.Event()
+    errors = []
+
+    def submit(worker):
+        try:
+            for i in range(per_thread):
+                if i % 5 == 0:
+                    blockchain.add_flower_data(f"worker_{worker}", [5.1, 3.5, 1.4, 0.2], "setosa")
+                else:
+                    blockchain.add_transaction(Transaction(f"worker_{worker}", f"seq_{i}", 1))
+        except Exception as e:
+            errors.append(e)
+
+    def mine():
+        while not submitted.is_set() or blockchain.pending_transaction_count():
+            blockchain.add_block(blockchain.last_block)
+
+    def predict():
+        while not submitted.is_set():
+            blockchain.predict_flower_type([6.0, 2.9, 4.5, 1.5])
+
+    started = time.perf_counter()
+    background = [threading.Thread(target=mine), threading.Thread(target=predict)]
+    submitters = [threading.Thread(target=submit, args=(w,)) for w in range(threads)]
+    for t in background + submitters:
+        t.start()
+    for t in submitters:
+        t.join()
+    submitted.set()
+    for t in background:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    mined = [
+        (tx['sender'], tx['recipient'], tx['timestamp'])
+        for block in blockchain.chain for tx in block.transactions
+    ]
+    expected = threads * per_thread
+    return {
+        'submitted': expected,
+        'mined': len(mined),
+        'unique': len(set(mined)),
+        'blocks': len(blockchain.chain),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'tx_per_second': expected / elapsed,
+        'valid': blockchain.validate_chain(full=True),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--per-thread', type=int, default=500)
+    parser.add_argument('--difficulty', type=int, default=3)
+    args = parser.parse_args()
+
+    result = run(args.threads, args.per_thread, args.difficulty)
+    for key, value in result.items():
+        print(f"{key:>14}: {value}")
+    if result['mined'] != result['submitted'] or result['unique'] != result['submitted']:
+        raise SystemExit("Transactions were lost or duplicated")
@@ -0,0 +1,179 @@
+import threading
+
+from .transaction import COINBASE_SENDER, TransactionType
+
+
+class AccountState:
+    """
+    Account index: address -> (balance, nonce)
+    
+    Kept up to date one block at a time, so balance lookups and overspend
+    checks are O(1) instead of a scan of the chain. Amounts committed by
+    pending (not yet mined) transfers are tracked separately, so the pool
+    cannot be used to spend the same funds twice.
+    """
+    
+    def __init__(self, accounts=None, height=-1, block_hash=None):
+        self._accounts = {
+            address: [balance, nonce] for address, (balance, nonce) in (accounts or {}).items()
+        }
+        self._pending = {}
+        self._reservations = {}
+        self.height = height
+        self.block_hash = block_hash
+        self._lock = threading.Lock()
+        
+    def balance(self, address):
+        account = self._accounts.get(address)
+        return account[0] if account else 0
+        
+    def nonce(self, address):
+        account = self._accounts.get(address)
+        return account[1] if account else 0
+        
+    def pending(self, address):
+        """Amount committed by the address's pending transfers"""
+        return self._pending.get(address, 0)
+        
+    def available(self, address):
+        """Confirmed balance minus what pending transfers will spend"""
+        return self.balance(address) - self.pending(address)
+        
+    def can_spend(self, address, amount):
+        return address == COINBASE_SENDER or self.available(address) >= amount
+        
+    def reserve(self, tx_id, address, amount, enforce=True):
+        """
+        Commit part of a balance to a pending transfer
+        
+        Returns:
+            bool: False (and nothing reserved) if enforce is set and the
+                available balance does not cover the amount
+        """
+        with self._lock:
+            if tx_id in self._reservations:
+                return True
+            if enforce and not self.can_spend(address, amount):
+                return False
+            self._reservations[tx_id] = (address, amount)
+            self._pending[address] = self._pending.get(address, 0) + amount
+            return True
+            
+    def release(self, tx_id):
+        """Drop the reservation of a transfer once it is mined or discarded"""
+        with self._lock:
+            reservation = self._reservations.pop(tx_id, None)
+            if reservation is None:
+                return
+            address, amount = reservation
+            remaining = self._pending.get(address, 0) - amount
+            if remaining > 0:
+                self._pending[address] = remaining
+            else:
+                self._pending.pop(address, None)
+                
+    def adopt_reservations(self, other):
+        """Carry over the pending-transfer reservations of another index"""
+        with self._lock:
+            self._pending = dict(other._pending)
+            self._reservations = dict(other._reservations)
+            
+    def find_overdraft(self, transactions):
+        """
+        Position of the first transfer its sender cannot cover, or None
+        
+        The transactions are applied in order to a scratch copy of the
+        confirmed balances, as apply_block would apply them, so funds
+        received earlier in the same block can be spent later in it.
+        Pending reservations are not taken into account.
+        """
+        miner = next(
+            (tx['recipient'] for tx in transactions if tx.get('sender') == COINBASE_SENDER),
+            None
+        )
+        changes = {}
+        for position, tx in enumerate(transactions):
+            if tx.get('type') != TransactionType.TRANSFER.value:
+                continue
+            amount = tx.get('amount', 0)
+            fee = tx.get('fee', 0)
+            sender = tx['sender']
+            if sender != COINBASE_SENDER:
+                if self.balance(sender) + changes.get(sender, 0) < amount + fee:
+                    return position
+                changes[sender] = changes.get(sender, 0) - (amount + fee)
+            changes[tx['recipient']] = changes.get(tx['recipient'], 0) + amount
+            if fee and miner is not None:
+                changes[miner] = changes.get(miner, 0) + fee
+        return None
+        
+    def apply_block(self, block):
+        """
+        Apply the transfers in a block to the index
+        
+        Returns:
+            dict: address -> (balance change, nonce change), which
+                revert() accepts to undo the block
+        """
+        deltas = {}
+        
+        def adjust(address, amount, nonce=0):
+            balance_delta, nonce_delta = deltas.get(address, (0, 0))
+            deltas[address] = (balance_delta + amount, nonce_delta + nonce)
+            
+        # Fees go to whoever the block's coinbase pays, if anyone
+        miner = next(
+            (tx['recipient'] for tx in block.transactions if tx.get('sender') == COINBASE_SENDER),
+            None
+        )
+        for tx in block.transactions:
+            if tx.get('type') != TransactionType.TRANSFER.value:
+                continue
+            amount = tx.get('amount', 0)
+            fee = tx.get('fee', 0)
+            if tx['sender'] != COINBASE_SENDER:
+                adjust(tx['sender'], -(amount + fee), 1)
+            adjust(tx['recipient'], amount)
+            if fee and miner is not None:
+                adjust(miner, fee)
+                
+        with self._lock:
+            self._apply_deltas(deltas, 1)
+            self.height = block.index
+            self.block_hash = block.hash
+        return deltas
+        
+    def revert(self, deltas, height, block_hash):
+        """Undo apply_block, leaving the index at the given parent block"""
+        with self._lock:
+            self._apply_deltas(deltas, -1)
+            self.height = height
+            self.block_hash = block_hash
+            
+    def _apply_deltas(self, deltas, sign):
+        for address, (balance_delta, nonce_delta) in deltas.items():
+            account = self._accounts.setdefault(address, [0, 0])
+            account[0] += sign * balance_delta
+            account[1] += sign * nonce_delta
+            if account == [0, 0]:
+                del self._accounts[address]
+                
+    def __len__(self):
+        return len(self._accounts)
+        
+    def snapshot(self):
+        """JSON-serializable copy of the confirmed state"""
+        with self._lock:
+            return {
+                'height': self.height,
+                'block_hash': self.block_hash,
+                'accounts': {address: list(account) for address, account in self._accounts.items()},
+            }
+            
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(
+            accounts=snapshot['accounts'],
+            height=snapshot['height'],
+            block_hash=snapshot['block_hash']
+        )
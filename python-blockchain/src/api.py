@@ -1,7 +1,15 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
+import json
+import os
 import uuid
 from .blockchain import Blockchain
 from .transaction import Transaction, TransactionType
+from .prediction_batcher import MicroBatcher
+from .mining_service import BackgroundMiner
+from .storage.block_store import BlockStore
+from .model_checkpoint import CheckpointManager
+from .model_evaluation import EvaluationTracker
+from .networking.node import Node
 
 # Initialize our Flask app
 app = Flask(__name__)
@@ -9,23 +17,148 @@ app = Flask(__name__)
 # Generate a globally unique address for this node
 node_identifier = str(uuid.uuid4()).replace('-', '')
 
-# Initialize the blockchain
-blockchain = Blockchain()
+# Initialize the blockchain, mining on every available core. Set
+# BLOCKCHAIN_DATA_DIR to keep the chain on disk across restarts.
+BLOCKCHAIN_DATA_DIR = os.environ.get('BLOCKCHAIN_DATA_DIR')
+block_store = BlockStore(BLOCKCHAIN_DATA_DIR) if BLOCKCHAIN_DATA_DIR else None
+# ENFORCE_BALANCES=1 rejects transfers the sender's balance cannot cover;
+# by default they are accepted and /balance can report negative balances
+ENFORCE_BALANCES = os.environ.get('ENFORCE_BALANCES', '0') == '1'
+# With a data directory the model is checkpointed every
+# MODEL_CHECKPOINT_INTERVAL blocks (0 disables) so restarts skip the replay
+MODEL_CHECKPOINT_INTERVAL = int(os.environ.get('MODEL_CHECKPOINT_INTERVAL', '100'))
+checkpoints = None
+if BLOCKCHAIN_DATA_DIR and MODEL_CHECKPOINT_INTERVAL > 0:
+    checkpoints = CheckpointManager(
+        os.path.join(BLOCKCHAIN_DATA_DIR, 'checkpoints'),
+        interval=MODEL_CHECKPOINT_INTERVAL
+    )
+# With TARGET_BLOCK_TIME (seconds) the proof-of-work target is adjusted
+# every RETARGET_INTERVAL blocks so blocks arrive at about that pace
+TARGET_BLOCK_TIME = float(os.environ.get('TARGET_BLOCK_TIME', '0')) or None
+RETARGET_INTERVAL = int(os.environ.get('RETARGET_INTERVAL', '100'))
+# REQUIRE_SIGNATURES=1 rejects transactions not signed by their sender.
+# It is off by default so plain-name senders keep working, which means
+# unsigned transfers are accepted unless their sender is shaped like a
+# wallet address: those always need a valid signature.
+REQUIRE_SIGNATURES = os.environ.get('REQUIRE_SIGNATURES', '0') == '1'
+blockchain = Blockchain(
+    mining_workers=os.cpu_count(),
+    store=block_store,
+    enforce_balances=ENFORCE_BALANCES,
+    checkpoints=checkpoints,
+    block_time=TARGET_BLOCK_TIME,
+    retarget_interval=RETARGET_INTERVAL,
+    require_signatures=REQUIRE_SIGNATURES,
+    verify_workers=os.cpu_count()
+)
+
+# Optionally merge concurrent /flower/predict calls into batched model calls
+PREDICTION_BATCH_WINDOW_MS = float(os.environ.get('PREDICTION_BATCH_WINDOW_MS', '0'))
+prediction_batcher = None
+if PREDICTION_BATCH_WINDOW_MS > 0:
+    prediction_batcher = MicroBatcher(
+        blockchain.predict_flower_types,
+        window_ms=PREDICTION_BATCH_WINDOW_MS
+    )
+
+# Blocks are mined on a background thread so requests are never held up.
+# AUTO_MINE_TRANSACTIONS / AUTO_MINE_AGE_SECONDS queue a job automatically
+# once the pending pool reaches that size or its oldest entry that age.
+AUTO_MINE_TRANSACTIONS = int(os.environ.get('AUTO_MINE_TRANSACTIONS', '0'))
+AUTO_MINE_AGE_SECONDS = float(os.environ.get('AUTO_MINE_AGE_SECONDS', '0'))
+miner = BackgroundMiner(
+    blockchain,
+    miner_address=node_identifier,
+    auto_mine_size=AUTO_MINE_TRANSACTIONS,
+    auto_mine_age=AUTO_MINE_AGE_SECONDS
+)
+
+# Evaluations are memoized per model version; EVALUATE_AFTER_BLOCK=1 also
+# re-evaluates on a background thread after each mined block
+EVALUATE_AFTER_BLOCK = os.environ.get('EVALUATE_AFTER_BLOCK', '0') == '1'
+evaluator = EvaluationTracker(blockchain, background=EVALUATE_AFTER_BLOCK)
+
+# P2P_PORT starts a gossip node next to the API; P2P_PEERS is a comma
+# separated list of host:port to stay connected to
+P2P_PORT = os.environ.get('P2P_PORT')
+P2P_PEERS = [
+    (peer.rsplit(':', 1)[0], int(peer.rsplit(':', 1)[1]))
+    for peer in os.environ.get('P2P_PEERS', '').split(',') if peer
+]
+p2p_node = None
+if P2P_PORT:
+    p2p_node = Node(
+        blockchain,
+        host=os.environ.get('P2P_HOST', '0.0.0.0'),
+        port=int(P2P_PORT),
+        node_id=node_identifier
+    )
+    p2p_node.start_in_thread(peers=P2P_PEERS)
+
+FEATURE_FIELDS = ['sepal_length', 'sepal_width', 'petal_length', 'petal_width']
+
+def _extract_features(values):
+    """Pull the four flower measurements out of a request payload"""
+    return [float(values[field]) for field in FEATURE_FIELDS]
 
 @app.route('/mine', methods=['GET'])
 def mine():
-    """Mine a new block with the current transactions"""
-    # Mine a new block
-    block = blockchain.add_block(blockchain.last_block)
+    """
+    Queue a new block to be mined with the current transactions
+    
+    Returns the job id straight away; pass ?wait=true to block until the
+    block has been forged.
+    """
+    job_id = miner.submit()
     
+    if request.args.get('wait', '').lower() in ('1', 'true', 'yes'):
+        job = miner.wait(job_id)
+        if job['status'] != 'done':
+            return jsonify(job), 500
+        block = blockchain.chain[job['block']['index']]
+        response = {
+            'message': 'New block forged',
+            'index': block.index,
+            'transactions': block.transactions,
+            'transaction_ids': block.transaction_ids(),
+            'merkle_root': block.merkle_root,
+            'hash': block.hash,
+            'previous_hash': block.previous_hash,
+        }
+        return jsonify(response), 200
+        
     response = {
-        'message': 'New block forged',
-        'index': block.index,
-        'transactions': block.transactions,
-        'hash': block.hash,
-        'previous_hash': block.previous_hash,
+        'message': 'Mining job queued',
+        'job_id': job_id,
+        'status_url': f'/mine/status/{job_id}',
     }
-    return jsonify(response), 200
+    return jsonify(response), 202
+
+@app.route('/mine/status/<job_id>', methods=['GET'])
+def mine_status(job_id):
+    """Report the status of a mining job"""
+    job = miner.status(job_id)
+    if job is None:
+        return 'Unknown mining job', 404
+    return jsonify(job), 200
+
+def _build_transfer(values):
+    """
+    Build a transfer from request values
+    
+    A signed transaction must be sent whole, as produced by
+    Transaction.to_dict, since the signature covers every field. The
+    amount and fee are checked when the transfer is validated.
+    """
+    if 'signature' in values:
+        return Transaction.from_dict(values)
+    return Transaction(
+        sender=values['sender'],
+        recipient=values['recipient'],
+        amount=values['amount'],
+        fee=values.get('fee', 0)
+    )
 
 @app.route('/transactions/new', methods=['POST'])
 def new_transaction():
@@ -36,16 +169,124 @@ def new_transaction():
     if not all(k in values for k in required):
         return 'Missing values', 400
         
-    transaction = Transaction(
-        sender=values['sender'],
-        recipient=values['recipient'],
-        amount=values['amount']
-    )
+    try:
+        transaction = _build_transfer(values)
+    except ValueError as e:
+        return str(e), 400
     
-    index = blockchain.add_transaction(transaction)
-    response = {'message': f'Transaction will be added to Block {index}'}
+    try:
+        index = blockchain.add_transaction(transaction)
+    except ValueError as e:
+        return str(e), 400
+    response = {
+        'message': f'Transaction will be added to Block {index}',
+        'transaction_id': transaction.tx_id,
+    }
     return jsonify(response), 201
 
+def _bulk_items():
+    """
+    Read the items of a bulk request
+    
+    Accepts a JSON array (or an object with an 'items' array) or, with
+    Content-Type application/x-ndjson, one JSON object per line, which is
+    parsed as it streams in. An NDJSON line that is not valid JSON only
+    rejects that item.
+    
+    Returns:
+        tuple: (items, errors), with None in place of each unreadable
+            item and the reason at the same index of errors
+    """
+    if request.mimetype == 'application/x-ndjson':
+        items, errors = [], []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+                errors.append(None)
+            except ValueError:
+                items.append(None)
+                errors.append('Invalid JSON')
+        return items, errors
+    values = request.get_json()
+    if isinstance(values, dict):
+        values = values.get('items')
+    if not isinstance(values, list):
+        raise ValueError('Expected a JSON array of items')
+    return values, [None] * len(values)
+
+def _bulk_response(rows, transactions, errors):
+    """Submit the built transactions in one batch and report per item"""
+    results = [
+        {'index': row, 'status': 'rejected', 'error': error}
+        for row, error in enumerate(errors)
+    ]
+    for row, (tx_id, error) in zip(rows, blockchain.add_transactions(transactions)):
+        if error is None:
+            results[row] = {'index': row, 'status': 'accepted', 'transaction_id': tx_id}
+        else:
+            results[row]['error'] = error
+            
+    accepted = sum(1 for result in results if result['status'] == 'accepted')
+    response = {
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'next_block': blockchain.last_block.index + 1,
+        'results': results,
+    }
+    return jsonify(response), 201 if accepted else 400
+
+@app.route('/transactions/bulk', methods=['POST'])
+def new_transactions_bulk():
+    """Add many transactions in one request (JSON array or NDJSON)"""
+    try:
+        items, errors = _bulk_items()
+    except ValueError as e:
+        return str(e), 400
+        
+    required = ['sender', 'recipient', 'amount']
+    rows, transactions = [], []
+    for row, values in enumerate(items):
+        if errors[row] is not None:
+            continue
+        if not isinstance(values, dict) or not all(k in values for k in required):
+            errors[row] = 'Missing values'
+            continue
+        try:
+            transaction = _build_transfer(values)
+        except ValueError as e:
+            errors[row] = str(e)
+            continue
+        rows.append(row)
+        transactions.append(transaction)
+    return _bulk_response(rows, transactions, errors)
+
+@app.route('/flower/add/bulk', methods=['POST'])
+def add_flower_data_bulk():
+    """Add many flower measurements in one request (JSON array or NDJSON)"""
+    try:
+        items, errors = _bulk_items()
+    except ValueError as e:
+        return str(e), 400
+        
+    required = ['sender'] + FEATURE_FIELDS + ['flower_type']
+    rows, transactions = [], []
+    for row, values in enumerate(items):
+        if errors[row] is not None:
+            continue
+        if not isinstance(values, dict) or not all(k in values for k in required):
+            errors[row] = 'Missing values'
+            continue
+        rows.append(row)
+        transactions.append(Transaction.create_flower_data_transaction(
+            values['sender'],
+            [values[field] for field in FEATURE_FIELDS],
+            values['flower_type']
+        ))
+    return _bulk_response(rows, transactions, errors)
+
 @app.route('/flower/add', methods=['POST'])
 def add_flower_data():
     """Add flower data to the blockchain"""
@@ -56,12 +297,8 @@ def add_flower_data():
     if not all(k in values for k in required):
         return 'Missing values', 400
         
-    features = [
-        float(values['sepal_length']),
-        float(values['sepal_width']),
-        float(values['petal_length']),
-        float(values['petal_width'])
-    ]
+    # Checked by the transaction's validation, as in the bulk endpoint
+    features = [values[field] for field in FEATURE_FIELDS]
     
     try:
         block_index = blockchain.add_flower_data(
@@ -78,45 +315,166 @@ def add_flower_data():
 def predict_flower():
     """Predict flower type based on features"""
     values = request.get_json()
-    required = ['sepal_length', 'sepal_width', 'petal_length', 'petal_width']
     
-    if not all(k in values for k in required):
+    if not all(k in values for k in FEATURE_FIELDS):
         return 'Missing values', 400
         
-    features = [
-        float(values['sepal_length']),
-        float(values['sepal_width']),
-        float(values['petal_length']),
-        float(values['petal_width'])
-    ]
+    features = _extract_features(values)
     
-    prediction = blockchain.predict_flower_type(features)
+    if prediction_batcher is not None:
+        prediction = prediction_batcher.predict(features)
+    else:
+        prediction = blockchain.predict_flower_type(features)
     return jsonify(prediction), 200
 
-@app.route('/chain', methods=['GET'])
-def full_chain():
-    """Return the full blockchain"""
+@app.route('/flower/predict/batch', methods=['POST'])
+def predict_flower_batch():
+    """Predict flower types for a list of samples in one model call"""
+    values = request.get_json()
+    samples = values.get('samples') if isinstance(values, dict) else values
+    
+    if not isinstance(samples, list):
+        return 'Expected a list of samples', 400
+        
+    features_list = []
+    for sample in samples:
+        try:
+            features_list.append(_extract_features(sample))
+        except (KeyError, TypeError, ValueError):
+            # Leave the row for predict_batch to reject as invalid
+            features_list.append(None)
+            
+    predictions = blockchain.predict_flower_types(features_list)
+    return jsonify({'predictions': predictions}), 200
+
+def _chain_response(serialize):
+    """
+    Serve a range of the chain selected by ?from=&limit=
+    
+    With ?format=ndjson the blocks are streamed one per line from a
+    generator instead of being collected into a single JSON document.
+    """
+    try:
+        start = int(request.args.get('from', 0))
+        limit = request.args.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return 'from and limit must be integers', 400
+    if start < 0 or (limit is not None and limit < 0):
+        return 'from and limit must not be negative', 400
+        
+    length = len(blockchain.chain)
+    stop = length if limit is None else min(start + limit, length)
+    
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            for block in blockchain.iter_blocks(start, stop):
+                yield json.dumps(serialize(block)) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
     response = {
-        'chain': [block.__dict__ for block in blockchain.chain],
-        'length': len(blockchain.chain),
+        'chain': [serialize(block) for block in blockchain.iter_blocks(start, stop)],
+        'length': length,
     }
+    if 'from' in request.args or limit is not None:
+        response['from'] = start
+        response['next'] = stop if stop < length else None
     return jsonify(response), 200
 
+@app.route('/chain', methods=['GET'])
+def full_chain():
+    """Return the blockchain, optionally paginated or streamed"""
+    return _chain_response(lambda block: block.to_dict())
+
+@app.route('/chain/headers', methods=['GET'])
+def chain_headers():
+    """Return block headers without transaction bodies"""
+    return _chain_response(lambda block: block.header_dict())
+
+@app.route('/block/<int:index>/proof/<tx_id>', methods=['GET'])
+def transaction_proof(index, tx_id):
+    """Return a Merkle inclusion proof for a transaction in a block"""
+    if not 0 <= index < len(blockchain.chain):
+        return 'Block not found', 404
+
+    proof = blockchain.chain[index].inclusion_proof(tx_id)
+    if proof is None:
+        return 'Transaction not found in block', 404
+    return jsonify(proof), 200
+
+@app.route('/balance/<address>', methods=['GET'])
+def balance(address):
+    """
+    Return the confirmed balance and nonce of an address
+    
+    Unless ENFORCE_BALANCES=1, transfers are accepted whatever the
+    sender holds, so the balance reported here can be negative.
+    """
+    return jsonify(blockchain.balance(address)), 200
+
+def _transactions_by(kind, key, tx_type=None):
+    """Serve a page of an index lookup, selected by ?offset=&limit="""
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return 'offset and limit must be integers', 400
+    if offset < 0 or not 0 < limit <= 1000:
+        return 'offset must not be negative and limit must be between 1 and 1000', 400
+    return jsonify(blockchain.find_transactions(kind, key, offset, limit, tx_type)), 200
+
+@app.route('/transactions/by-sender/<address>', methods=['GET'])
+def transactions_by_sender(address):
+    """Confirmed transactions sent by an address, optionally of one ?type="""
+    tx_type = request.args.get('type')
+    if tx_type is not None and tx_type not in [t.value for t in TransactionType]:
+        return 'Unknown transaction type', 400
+    return _transactions_by('sender', address, tx_type)
+
+@app.route('/transactions/by-recipient/<address>', methods=['GET'])
+def transactions_by_recipient(address):
+    """Confirmed transactions received by an address"""
+    return _transactions_by('recipient', address)
+
+@app.route('/transactions/by-type/<tx_type>', methods=['GET'])
+def transactions_by_type(tx_type):
+    """Confirmed transactions of one type, e.g. flower_data"""
+    if tx_type not in [t.value for t in TransactionType]:
+        return 'Unknown transaction type', 400
+    return _transactions_by('type', tx_type)
+
 @app.route('/model/info', methods=['GET'])
 def model_info():
     """Get information about the ML model"""
     response = {
         'is_trained': blockchain.ml_model.is_trained,
         'data_points': blockchain.ml_model.data_count,
-        'classes': blockchain.ml_model.classes
+        'classes': blockchain.ml_model.classes,
+        'version': blockchain.ml_model.version,
+        'prediction_cache': blockchain.ml_model.prediction_cache.stats
     }
     return jsonify(response), 200
 
 @app.route('/model/evaluate', methods=['GET'])
 def evaluate_model():
     """Evaluate the current model accuracy using test data"""
-    evaluation_results = blockchain.ml_model.evaluate_model()
+    evaluation_results = evaluator.evaluate()
     return jsonify(evaluation_results), 200
 
+@app.route('/model/evaluate/history', methods=['GET'])
+def evaluation_history():
+    """Accuracy per block height, selected by ?from=&limit="""
+    try:
+        start = int(request.args.get('from', 0))
+        limit = request.args.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return 'from and limit must be integers', 400
+    if start < 0 or (limit is not None and limit < 0):
+        return 'from and limit must not be negative', 400
+        
+    entries = evaluator.entries(start, limit)
+    return jsonify({'history': entries, 'length': len(entries)}), 200
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -1,13 +1,117 @@
+import hashlib
+
+from .consensus.difficulty import MAX_TARGET
+from .utils.merkle import MerkleTree, merkle_root
+
+
+def header_prefix(index, previous_hash, timestamp, merkle_root, target):
+    """Serialized header fields that precede the nonce"""
+    return f"{index}{previous_hash}{timestamp}{merkle_root}{target:064x}".encode()
+
+
 class Block:
-    def __init__(self, index, previous_hash, timestamp, transactions, nonce=0):
+    def __init__(self, index, previous_hash, timestamp, transactions, nonce=0, target=MAX_TARGET):
         self.index = index
         self.previous_hash = previous_hash
         self.timestamp = timestamp
         self.transactions = transactions
         self.nonce = nonce
-        self.hash = self.calculate_hash()
+        # Proof-of-work target the block hash must not exceed
+        self.target = target
+        self._merkle_tree = MerkleTree.from_transactions(transactions)
+        self._tx_positions = None
+        self.merkle_root = self._merkle_tree.root
+        self.hash = self.hash_with_nonce(self.midstate(), nonce)
+
+    def hash_prefix(self, root=None):
+        """
+        Serialized block header up to, but not including, the nonce
+
+        Transactions are committed to through the Merkle root, so the
+        header has the same size whatever the block holds.
+        """
+        root = self.merkle_root if root is None else root
+        return header_prefix(self.index, self.previous_hash, self.timestamp, root, self.target)
+
+    def midstate(self):
+        """SHA-256 state with the header prefix already absorbed"""
+        return hashlib.sha256(self.hash_prefix())
+
+    @staticmethod
+    def hash_with_nonce(midstate, nonce):
+        """Finish a copy of a header midstate with the given nonce"""
+        h = midstate.copy()
+        h.update(str(nonce).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def hash_header(header):
+        """Hash a header dict (see header_dict) without needing the transactions"""
+        prefix = header_prefix(
+            header['index'], header['previous_hash'], header['timestamp'],
+            header['merkle_root'], header['target']
+        )
+        return hashlib.sha256(prefix + str(header['nonce']).encode()).hexdigest()
 
     def calculate_hash(self):
-        import hashlib
-        block_string = f"{self.index}{self.previous_hash}{self.timestamp}{self.transactions}{self.nonce}".encode()
-        return hashlib.sha256(block_string).hexdigest()
\ No newline at end of file
+        """Hash the block from scratch, recomputing the Merkle root"""
+        prefix = self.hash_prefix(merkle_root(self.transactions))
+        return hashlib.sha256(prefix + str(self.nonce).encode()).hexdigest()
+
+    def transaction_ids(self):
+        """Ids (leaf hashes) of the block's transactions, in block order"""
+        return list(self._merkle_tree.leaves)
+
+    def inclusion_proof(self, tx_id):
+        """
+        Build a Merkle inclusion proof for one of the block's transactions
+
+        Args:
+            tx_id (str): Transaction id, i.e. its leaf hash
+
+        Returns:
+            dict: The transaction, its position and the proof path, or
+                None if the transaction is not in this block
+        """
+        if self._tx_positions is None:
+            self._tx_positions = {
+                leaf: position for position, leaf in enumerate(self._merkle_tree.leaves)
+            }
+        position = self._tx_positions.get(tx_id)
+        if position is None:
+            return None
+        return {
+            "block_index": self.index,
+            "tx_id": tx_id,
+            "position": position,
+            "transaction": self.transactions[position],
+            "merkle_root": self.merkle_root,
+            "proof": self._merkle_tree.proof(position)
+        }
+
+    def to_dict(self):
+        """Public block fields, suitable for JSON responses"""
+        return {
+            key: value for key, value in self.__dict__.items()
+            if not key.startswith('_')
+        }
+
+    def header_dict(self):
+        """Block fields without the transaction bodies"""
+        header = self.to_dict()
+        header['transaction_count'] = len(header.pop('transactions'))
+        return header
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a block from the output of to_dict"""
+        block = cls(
+            index=data['index'],
+            previous_hash=data['previous_hash'],
+            timestamp=data['timestamp'],
+            transactions=data['transactions'],
+            nonce=data['nonce'],
+            target=data['target']
+        )
+        block.hash = data['hash']
+        return block
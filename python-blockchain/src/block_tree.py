@@ -0,0 +1,105 @@
+from collections import deque, namedtuple
+
+# What connecting a main chain block changed, so it can be disconnected
+# again without replaying the chain:
+#   account_deltas  the balance/nonce changes returned by apply_block
+#   model_mark      IrisModel.mark() taken before the block's training
+#                   rows were added, or None if it added none
+UndoRecord = namedtuple('UndoRecord', ['account_deltas', 'model_mark'])
+
+# A main chain block near the tip: its hash, the cumulative work of the
+# chain up to and including it, and its undo record
+MainEntry = namedtuple('MainEntry', ['block_hash', 'work', 'undo'])
+
+# A valid block that is not on the main chain, with its cumulative work
+SideBlock = namedtuple('SideBlock', ['block', 'work'])
+
+
+class BlockTree:
+    """
+    Fork tracking around the tip of the main chain
+
+    The newest max_depth + 1 main chain blocks are kept with their
+    cumulative work and undo records; competing branches are kept as side
+    blocks whose parent is either a main chain block in that window or
+    another side block. Work is counted from an arbitrary base, which is
+    enough to compare branches that fork inside the window.
+
+    A branch whose cumulative work exceeds the tip's becomes the main
+    chain: the main blocks above the fork are disconnected with their undo
+    records and the branch connected, which costs O(k) for a reorg of
+    depth k. Forks deeper than max_depth are refused.
+    """
+
+    def __init__(self, max_depth=100):
+        self.max_depth = max_depth
+        self.height = -1
+        self._main = deque(maxlen=max_depth + 1)
+        self._side = {}
+
+    @property
+    def tip_work(self):
+        return self._main[-1].work if self._main else 0
+
+    @property
+    def lowest_height(self):
+        """Height of the oldest main chain block still in the window"""
+        return self.height - len(self._main) + 1
+
+    def push(self, block, block_work, undo):
+        """Record a block connected on top of the main chain"""
+        self._main.append(MainEntry(block.hash, self.tip_work + block_work, undo))
+        self.height = block.index
+
+    def pop(self):
+        """Forget the main chain tip; returns its MainEntry"""
+        if not self._main:
+            raise ValueError("Reorganization is deeper than the undo history")
+        self.height -= 1
+        return self._main.pop()
+
+    def can_rewind(self, height):
+        """True if every main chain block above height can be disconnected"""
+        if height < self.lowest_height:
+            return False
+        entries = list(self._main)[height - self.lowest_height + 1:]
+        return all(entry.undo is not None for entry in entries)
+
+    def main_work(self, height, block_hash):
+        """Cumulative work of a main chain block in the window, or None"""
+        if not self.lowest_height <= height <= self.height:
+            return None
+        entry = self._main[height - self.lowest_height]
+        return entry.work if entry.block_hash == block_hash else None
+
+    def __contains__(self, block_hash):
+        return block_hash in self._side
+
+    def __len__(self):
+        return len(self._side)
+
+    def side_work(self, block_hash):
+        side = self._side.get(block_hash)
+        return side.work if side is not None else None
+
+    def add_side(self, block, work):
+        self._side[block.hash] = SideBlock(block, work)
+
+    def remove_side(self, block_hash):
+        self._side.pop(block_hash, None)
+
+    def branch(self, block_hash):
+        """Side blocks from the one after the main chain up to block_hash"""
+        branch = []
+        side = self._side.get(block_hash)
+        while side is not None:
+            branch.append(side.block)
+            side = self._side.get(side.block.previous_hash)
+        branch.reverse()
+        return branch
+
+    def prune(self):
+        """Drop side blocks that fork below the window"""
+        floor = self.height - self.max_depth
+        for block_hash in [h for h, side in self._side.items() if side.block.index <= floor]:
+            del self._side[block_hash]
@@ -1,61 +1,590 @@
 import hashlib
 import time
 import json
+import threading
 from .block import Block
-from .transaction import Transaction, TransactionType
+from .transaction import Transaction, TransactionType, COINBASE_SENDER
 from .ml_model import IrisModel
 from .consensus.proof_of_work import ProofOfWork
+from .consensus.difficulty import Retargeter
+from .consensus.chain_validator import ChainValidator
+from .storage.block_store import PersistentChain
+from .mempool import Mempool
+from .account_state import AccountState
+from .transaction_index import TransactionIndex
+from .block_tree import BlockTree, SideBlock, UndoRecord
+from .signature_verifier import SignatureVerifier
+from .utils.crypto import is_key_address
+
+# Amount paid to the miner of each block by its coinbase transaction
+MINING_REWARD = 1
+
+# Fixed so that every node starts from the same genesis block
+GENESIS_TIMESTAMP = 0
 
 class Blockchain:
-    def __init__(self):
-        self.chain = []
-        self.current_transactions = []
+    def __init__(self, difficulty=4, mining_workers=1, store=None, mempool=None,
+                 enforce_balances=False, checkpoints=None, max_reorg_depth=100,
+                 block_time=None, retarget_interval=100, require_signatures=False,
+                 verify_workers=1):
+        # With a BlockStore the chain lives on disk and survives restarts
+        self.store = store
+        self.chain = PersistentChain(store) if store is not None else []
         self.nodes = set()
-        self.pow = ProofOfWork(difficulty=4)
-        self.ml_model = IrisModel()
         
-        # Create the genesis block
-        self.create_genesis_block()
+        # The mempool has its own lock, so submissions keep flowing while
+        # a block is mined under the mining lock
+        self.mempool = mempool if mempool is not None else Mempool()
+        self._mining_lock = threading.RLock()
+        # Held while blocks are connected or disconnected; threads reading
+        # the chain outside the mining lock take it for a consistent view
+        self.chain_lock = threading.RLock()
+        self.pow = ProofOfWork(difficulty=difficulty, workers=mining_workers)
+        # difficulty sets the genesis target; with a block_time (seconds)
+        # the target is retargeted every retarget_interval blocks
+        self.retarget = Retargeter(block_time=block_time, interval=retarget_interval)
+        
+        # Optional CheckpointManager; the model is only built from the
+        # bundled dataset when there is no stored chain to restore
+        self.checkpoints = checkpoints
+        self.ml_model = None
+        
+        # Balances are always tracked; with enforce_balances transfers the
+        # sender cannot cover are rejected when they are submitted
+        self.accounts = AccountState()
+        self.enforce_balances = enforce_balances
+        self.tx_index = TransactionIndex()
+        
+        # Signatures are checked whenever a transaction carries one; with
+        # require_signatures unsigned transactions are rejected as well
+        self.require_signatures = require_signatures
+        self.verifier = SignatureVerifier(workers=verify_workers)
+        
+        # Competing branches and undo records of the newest blocks, so
+        # the heaviest chain can be switched to without a replay
+        self.tree = BlockTree(max_depth=max_reorg_depth)
+        
+        # Callables invoked with each block connected to the chain and
+        # with each batch of transactions accepted into the pool
+        self._block_listeners = []
+        self._transaction_listeners = []
+        
+        # Blocks up to this height (with this tip hash) are known valid
+        self._verified_height = 0
+        self._verified_hash = None
+        
+        if len(self.chain):
+            self._load_stored_chain()
+        else:
+            self.ml_model = IrisModel()
+            # Create the genesis block
+            self.create_genesis_block()
+        
+    def _load_stored_chain(self):
+        """
+        Rebuild in-memory state from blocks already in the store
+        
+        Starts from the newest checkpoint still on the chain, if any, and
+        replays only the blocks after it.
+        """
+        start = 0
+        checkpoint = None
+        if self.checkpoints is not None:
+            checkpoint = self.checkpoints.load_latest(self.chain)
+        if checkpoint is not None:
+            metadata, self.ml_model = checkpoint
+            state = metadata['state']
+            start = metadata['height'] + 1
+            if 'accounts' in state:
+                self.accounts = AccountState.from_snapshot(state['accounts'])
+            self.tx_index = self._load_tx_index(metadata, start)
+            # The checkpoint block can be forked from, but not disconnected
+            base = self.chain[start - 1]
+            self.tree.push(base, self.pow.work(base.target), None)
+        else:
+            self.ml_model = IrisModel()
+            
+        for block in self.store.iter_blocks(start):
+            self.tree.push(block, self.pow.work(block.target), self._apply_block(block))
+        # Stored blocks were validated before they were written; a full
+        # re-check is available through validate_chain(full=True)
+        self._mark_verified()
+        print(f"Loaded {len(self.chain)} blocks from {self.store.directory}")
+        
+    def _load_tx_index(self, metadata, start):
+        """
+        The transaction index of a checkpoint, rebuilt from the blocks
+        below start if the checkpoint does not have a usable one
+        """
+        section = metadata['sections'].get('tx_index')
+        if section is not None:
+            try:
+                return TransactionIndex.from_bytes(section)
+            except ValueError as e:
+                print(f"Rebuilding transaction index: {e}")
+        else:
+            # Older checkpoints kept it as JSON, possibly without every index
+            snapshot = metadata['state'].get('tx_index')
+            if snapshot is not None and set(TransactionIndex.KINDS) <= set(snapshot['indexes']):
+                return TransactionIndex.from_snapshot(snapshot)
+        tx_index = TransactionIndex()
+        for height in range(start):
+            tx_index.add_block(self.chain[height])
+        return tx_index
         
     def create_genesis_block(self):
         """Create the first block in the chain with no previous hash"""
-        genesis_block = Block(0, "0", time.time(), [], 0)
+        genesis_block = Block(0, "0", GENESIS_TIMESTAMP, [], 0, target=self.pow.target)
         genesis_block.hash = self.pow.mine(genesis_block)
-        self.chain.append(genesis_block)
+        self._connect_block(genesis_block)
+        self._mark_verified()
         return genesis_block
         
-    def add_block(self, previous_block):
-        """Mine a new block and add it to the chain"""
-        block = Block(
-            index=previous_block.index + 1,
-            previous_hash=previous_block.hash,
-            timestamp=time.time(),
-            transactions=self.current_transactions,
-            nonce=0
-        )
+    def add_block(self, previous_block, miner_address=None):
+        """
+        Mine a new block and add it to the chain
+        
+        If miner_address is given, the block starts with a coinbase
+        transaction paying it MINING_REWARD; the block's fees are credited
+        to the same address when the block is applied.
+        
+        Raises:
+            ValueError: If previous_block is no longer the tip, e.g. because
+                another block was connected after the caller read it
+        """
+        with self._mining_lock:
+            if previous_block.hash != self.last_block.hash:
+                raise ValueError("Previous block is not the chain tip")
+            # Take the best pending transactions that fit in a block
+            transactions = self.mempool.select()
+            if self.enforce_balances:
+                transactions = self._drop_overdrafts(transactions)
+            pooled = list(transactions)
+            if miner_address:
+                coinbase = Transaction.create_coinbase_transaction(miner_address, MINING_REWARD)
+                transactions = [coinbase.to_dict()] + transactions
+            
+            block = Block(
+                index=previous_block.index + 1,
+                previous_hash=previous_block.hash,
+                timestamp=time.time(),
+                transactions=transactions,
+                nonce=0,
+                target=self.next_target(previous_block)
+            )
+            
+            # Find the proof of work for this block and connect it
+            try:
+                block.hash = self.pow.mine(block)
+                self._connect_block(block)
+            except BaseException:
+                # Put the transactions back in the pool
+                self.mempool.restore(pooled)
+                raise
+            return block
         
-        # Find the proof of work for this block
-        block.hash = self.pow.mine(block)
+    def _drop_overdrafts(self, transactions):
+        """
+        Discard selected transfers the confirmed balances no longer cover
         
+        Reservations keep the pool funded, but transfers restored by a
+        reorganization are reserved without a check and could make the
+        block invalid.
+        """
+        while True:
+            position = self.accounts.find_overdraft(transactions)
+            if position is None:
+                return transactions
+            tx_id = Mempool.transaction_id(transactions.pop(position))
+            self.accounts.release(tx_id)
+            print(f"Dropped transfer {tx_id[:16]}: insufficient balance")
+            
+    def _check_chain_state(self, block):
+        """
+        Return why the block cannot follow the current tip, or None
+        
+        Its transfers must not be confirmed already (or repeated in the
+        block), and with enforce_balances it must not overspend an account.
+        """
+        tx_ids = [Mempool.transaction_id(tx) for tx in block.transactions
+                  if tx.get('sender') != COINBASE_SENDER]
+        if len(set(tx_ids)) != len(tx_ids) or any(self.tx_index.contains(tx_id) for tx_id in tx_ids):
+            return "Transaction already confirmed"
+        if self.enforce_balances and self.accounts.find_overdraft(block.transactions) is not None:
+            return "Insufficient balance"
+        return None
+        
+    def _apply_block(self, block):
+        """
+        Apply a block's effects to the model and indexes; returns its UndoRecord
+        
+        Either every effect is applied or, if one step raises, none is.
+        """
         # Process any ML transactions in this block
-        self._process_ml_transactions(block.transactions)
+        model_mark = self._process_ml_transactions(block.transactions)
+        try:
+            deltas = self.accounts.apply_block(block)
+        except BaseException:
+            if model_mark is not None:
+                self.ml_model.rollback(model_mark)
+            raise
+        self.tx_index.add_block(block)
+        return UndoRecord(deltas, model_mark)
+        
+    def _connect_block(self, block):
+        """Append a mined block to the chain and apply its effects"""
+        undo = self._apply_block(block)
+        for tx in block.transactions:
+            self.accounts.release(Mempool.transaction_id(tx))
+        with self.chain_lock:
+            self.chain.append(block)
+            self.tree.push(block, self.pow.work(block.target), undo)
+            self.tree.prune()
+        
+        if self.checkpoints is not None and self.checkpoints.should_checkpoint(block.index):
+            self.save_checkpoint()
+        for listener in list(self._block_listeners):
+            try:
+                listener(block)
+            except Exception as e:
+                print(f"Block listener failed: {e}")
+                
+    def add_block_listener(self, listener):
+        """
+        Call listener(block) after each block is connected
+        
+        Listeners run on the connecting thread while the chain is locked
+        for mining, so they should only hand work off.
+        """
+        self._block_listeners.append(listener)
+        
+    def remove_block_listener(self, listener):
+        self._block_listeners.remove(listener)
+        
+    def add_transaction_listener(self, listener):
+        """Call listener(tx_dicts) with each batch of newly pooled transactions"""
+        self._transaction_listeners.append(listener)
+        
+    def remove_transaction_listener(self, listener):
+        self._transaction_listeners.remove(listener)
+        
+    def add_external_block(self, block):
+        """
+        Validate a block mined elsewhere and add it to the block tree
+        
+        A block extending the tip is connected. A block on a competing
+        branch is kept aside, and if its branch now has more cumulative
+        work than the main chain the chain is reorganized onto it.
+        Transactions in connected blocks are dropped from the pool.
+        
+        Returns:
+            bool: True if the block is now on the main chain, False if it
+                was already known or its branch is not the heaviest
+        
+        Raises:
+            ValueError: If the block is invalid, its parent is unknown or
+                it forks below the reorganization window
+        """
+        with self._mining_lock:
+            if block.index < len(self.chain) and self.chain[block.index].hash == block.hash:
+                return False
+            if block.hash in self.tree:
+                return False
+            parent_work = self._parent_work(block)
+            if block.target != self.next_target(self._parent(block)):
+                raise ValueError("Unexpected proof-of-work target")
+            if not self.pow.validate(block):
+                raise ValueError("Invalid proof of work")
+            error = self._check_block_transactions(block)
+            if error is not None:
+                raise ValueError(error)
+                
+            if block.previous_hash == self.last_block.hash:
+                error = self._check_chain_state(block)
+                if error is not None:
+                    raise ValueError(error)
+                self._connect_external(block)
+                return True
+            work = parent_work + self.pow.work(block.target)
+            self.tree.add_side(block, work)
+            if work <= self.tree.tip_work:
+                return False
+            self._reorganize(self.tree.branch(block.hash))
+            return True
+            
+    def _parent_work(self, block):
+        """Cumulative work up to a block's parent, which must be known"""
+        height = block.index - 1
+        if 0 <= height < len(self.chain) and self.chain[height].hash == block.previous_hash:
+            work = self.tree.main_work(height, block.previous_hash)
+            if work is None:
+                raise ValueError("Block forks below the reorganization window")
+            return work
+        work = self.tree.side_work(block.previous_hash)
+        if work is None or self.tree.branch(block.previous_hash)[-1].index != height:
+            raise ValueError("Unknown parent block")
+        return work
+        
+    def _parent(self, block):
+        """A block's parent on the main chain or a side branch; it must be known"""
+        height = block.index - 1
+        if 0 <= height < len(self.chain) and self.chain[height].hash == block.previous_hash:
+            return self.chain[height]
+        return self.tree.branch(block.previous_hash)[-1]
+        
+    def next_target(self, parent):
+        """
+        Proof-of-work target of the block following parent
+        
+        parent may be on the main chain or on a side branch. At a
+        retarget height the target is adjusted by the time the preceding
+        window took on that branch; otherwise the parent's target carries
+        over.
+        """
+        height = parent.index + 1
+        start = self.retarget.window_start(height)
+        if start is None:
+            return parent.target
+        first = self._ancestor(parent, start)
+        return self.retarget.adjust(parent.target, parent.timestamp - first.timestamp)
+        
+    def _ancestor(self, block, height):
+        """Block at height on the branch ending with block"""
+        if height == block.index:
+            return block
+        branch = self.tree.branch(block.hash)
+        if branch and height >= branch[0].index:
+            return branch[height - branch[0].index]
+        return self.chain[height]
+        
+    def _connect_external(self, block):
+        self._connect_block(block)
+        self.mempool.remove(Mempool.transaction_id(tx) for tx in block.transactions)
+        
+    def _disconnect_tip(self):
+        """
+        Undo the tip block's effects and remove it from the chain
+        
+        Returns:
+            SideBlock: The block with its cumulative work
+        """
+        with self.chain_lock:
+            block = self.chain[-1]
+            entry = self.tree.pop()
+            self.chain.pop()
+            parent = self.chain[-1]
         
-        # Reset the current list of transactions and add block to chain
-        self.current_transactions = []
-        self.chain.append(block)
-        return block
+        self.tx_index.remove_block(block)
+        self.accounts.revert(entry.undo.account_deltas, parent.index, parent.hash)
+        if entry.undo.model_mark is not None:
+            self.ml_model.rollback(entry.undo.model_mark)
+            
+        # Its transactions are pending again
+        pending = [tx for tx in block.transactions if tx.get('sender') != COINBASE_SENDER]
+        for tx in pending:
+            if tx.get('type') == TransactionType.TRANSFER.value:
+                self.accounts.reserve(
+                    Mempool.transaction_id(tx), tx['sender'],
+                    tx.get('amount', 0) + tx.get('fee', 0), enforce=False
+                )
+        self.mempool.restore(pending)
+        return SideBlock(block, entry.work)
+        
+    def _reorganize(self, branch):
+        """Switch the main chain to a heavier branch of side blocks"""
+        fork = branch[0].index - 1
+        if self.chain[fork].hash != branch[0].previous_hash:
+            raise ValueError("Branch is not connected to the main chain")
+        if not self.tree.can_rewind(fork):
+            raise ValueError("Reorganization is deeper than the undo history")
+            
+        # Readers holding chain_lock see the chain before or after, never between
+        with self.chain_lock:
+            disconnected = []
+            while len(self.chain) - 1 > fork:
+                disconnected.append(self._disconnect_tip())
+            connected = 0
+            try:
+                # Balances and confirmed ids are only known once the parent
+                # is connected, so side blocks are checked against them here
+                for block in branch:
+                    error = self._check_chain_state(block)
+                    if error is not None:
+                        raise ValueError(f"Block {block.index}: {error}")
+                    self.tree.remove_side(block.hash)
+                    self._connect_external(block)
+                    connected += 1
+            except BaseException:
+                # Back to the old branch; the valid prefix of the new one stays aside
+                for _ in range(connected):
+                    side = self._disconnect_tip()
+                    self.tree.add_side(side.block, side.work)
+                for block in branch[connected:]:
+                    self.tree.remove_side(block.hash)
+                for side in reversed(disconnected):
+                    self._connect_external(side.block)
+                raise
+            # Keep the old branch in case it overtakes again
+            for side in disconnected:
+                self.tree.add_side(side.block, side.work)
+            
+            if self._verified_height > fork:
+                self._verified_height = fork
+                self._verified_hash = self.chain[fork].hash
+            print(f"Reorganized at height {fork}: {len(disconnected)} blocks replaced by {len(branch)}")
+            
+    def _check_block_transactions(self, block):
+        """Return why a block's transactions are invalid, or None"""
+        flower = []
+        signed = []
+        for position, tx_dict in enumerate(block.transactions):
+            try:
+                tx = Transaction.from_dict(tx_dict)
+            except ValueError as e:
+                return str(e)
+            if tx.sender == COINBASE_SENDER:
+                if (position != 0 or tx.transaction_type != TransactionType.TRANSFER
+                        or tx.amount != MINING_REWARD or not tx.validate()):
+                    return "Invalid coinbase transaction"
+            elif tx.transaction_type == TransactionType.FLOWER_DATA:
+                flower.append(tx)
+            elif not tx.validate():
+                return "Invalid transaction"
+            if tx.sender != COINBASE_SENDER:
+                if tx.is_signed:
+                    signed.append(tx)
+                elif self._signature_required(tx):
+                    return "Missing signature"
+        if not all(Transaction.validate_flower_batch(flower)):
+            return "Invalid transaction"
+        if not all(self.verifier.verify(signed)):
+            return "Invalid signature"
+        return None
+            
+    def save_checkpoint(self):
+        """Checkpoint the model and indexes at the current tip"""
+        tip = self.last_block
+        state = {'accounts': self.accounts.snapshot()}
+        # The index grows with the whole history, so it is kept out of the
+        # JSON metadata in a binary section of its own
+        sections = {'tx_index': self.tx_index.serialize()}
+        return self.checkpoints.save(self.ml_model, tip.index, tip.hash, state, sections)
         
     def add_transaction(self, transaction):
         """Add a transaction to the list of current transactions"""
         if not isinstance(transaction, Transaction):
             raise ValueError("Transaction must be a Transaction object")
             
-        if not transaction.validate():
-            raise ValueError("Invalid transaction")
-            
-        self.current_transactions.append(transaction.to_dict())
+        _, error = self.add_transactions([transaction])[0]
+        if error is not None:
+            raise ValueError(error)
         return self.last_block.index + 1
         
+    def _signature_required(self, transaction):
+        """
+        True if an unsigned transaction must be refused
+        
+        Without require_signatures plain names may still send unsigned,
+        but a sender shaped like a wallet address never can, or anyone
+        could spend from a wallet by leaving the signature off.
+        """
+        return self.require_signatures or is_key_address(transaction.sender)
+        
+    def add_transactions(self, transactions):
+        """
+        Validate and add a batch of transactions to the pool
+        
+        FLOWER_DATA transactions are validated together through
+        Transaction.validate_flower_batch, signatures are checked in one
+        SignatureVerifier batch and the accepted transactions enter the
+        mempool in one call.
+        
+        Returns:
+            list: (tx_id, error) per transaction; error is None on success
+        """
+        results = [None] * len(transactions)
+        flower_rows = []
+        account_state = self.accounts if self.enforce_balances else None
+        for i, transaction in enumerate(transactions):
+            if not isinstance(transaction, Transaction):
+                results[i] = (None, "Transaction must be a Transaction object")
+            elif transaction.sender == COINBASE_SENDER:
+                results[i] = (None, "Reserved sender address")
+            elif self.tx_index.contains(transaction.tx_id):
+                # Signed transfers would otherwise be valid again and again
+                results[i] = (None, "Transaction already confirmed")
+            elif transaction.transaction_type == TransactionType.FLOWER_DATA:
+                flower_rows.append(i)
+            elif not transaction.validate(account_state):
+                results[i] = (None, "Invalid transaction")
+                
+        flower_valid = Transaction.validate_flower_batch([transactions[i] for i in flower_rows])
+        for i, valid in zip(flower_rows, flower_valid):
+            if not valid:
+                results[i] = (None, "Invalid transaction")
+                
+        # Check the signatures of otherwise valid transactions in one batch
+        signed_rows = []
+        for i, result in enumerate(results):
+            if result is not None:
+                continue
+            if transactions[i].is_signed:
+                signed_rows.append(i)
+            elif self._signature_required(transactions[i]):
+                results[i] = (None, "Missing signature")
+        signatures_valid = self.verifier.verify([transactions[i] for i in signed_rows])
+        for i, valid in zip(signed_rows, signatures_valid):
+            if not valid:
+                results[i] = (None, "Invalid signature")
+                
+        # Commit the amounts of accepted transfers so they cannot be spent twice
+        accepted = []
+        tx_dicts = []
+        for i, result in enumerate(results):
+            if result is not None:
+                continue
+            tx = transactions[i].to_dict()
+            if tx['type'] == TransactionType.TRANSFER.value and not self.accounts.reserve(
+                tx['id'], tx['sender'], tx['amount'] + tx['fee'], enforce=self.enforce_balances
+            ):
+                results[i] = (None, "Insufficient balance")
+                continue
+            accepted.append(i)
+            tx_dicts.append(tx)
+            
+        added = self.mempool.add_many(tx_dicts)
+        pooled = []
+        for i, tx, (tx_id, error) in zip(accepted, tx_dicts, added):
+            if error is None:
+                pooled.append(tx)
+            elif error != "Duplicate transaction":
+                self.accounts.release(tx_id)
+            results[i] = (tx_id, error)
+            
+        if pooled:
+            for listener in list(self._transaction_listeners):
+                try:
+                    listener(pooled)
+                except Exception as e:
+                    print(f"Transaction listener failed: {e}")
+        return results
+        
+    @property
+    def current_transactions(self):
+        """Pending transactions, in the order they would be mined"""
+        return self.mempool.pending()
+        
+    def pending_transaction_count(self):
+        """Number of transactions waiting to be mined"""
+        return len(self.mempool)
+        
+    def pending_transaction_age(self):
+        """Seconds since the oldest pending transaction was created"""
+        oldest = self.mempool.oldest_timestamp()
+        if oldest is None:
+            return 0.0
+        return time.time() - oldest
+        
     def add_flower_data(self, sender, features, flower_type):
         """Add flower data to the blockchain"""
         transaction = Transaction.create_flower_data_transaction(
@@ -64,41 +593,192 @@ class Blockchain:
         return self.add_transaction(transaction)
         
     def _process_ml_transactions(self, transactions):
-        """Process ML transactions in a newly mined block"""
+        """
+        Process ML transactions in a newly mined block
+        
+        Returns:
+            tuple: IrisModel.mark() from before the update, or None if the
+                block has no flower data
+                
+        Raises:
+            ValueError: If a measurement is not a number; the model is
+                left untouched
+        """
+        features_list = []
+        labels = []
         for tx in transactions:
             if tx.get('type') == TransactionType.FLOWER_DATA.value:
                 # Extract flower features from transaction
                 data = tx.get('data', {})
-                features = [
-                    float(data.get("sepal_length", 0)),
-                    float(data.get("sepal_width", 0)),
-                    float(data.get("petal_length", 0)),
-                    float(data.get("petal_width", 0))
-                ]
-                flower_type = data.get("flower_type", "")
+                try:
+                    features_list.append([
+                        float(data.get("sepal_length", 0)),
+                        float(data.get("sepal_width", 0)),
+                        float(data.get("petal_length", 0)),
+                        float(data.get("petal_width", 0))
+                    ])
+                except (TypeError, ValueError, AttributeError):
+                    raise ValueError("Invalid flower data")
+                labels.append(data.get("flower_type", ""))
                 
-                # Update the ML model with this data point
-                self.ml_model.add_data_point(features, flower_type)
+        # Update the ML model once for the whole block; the mark lets the
+        # update be rolled back if the block is disconnected
+        if not features_list:
+            return None
+        mark = self.ml_model.mark()
+        self.ml_model.add_data_points(features_list, labels)
+        return mark
                 
+    def balance(self, address):
+        """
+        Balance, nonce and pending outgoing amount of an address
+        
+        Without enforce_balances transfers are not checked against the
+        sender's funds, so a balance can be negative.
+        """
+        return {
+            'address': address,
+            'balance': self.accounts.balance(address),
+            'nonce': self.accounts.nonce(address),
+            'pending': self.accounts.pending(address),
+            'height': self.accounts.height,
+        }
+        
+    def find_transactions(self, kind, key, offset=0, limit=50, tx_type=None):
+        """
+        Look up confirmed transactions by sender, recipient or type
+        
+        Sender lookups can be narrowed to one tx_type through the
+        combined sender and type index.
+        
+        Returns:
+            dict: The page of matching transactions, each with its block
+                height and position, and the total number of matches
+        """
+        if tx_type is not None:
+            if kind != 'sender':
+                raise ValueError("Only sender lookups can be filtered by type")
+            kind, key = 'sender_type', TransactionIndex.sender_type_key(key, tx_type)
+        locations, total = self.tx_index.lookup(kind, key, offset, limit)
+        transactions = [
+            {
+                'block_index': height,
+                'position': position,
+                'transaction': self.chain[height].transactions[position],
+            }
+            for height, position in locations
+        ]
+        return {'transactions': transactions, 'total': total, 'offset': offset, 'limit': limit}
+        
+    def rebuild_account_state(self, snapshot=None):
+        """
+        Rebuild the account index, optionally starting from a snapshot
+        
+        Only blocks above the snapshot's height are replayed. A snapshot
+        that does not match the chain at its height is ignored.
+        """
+        accounts = AccountState()
+        if snapshot is not None:
+            height = snapshot['height']
+            if 0 <= height < len(self.chain) and self.chain[height].hash == snapshot['block_hash']:
+                accounts = AccountState.from_snapshot(snapshot)
+        for block in self.iter_blocks(accounts.height + 1):
+            accounts.apply_block(block)
+        # Pending transfers are still in the pool; carry their reservations over
+        accounts.adopt_reservations(self.accounts)
+        self.accounts = accounts
+        return accounts
+        
     def predict_flower_type(self, features):
         """Make prediction using the blockchain's ML model"""
         return self.ml_model.predict(features)
         
-    def validate_chain(self):
-        """Validate the integrity of the blockchain"""
-        for i in range(1, len(self.chain)):
-            current = self.chain[i]
-            previous = self.chain[i-1]
-            
-            # Check hash integrity
-            if current.previous_hash != previous.hash:
-                return False
-                
-            # Verify block hash
-            if not self.pow.validate(current):
-                return False
+    def predict_flower_types(self, features_list):
+        """Make a batch of predictions using the blockchain's ML model"""
+        return self.ml_model.predict_batch(features_list)
+        
+    def validate_chain(self, full=False, workers=1):
+        """
+        Validate the integrity of the blockchain
+        
+        By default only blocks appended since the last successful
+        validation are checked, provided the block at the verified height
+        still carries the recorded hash. Pass full=True to re-check every
+        block, e.g. for an audit, and workers > 1 to spread the per-block
+        hash checks over that many processes.
+        """
+        return self.find_invalid_height(full=full, workers=workers) is None
+        
+    def find_invalid_height(self, full=True, workers=1):
+        """
+        Return the height of the first invalid block, or None if the chain
+        is valid. Arguments are as for validate_chain.
+        """
+        start = 1
+        if not full and self._verified_height < len(self.chain):
+            if self.chain[self._verified_height].hash == self._verified_hash:
+                start = self._verified_height + 1
                 
-        return True
+        validator = ChainValidator(self.pow, workers=workers, next_target=self.next_target)
+        invalid = validator.find_invalid_height(self.iter_blocks(start - 1))
+        if invalid is None:
+            self._mark_verified()
+        return invalid
+        
+    def _mark_verified(self):
+        """Record the current tip as the verified-height watermark"""
+        self._verified_height = len(self.chain) - 1
+        self._verified_hash = self.chain[-1].hash
+        
+    def iter_blocks(self, start=0, stop=None):
+        """Yield blocks in [start, stop) one at a time"""
+        stop = len(self.chain) if stop is None else min(stop, len(self.chain))
+        for height in range(max(start, 0), stop):
+            yield self.chain[height]
+        
+    def locator(self):
+        """
+        [height, hash] pairs describing the chain to a peer
+        
+        Dense near the tip and exponentially sparser towards genesis, so
+        a peer can find the last common block in O(log n) entries.
+        """
+        locator = []
+        with self.chain_lock:
+            height = len(self.chain) - 1
+            step = 1
+            while height > 0:
+                locator.append([height, self.chain[height].hash])
+                if len(locator) >= 10:
+                    step *= 2
+                height -= step
+            locator.append([0, self.chain[0].hash])
+        return locator
+        
+    def find_fork(self, locator):
+        """Height of the first locator entry on this chain, or None"""
+        with self.chain_lock:
+            for height, block_hash in locator:
+                if self.block_at(height, block_hash) is not None:
+                    return height
+        return None
+        
+    def block_at(self, height, block_hash):
+        """The main chain block at height if its hash is block_hash, else None"""
+        with self.chain_lock:
+            if 0 <= height < len(self.chain) and self.chain[height].hash == block_hash:
+                return self.chain[height]
+        return None
+        
+    def headers(self, start, limit):
+        """Header dicts of up to limit blocks from height start"""
+        with self.chain_lock:
+            return [block.header_dict() for block in self.iter_blocks(start, start + limit)]
+        
+    def chain_work(self, start=0):
+        """Total proof of work of the blocks from height start to the tip"""
+        with self.chain_lock:
+            return sum(self.pow.work(block.target) for block in self.iter_blocks(start))
         
     @property
     def last_block(self):
@@ -0,0 +1,109 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ..block import Block
+from .proof_of_work import ProofOfWork
+
+
+def _check_chunk(block_dicts):
+    """
+    Recompute hashes for a chunk of serialized blocks in a worker process
+
+    Returns:
+        int: Height of the first block failing its check, or None
+    """
+    pow = ProofOfWork()
+    for data in block_dicts:
+        # from_dict rebuilds the Merkle root from the transactions
+        block = Block.from_dict(data)
+        if not pow.check_hash(block, Block.hash_with_nonce(block.midstate(), block.nonce)):
+            return block.index
+    return None
+
+
+class ChainValidator:
+    """
+    Validates a run of blocks, optionally across a process pool
+
+    Hash linkage and, given next_target, each block's target are checked
+    in a single pass in the calling process. The expensive part,
+    recomputing each block's Merkle root and hash and checking it against
+    the block's target, is independent per block and is shipped to worker
+    processes in chunks.
+    """
+
+    def __init__(self, pow, workers=1, chunk_size=500, next_target=None):
+        self.pow = pow
+        # next_target(parent) gives the target the block after parent must carry
+        self.next_target = next_target
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def find_invalid_height(self, blocks):
+        """
+        Validate blocks against their predecessors
+
+        Args:
+            blocks (iterable): Consecutive blocks; the first one is trusted
+                and only serves as the parent of the second
+
+        Returns:
+            int: Height of the first invalid block, or None if all are valid
+        """
+        blocks = iter(blocks)
+        previous = next(blocks, None)
+        if previous is None:
+            return None
+        if self.workers <= 1:
+            return self._find_serial(previous, blocks)
+        return self._find_parallel(previous, blocks)
+
+    def _find_serial(self, previous, blocks):
+        for block in blocks:
+            if not self._linked(previous, block) or not self.pow.validate(block):
+                return block.index
+            previous = block
+        return None
+
+    def _find_parallel(self, previous, blocks):
+        broken_link = None
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            chunk = []
+            for block in blocks:
+                if not self._linked(previous, block):
+                    broken_link = block.index
+                    break
+                chunk.append(block.to_dict())
+                previous = block
+                if len(chunk) == self.chunk_size:
+                    pending.append(executor.submit(_check_chunk, chunk))
+                    chunk = []
+                    # Bound the number of serialized chunks held in memory
+                    if len(pending) >= self.workers * 2:
+                        invalid = pending.popleft().result()
+                        if invalid is not None:
+                            self._cancel(pending)
+                            return invalid
+            if chunk:
+                pending.append(executor.submit(_check_chunk, chunk))
+
+            # Chunks are in height order, so the first failure is the lowest
+            while pending:
+                invalid = pending.popleft().result()
+                if invalid is not None:
+                    self._cancel(pending)
+                    return invalid
+        return broken_link
+
+    def _linked(self, previous, block):
+        """True if block follows previous and carries the target in force"""
+        if block.previous_hash != previous.hash:
+            return False
+        return self.next_target is None or block.target == self.next_target(previous)
+
+    @staticmethod
+    def _cancel(pending):
+        for future in pending:
+            future.cancel()
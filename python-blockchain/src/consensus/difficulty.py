@@ -0,0 +1,70 @@
+# Largest possible target; every hash meets it
+MAX_TARGET = 2 ** 256 - 1
+
+# Most a single retarget may scale the target by, in either direction
+MAX_ADJUSTMENT = 4
+
+
+def difficulty_to_target(difficulty):
+    """Target met exactly by hashes starting with difficulty zero hex digits"""
+    return 16 ** (64 - difficulty) - 1
+
+
+def meets_target(block_hash, target):
+    """True if a hex block hash, read as a 256-bit number, is at most target"""
+    return int(block_hash, 16) <= target
+
+
+def target_work(target):
+    """Expected number of hashes needed to meet target"""
+    return 2 ** 256 // (target + 1)
+
+
+class Retargeter:
+    """
+    Adjusts the proof-of-work target toward a block interval
+
+    Every interval blocks the target is scaled by how long the previous
+    interval blocks took relative to interval * block_time, clamped to a
+    factor of MAX_ADJUSTMENT, and never raised above max_target. Between
+    retargets a block carries its parent's target. Without a block_time
+    the target stays at its initial value.
+    """
+
+    def __init__(self, block_time=None, interval=100, max_target=MAX_TARGET):
+        self.block_time = block_time
+        self.interval = interval
+        self.max_target = max_target
+
+    @property
+    def enabled(self):
+        return bool(self.block_time) and self.interval > 0
+
+    def window_start(self, height):
+        """
+        Height of the first block of the window timed before height, or
+        None if the target does not change at height
+
+        The genesis block has a fixed timestamp, so it never starts a window.
+        """
+        if not self.enabled or height % self.interval:
+            return None
+        start = height - 1 - self.interval
+        return start if start >= 1 else None
+
+    def adjust(self, target, timespan):
+        """
+        Scale target by an observed window timespan
+
+        Args:
+            target (int): Target in force during the window
+            timespan (float): Seconds between the window's first and last block
+
+        Returns:
+            int: The target for the next window
+        """
+        # Whole milliseconds keep the result identical on every node
+        expected = max(1, int(self.interval * self.block_time * 1000))
+        actual = int(round(timespan * 1000))
+        actual = min(max(actual, expected // MAX_ADJUSTMENT), expected * MAX_ADJUSTMENT)
+        return max(1, min(target * actual // expected, self.max_target))
@@ -0,0 +1,116 @@
+import hashlib
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared search generation, installed in every worker by _init_worker.
+# Bumping it tells workers still busy on an older search to give up.
+_generation = None
+
+# How many nonces a worker tries between checks of the cancel flag
+_CANCEL_CHECK_INTERVAL = 1024
+
+
+def _init_worker(generation):
+    global _generation
+    _generation = generation
+
+
+def _search_range(header_prefix, target, start, count, generation):
+    """
+    Try nonces in [start, start + count) for a single header
+
+    Returns:
+        tuple: (nonce, hash, attempts) on a hit, (None, None, attempts) otherwise
+    """
+    midstate = hashlib.sha256(header_prefix)
+    stop = start + count
+    nonce = start
+    while nonce < stop:
+        if _generation is not None and _generation.value != generation:
+            break
+        batch_stop = min(nonce + _CANCEL_CHECK_INTERVAL, stop)
+        for candidate in range(nonce, batch_stop):
+            h = midstate.copy()
+            h.update(str(candidate).encode())
+            if int.from_bytes(h.digest(), 'big') <= target:
+                return candidate, h.hexdigest(), candidate - start + 1
+        nonce = batch_stop
+    return None, None, nonce - start
+
+
+class ParallelMiner:
+    """Splits the nonce space of a block across a pool of worker processes"""
+
+    def __init__(self, workers=None, chunk_size=20000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.last_hashrate = 0.0
+        self.last_attempts = 0
+        self._executor = None
+        self._generation = None
+
+    def _ensure_pool(self):
+        if self._executor is None:
+            self._generation = multiprocessing.Value('q', 0, lock=False)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self._generation,)
+            )
+        return self._executor
+
+    def search(self, header_prefix, target):
+        """
+        Find the lowest nonce whose hash, as a number, is at most target
+
+        Chunks are handed out in ascending order and their results consumed
+        in the same order, so the nonce found is the one a serial search
+        would have found.
+
+        Args:
+            header_prefix (bytes): Serialized block header without the nonce
+            target (int): 256-bit proof-of-work target
+
+        Returns:
+            tuple: (nonce, hash)
+        """
+        executor = self._ensure_pool()
+        self._generation.value += 1
+        generation = self._generation.value
+
+        started = time.perf_counter()
+        attempts = 0
+        next_start = 0
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < self.workers * 2:
+                    pending.append(executor.submit(
+                        _search_range, header_prefix, target,
+                        next_start, self.chunk_size, generation
+                    ))
+                    next_start += self.chunk_size
+
+                nonce, block_hash, tried = pending.popleft().result()
+                attempts += tried
+                if nonce is not None:
+                    break
+        finally:
+            # Cancel whatever is still queued or running for this search
+            self._generation.value += 1
+            for future in pending:
+                future.cancel()
+
+        elapsed = time.perf_counter() - started
+        self.last_attempts = attempts
+        self.last_hashrate = attempts / elapsed if elapsed > 0 else 0.0
+        return nonce, block_hash
+
+    def close(self):
+        """Shut down the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,17 +1,69 @@
+import time
+
+from ..block import Block
+from .difficulty import difficulty_to_target, meets_target, target_work
+from .parallel_miner import ParallelMiner
+
+
 class ProofOfWork:
-    def __init__(self, difficulty=2):
-        self.difficulty = difficulty
-        self.prefix_str = '0' * difficulty
+    """
+    Mines and checks blocks against the 256-bit target each block carries
+
+    target is the target of the genesis block, given directly or as a
+    difficulty in leading zero hex digits; later targets are set by the
+    chain's retargeting.
+    """
+
+    def __init__(self, difficulty=2, workers=1, target=None):
+        self.target = target if target is not None else difficulty_to_target(difficulty)
+        self.workers = workers
+        self.last_hashrate = 0.0
+        self._miner = ParallelMiner(workers) if workers and workers > 1 else None
 
     def mine(self, block):
+        """Find a nonce for which the block hash meets block.target"""
+        if self._miner is not None:
+            nonce, block_hash = self._miner.search(block.hash_prefix(), block.target)
+            block.nonce = nonce
+            self.last_hashrate = self._miner.last_hashrate
+        else:
+            nonce, block_hash = self._mine_serial(block)
+        block.hash = block_hash
+        print(f"Block mined: {block_hash} with nonce: {nonce} ({self.last_hashrate:,.0f} H/s)")
+        return block_hash
+
+    def _mine_serial(self, block):
+        started = time.perf_counter()
+        midstate = block.midstate()
+        target = block.target
         nonce = 0
         while True:
-            block.nonce = nonce
-            block_hash = block.calculate_hash()
-            if block_hash.startswith(self.prefix_str):
-                print(f"Block mined: {block_hash} with nonce: {nonce}")
-                return block_hash
+            h = midstate.copy()
+            h.update(str(nonce).encode())
+            if int.from_bytes(h.digest(), 'big') <= target:
+                elapsed = time.perf_counter() - started
+                self.last_hashrate = (nonce + 1) / elapsed if elapsed > 0 else 0.0
+                block.nonce = nonce
+                return nonce, h.hexdigest()
             nonce += 1
 
     def validate(self, block):
-        return block.calculate_hash().startswith(self.prefix_str)
\ No newline at end of file
+        return self.check_hash(block, block.calculate_hash())
+
+    def check_hash(self, block, block_hash):
+        """Check a recomputed hash against the block's stored hash and target"""
+        return block_hash == block.hash and meets_target(block_hash, block.target)
+
+    def validate_header(self, header):
+        """Check the proof of work of a header dict, without its block body"""
+        block_hash = Block.hash_header(header)
+        return block_hash == header['hash'] and meets_target(block_hash, header['target'])
+
+    def work(self, target):
+        """Expected number of hashes needed to mine a block at target"""
+        return target_work(target)
+
+    def close(self):
+        """Release the mining worker pool, if any"""
+        if self._miner is not None:
+            self._miner.close()
@@ -0,0 +1,181 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+
+from .utils.merkle import hash_transaction
+
+
+class Mempool:
+    """
+    Pool of transactions waiting to be mined
+    
+    Transactions are indexed by their content-hash id, so duplicates are
+    rejected in O(1), and ordered in a heap by fee (highest first) and
+    then timestamp (oldest first). select() takes the best transactions
+    that fit the configured block limits. The pool itself is capped.
+    """
+    
+    def __init__(self, max_size=100000, max_block_transactions=1000, max_block_bytes=1000000):
+        self.max_size = max_size
+        self.max_block_transactions = max_block_transactions
+        self.max_block_bytes = max_block_bytes
+        
+        self._entries = {}
+        self._by_priority = []
+        self._by_age = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def transaction_id(tx):
+        """Id of a transaction dict, taken from it or computed from its content"""
+        return tx.get('id') or hash_transaction(tx)
+        
+    @staticmethod
+    def transaction_size(tx):
+        """Encoded size of a transaction in bytes"""
+        return len(json.dumps(tx, separators=(',', ':')).encode())
+        
+    def add(self, tx):
+        """
+        Add a transaction dict to the pool
+        
+        Returns:
+            str: The transaction id
+        
+        Raises:
+            ValueError: If the transaction is already pending or the pool is full
+        """
+        tx_id = self.transaction_id(tx)
+        with self._lock:
+            if tx_id in self._entries:
+                raise ValueError("Duplicate transaction")
+            if len(self._entries) >= self.max_size:
+                raise ValueError("Mempool full")
+            self._push(tx_id, tx)
+        return tx_id
+        
+    def add_many(self, transactions):
+        """
+        Add several transaction dicts under a single lock acquisition
+        
+        Returns:
+            list: (tx_id, error) per transaction; error is None on success
+        """
+        results = []
+        with self._lock:
+            for tx in transactions:
+                tx_id = self.transaction_id(tx)
+                if tx_id in self._entries:
+                    results.append((tx_id, "Duplicate transaction"))
+                elif len(self._entries) >= self.max_size:
+                    results.append((tx_id, "Mempool full"))
+                else:
+                    self._push(tx_id, tx)
+                    results.append((tx_id, None))
+        return results
+        
+    def _push(self, tx_id, tx):
+        sequence = next(self._sequence)
+        timestamp = tx.get('timestamp', 0)
+        self._entries[tx_id] = tx
+        heapq.heappush(self._by_priority, (-tx.get('fee', 0), timestamp, sequence, tx_id))
+        heapq.heappush(self._by_age, (timestamp, sequence, tx_id))
+        
+    def __len__(self):
+        return len(self._entries)
+        
+    def __contains__(self, tx_id):
+        return tx_id in self._entries
+        
+    def get(self, tx_id):
+        """Pending transaction dict with this id, or None"""
+        return self._entries.get(tx_id)
+        
+    def pending(self):
+        """Pending transaction dicts in priority order"""
+        with self._lock:
+            pending = {}
+            for entry in sorted(self._by_priority):
+                tx_id = entry[3]
+                if tx_id in self._entries and tx_id not in pending:
+                    pending[tx_id] = self._entries[tx_id]
+            return list(pending.values())
+            
+    def oldest_timestamp(self):
+        """Timestamp of the oldest pending transaction, or None if empty"""
+        with self._lock:
+            # Drop heap entries for transactions that have already left
+            while self._by_age and self._by_age[0][2] not in self._entries:
+                heapq.heappop(self._by_age)
+            return self._by_age[0][0] if self._by_age else None
+            
+    def select(self):
+        """
+        Remove and return the best transactions that fit in one block
+        
+        Transactions too large for the remaining byte budget are skipped
+        and stay in the pool for a later block.
+        """
+        selected = []
+        skipped = []
+        budget = self.max_block_bytes
+        with self._lock:
+            while self._by_priority and len(selected) < self.max_block_transactions:
+                entry = heapq.heappop(self._by_priority)
+                tx = self._entries.get(entry[3])
+                if tx is None:
+                    continue
+                size = self.transaction_size(tx)
+                if size > budget:
+                    skipped.append(entry)
+                    continue
+                budget -= size
+                del self._entries[entry[3]]
+                selected.append(tx)
+            for entry in skipped:
+                heapq.heappush(self._by_priority, entry)
+            self._compact()
+        return selected
+        
+    def restore(self, transactions):
+        """Return transactions to the pool, e.g. after a failed mining attempt"""
+        with self._lock:
+            for tx in transactions:
+                tx_id = self.transaction_id(tx)
+                if tx_id not in self._entries:
+                    self._push(tx_id, tx)
+                    
+    def remove(self, tx_ids):
+        """Drop transactions, e.g. once they are confirmed in a block"""
+        with self._lock:
+            for tx_id in tx_ids:
+                self._entries.pop(tx_id, None)
+            self._compact()
+            
+    def _compact(self):
+        """
+        Rebuild each heap once its stale entries outnumber live ones
+        
+        The heaps shrink at different rates (select() pops the priority
+        heap, the age heap is only trimmed at its top), so each is
+        checked on its own.
+        """
+        limit = 2 * len(self._entries) + 64
+        if len(self._by_priority) > limit:
+            self._by_priority = [e for e in self._by_priority if e[3] in self._entries]
+            heapq.heapify(self._by_priority)
+        if len(self._by_age) > limit:
+            self._by_age = [e for e in self._by_age if e[2] in self._entries]
+            heapq.heapify(self._by_age)
+            
+    @property
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'max_block_transactions': self.max_block_transactions,
+            'max_block_bytes': self.max_block_bytes,
+        }
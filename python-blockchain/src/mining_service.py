@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class BackgroundMiner:
+    """
+    Mines blocks on a background thread, fed by a job queue
+    
+    Request handlers submit a job and get its id back immediately; the
+    job record can be polled for its status and, once mined, the block.
+    Optionally the miner also queues a job by itself whenever the pending
+    transaction pool reaches a given size or its oldest entry a given age.
+    """
+    
+    def __init__(self, blockchain, miner_address=None, auto_mine_size=None,
+                 auto_mine_age=None, poll_interval=0.5, max_jobs=1000):
+        self.blockchain = blockchain
+        self.miner_address = miner_address
+        self.auto_mine_size = auto_mine_size
+        self.auto_mine_age = auto_mine_age
+        self.poll_interval = poll_interval
+        self.max_jobs = max_jobs
+        
+        self._jobs = OrderedDict()
+        self._done_events = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        
+        self._worker = threading.Thread(target=self._run, name="background-miner", daemon=True)
+        self._worker.start()
+        self._watcher = None
+        if auto_mine_size or auto_mine_age:
+            self._watcher = threading.Thread(target=self._watch, name="auto-miner", daemon=True)
+            self._watcher.start()
+            
+    def submit(self, trigger='request'):
+        """Queue a mining job and return its id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'trigger': trigger,
+                'submitted_at': time.time(),
+            }
+            self._done_events[job_id] = threading.Event()
+            self._prune()
+        self._queue.put(job_id)
+        return job_id
+        
+    def status(self, job_id):
+        """Return a copy of the job record, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+            
+    def wait(self, job_id, timeout=None):
+        """Block until the job has finished; returns its record"""
+        with self._lock:
+            done = self._done_events.get(job_id)
+        if done is not None:
+            done.wait(timeout)
+        return self.status(job_id)
+        
+    @property
+    def busy(self):
+        """True while a job is queued or being mined"""
+        with self._lock:
+            return any(job['status'] in ('queued', 'mining') for job in self._jobs.values())
+            
+    def stop(self):
+        self._stop.set()
+        self._queue.put(None)
+        self._worker.join()
+        if self._watcher is not None:
+            self._watcher.join()
+            
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_jobs"""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]['status'] in ('done', 'failed'):
+                del self._jobs[job_id]
+                del self._done_events[job_id]
+                excess -= 1
+                
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            self._update(job_id, status='mining', started_at=time.time())
+            try:
+                block = self.blockchain.add_block(
+                    self.blockchain.last_block, miner_address=self.miner_address
+                )
+            except Exception as e:
+                self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+            else:
+                self._update(
+                    job_id,
+                    status='done',
+                    finished_at=time.time(),
+                    block={
+                        'index': block.index,
+                        'hash': block.hash,
+                        'previous_hash': block.previous_hash,
+                        'merkle_root': block.merkle_root,
+                        'transaction_ids': block.transaction_ids(),
+                    }
+                )
+            with self._lock:
+                done = self._done_events.get(job_id)
+            if done is not None:
+                done.set()
+                
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            if self.busy:
+                continue
+            count = self.blockchain.pending_transaction_count()
+            if not count:
+                continue
+            if self.auto_mine_size and count >= self.auto_mine_size:
+                self.submit(trigger='size')
+            elif self.auto_mine_age and self.blockchain.pending_transaction_age() >= self.auto_mine_age:
+                self.submit(trigger='age')
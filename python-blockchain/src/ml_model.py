@@ -1,21 +1,50 @@
-import json
-import pickle
-import base64
+import copy
+import threading
+from collections import namedtuple
+import numpy as np
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.datasets import load_iris
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
+from .training_store import TrainingStore
+from .prediction_cache import PredictionCache
+from . import model_format
+
+# A fitted classifier together with the scaler it was fitted with. Snapshots
+# are never modified once published, so readers can use one without locking.
+ModelSnapshot = namedtuple('ModelSnapshot', ['model', 'scaler', 'version'])
 
 class IrisModel:
     """A simple ML model for Iris flower classification"""
     
-    def __init__(self):
-        """Initialize a new model with scikit-learn's Iris dataset"""
-        self.model = KNeighborsClassifier(n_neighbors=3)
-        self.scaler = StandardScaler()
+    def __init__(self, load_dataset=True):
+        """
+        Initialize a new model with scikit-learn's Iris dataset
+        
+        With load_dataset=False the model starts empty and untrained, e.g.
+        to be filled from a serialized model or checkpoint.
+        """
+        self.n_neighbors = 3
         self.classes = ['setosa', 'versicolor', 'virginica']
         
+        # Running scaler statistics; only touched under _write_lock
+        self._scaler = StandardScaler()
+        self._write_lock = threading.RLock()
+        
+        # Bumped whenever training changes the model; part of the cache key
+        self.version = 0
+        self._snapshot = ModelSnapshot(
+            KNeighborsClassifier(n_neighbors=self.n_neighbors), StandardScaler(), 0
+        )
+        self.prediction_cache = PredictionCache()
+        # (snapshot version, result) of the last evaluation
+        self._evaluation = None
+        
+        if not load_dataset:
+            self._init_empty()
+            return
+            
         # Load scikit-learn's Iris dataset
         try:
             iris = load_iris()
@@ -24,12 +53,12 @@ class IrisModel:
                 iris.data, iris.target, test_size=0.2, random_state=42
             )
             
-            self.X = X_train.tolist()  # Convert to list for easier serialization
-            self.y = y_train.tolist()  # Indices 0, 1, 2 matching our class names
+            # Labels are indices 0, 1, 2 matching our class names
+            self._store = TrainingStore.from_arrays(X_train, y_train)
             
             # Save test data separately - won't be used for training
-            self.X_test = X_test.tolist()
-            self.y_test = y_test.tolist()
+            self.X_test = np.asarray(X_test, dtype=self._store.dtype)
+            self.y_test = np.asarray(y_test, dtype=np.int8)
             
             # Train model with scikit-learn data
             self._train_model()
@@ -38,12 +67,35 @@ class IrisModel:
             print(f"Model initialized with {self.data_count} samples for training and {len(self.X_test)} samples for testing")
         except Exception as e:
             print(f"Could not load Iris dataset: {e}")
-            self.X = []
-            self.y = []
-            self.X_test = []
-            self.y_test = []
-            self.is_trained = False
-            self.data_count = 0
+            self._init_empty()
+            
+    def _init_empty(self):
+        """Start with no training or test data"""
+        self._store = TrainingStore()
+        self.X_test = np.empty((0, self._store.n_features), dtype=self._store.dtype)
+        self.y_test = np.empty(0, dtype=np.int8)
+        self.is_trained = False
+        self.data_count = 0
+        
+    @property
+    def model(self):
+        """Classifier of the current snapshot, refitted if it is stale"""
+        return self._read_snapshot(wait=True).model
+        
+    @property
+    def scaler(self):
+        """Scaler holding the running statistics of all training data"""
+        return self._scaler
+        
+    @property
+    def X(self):
+        """Training features as a (n_samples, 4) array view"""
+        return self._store.X
+        
+    @property
+    def y(self):
+        """Training labels as an int8 array view"""
+        return self._store.y
         
     def add_data_point(self, features, label):
         """
@@ -56,37 +108,110 @@ class IrisModel:
         Returns:
             bool: True if update succeeded
         """
-        if not self._validate_data(features, label):
-            return False
+        return self.add_data_points([features], [label]) == 1
+        
+    def add_data_points(self, features_list, labels):
+        """
+        Update the model with a batch of data points
+        
+        The scaler statistics are updated incrementally from the new rows
+        only, and the neighbor index is rebuilt once, lazily, the next time
+        the model is queried. Invalid points are skipped.
+        
+        Args:
+            features_list (list): Feature vectors, one per data point
+            labels (list): Flower type for each data point
+        
+        Returns:
+            int: Number of data points added
+        """
+        new_X = []
+        new_y = []
+        for features, label in zip(features_list, labels):
+            if not self._validate_data(features, label):
+                continue
+            if label not in self.classes:
+                continue
+            new_X.append([float(f) for f in features])
+            new_y.append(self.classes.index(label))
             
-        label_idx = self.classes.index(label) if label in self.classes else -1
-        if label_idx == -1:
-            return False
+        if not new_X:
+            return 0
+            
+        # Append-only storage; running mean/variance over the new rows only.
+        # Readers keep using the published snapshot until it is refitted.
+        with self._write_lock:
+            self._store.append(new_X, new_y)
+            self._scaler.partial_fit(self.X[-len(new_X):])
+            self.version += 1
+            self.data_count += len(new_X)
+        return len(new_X)
+        
+    def mark(self):
+        """
+        Capture the training state, to roll back to with rollback()
+        
+        Returns:
+            tuple: Row count, data count and a copy of the scaler statistics
+        """
+        with self._write_lock:
+            scaler = self._scaler
+            stats = None
+            if hasattr(scaler, 'mean_'):
+                stats = (scaler.mean_.copy(), scaler.var_.copy(), scaler.scale_.copy(),
+                         int(scaler.n_samples_seen_))
+            return len(self._store), self.data_count, stats
+            
+    def rollback(self, mark):
+        """
+        Drop the data points added since mark was taken
         
-        # Add to existing data and retrain
-        self.X.append(features)
-        self.y.append(label_idx)
+        The rows are truncated from the store and the scaler statistics
+        restored from the mark, so no refit over the remaining data is
+        needed beyond the usual lazy rebuild of the neighbor index.
+        """
+        size, data_count, stats = mark
+        with self._write_lock:
+            self._store.truncate(size)
+            self.data_count = data_count
+            self._scaler = self._scaler_from_stats(stats)
+            self.version += 1
             
-        # Retrain model with all data
-        self._train_model()
-        self.data_count += 1
-        return True
+    @staticmethod
+    def _scaler_from_stats(stats):
+        """StandardScaler with the given (mean, var, scale, n_samples_seen)"""
+        scaler = StandardScaler()
+        if stats is not None:
+            mean, var, scale, n_samples_seen = stats
+            scaler.mean_ = mean
+            scaler.var_ = var
+            scaler.scale_ = scale
+            scaler.n_samples_seen_ = np.int64(n_samples_seen)
+            scaler.n_features_in_ = len(mean)
+        return scaler
         
     def evaluate_model(self):
         """
         Evaluate the current model performance on the test dataset
         
+        The result is memoized per model version, so repeated calls
+        between updates return a copy of the previous result.
+        
         Returns:
             dict: Evaluation metrics including accuracy and per-class metrics
         """
-        if not self.is_trained or not self.X_test:
+        if not self.is_trained or len(self.X_test) == 0:
             return {"error": "Model not trained or no test data available"}
+        snapshot = self._read_snapshot(wait=True)
+        evaluation = self._evaluation
+        if evaluation is not None and evaluation[0] == snapshot.version:
+            return copy.deepcopy(evaluation[1])
             
         # Scale test features using the same scaler used for training
-        X_test_scaled = self.scaler.transform(self.X_test)
+        X_test_scaled = snapshot.scaler.transform(self.X_test)
         
         # Make predictions
-        y_pred = self.model.predict(X_test_scaled)
+        y_pred = snapshot.model.predict(X_test_scaled)
         
         # Calculate accuracy
         accuracy = accuracy_score(self.y_test, y_pred)
@@ -100,45 +225,118 @@ class IrisModel:
         )
         
         # Return metrics
-        return {
+        result = {
             "accuracy": float(accuracy),
             "data_points_trained": self.data_count,
             "test_samples": len(self.X_test),
+            "model_version": snapshot.version,
             "class_metrics": report
         }
+        self._evaluation = (snapshot.version, result)
+        return copy.deepcopy(result)
         
     def predict(self, features):
         """Predict flower type from features"""
+        return self.predict_batch([features])[0]
+        
+    def predict_batch(self, features_list):
+        """
+        Predict flower types for many feature vectors at once
+        
+        All valid rows are scaled with one transform and classified with a
+        single predict_proba call; the predicted class is the most probable
+        one, which matches KNeighborsClassifier.predict.
+        
+        Args:
+            features_list (list): Feature vectors, one per prediction
+        
+        Returns:
+            list: One result dict per input row, in order
+        """
         if not self.is_trained:
-            return {"error": "Model not trained yet"}
-            
-        if not self._validate_features(features):
-            return {"error": "Invalid features format"}
+            return [{"error": "Model not trained yet"} for _ in features_list]
             
+        results = [{"error": "Invalid features format"} for _ in features_list]
+        snapshot = self._read_snapshot()
+        version = snapshot.version
+        cache = self.prediction_cache
+        
+        # Serve repeated measurements from the cache
+        misses = []
+        for i, features in enumerate(features_list):
+            if not self._validate_features(features):
+                continue
+            key = cache.key(version, features)
+            cached = cache.get(key)
+            if cached is None:
+                misses.append((i, key))
+            else:
+                results[i] = self._copy_result(cached)
+        if not misses:
+            return results
+        
         # Scale features and predict
-        features_scaled = self.scaler.transform([features])
-        prediction = self.model.predict(features_scaled)[0]
+        batch = np.asarray([features_list[i] for i, _ in misses], dtype=np.float64)
+        features_scaled = snapshot.scaler.transform(batch)
+        probabilities = snapshot.model.predict_proba(features_scaled)
+        best = probabilities.argmax(axis=1)
+        labels = snapshot.model.classes_
         
         # Return prediction and confidence scores
-        probabilities = self.model.predict_proba(features_scaled)[0]
-        result = {
-            "predicted_class": self.classes[prediction],
-            "confidence": float(probabilities[prediction]),
-            "probabilities": {
-                self.classes[i]: float(prob) 
-                for i, prob in enumerate(probabilities)
+        for (row, key), probs, column in zip(misses, probabilities, best):
+            result = {
+                "predicted_class": self.classes[labels[column]],
+                "confidence": float(probs[column]),
+                "probabilities": {
+                    self.classes[label]: float(prob)
+                    for label, prob in zip(labels, probs)
+                }
             }
-        }
-        return result
+            cache.put(key, result)
+            results[row] = self._copy_result(result)
+        return results
+        
+    @staticmethod
+    def _copy_result(result):
+        """Copy a cached result so callers cannot modify the cache entry"""
+        return {**result, "probabilities": dict(result["probabilities"])}
     
     def _train_model(self):
         """Train or update the model with all data"""
-        # Scale features
-        self.scaler.fit(self.X)
-        X_scaled = self.scaler.transform(self.X)
+        with self._write_lock:
+            # Scale features
+            self._scaler.fit(self.X)
+            self.version += 1
+            
+            # Train model
+            self._publish_snapshot()
         
-        # Train model
-        self.model.fit(X_scaled, self.y)
+    def _read_snapshot(self, wait=False):
+        """
+        Return a snapshot to serve reads from
+        
+        If data was added since the snapshot was fitted, the neighbor index
+        is rebuilt once. Unless wait is set, a reader that finds another
+        thread training returns the previous snapshot instead of blocking.
+        """
+        snapshot = self._snapshot
+        if snapshot.version == self.version:
+            return snapshot
+        if not self._write_lock.acquire(blocking=wait):
+            return snapshot
+        try:
+            if self._snapshot.version != self.version:
+                self._publish_snapshot()
+            return self._snapshot
+        finally:
+            self._write_lock.release()
+            
+    def _publish_snapshot(self):
+        """Fit a new classifier on all data and swap it in (lock held)"""
+        scaler = copy.deepcopy(self._scaler)
+        model = KNeighborsClassifier(n_neighbors=self.n_neighbors)
+        model.fit(scaler.transform(self.X), self.y)
+        self._snapshot = ModelSnapshot(model, scaler, self.version)
     
     def _validate_data(self, features, label):
         """Validate format of data point"""
@@ -163,62 +361,85 @@ class IrisModel:
         except:
             return False
     
-    def serialize(self):
-        """Serialize model to string for blockchain storage"""
-        model_data = {
-            "is_trained": self.is_trained,
-            "data_count": self.data_count,
-        }
+    def serialize(self, compression=None):
+        """
+        Serialize the model in the binary format of model_format
+        
+        Only the training data, test data and scaler statistics are
+        stored; the neighbor index is rebuilt from them on first use.
+        
+        Args:
+            compression (str): None, 'zlib' or 'zstd'
+        
+        Returns:
+            bytes: The encoded model
+        """
+        with self._write_lock:
+            scaler = self._scaler
+            fitted = hasattr(scaler, 'mean_')
+            n_features = self._store.n_features
+            flags = model_format.FLAG_TRAINED if self.is_trained else 0
+            if fitted:
+                flags |= model_format.FLAG_SCALER_FITTED
+            empty = np.zeros(n_features)
+            fields = {
+                'n_features': n_features,
+                'n_neighbors': self.n_neighbors,
+                'flags': flags,
+                'data_count': self.data_count,
+                'model_version': self.version,
+                'n_train': len(self._store),
+                'n_test': len(self.X_test),
+                'n_samples_seen': int(scaler.n_samples_seen_) if fitted else 0,
+            }
+            arrays = {
+                'scaler_mean': scaler.mean_ if fitted else empty,
+                'scaler_var': scaler.var_ if fitted else empty,
+                'scaler_scale': scaler.scale_ if fitted else empty,
+                'X': self.X,
+                'y': self.y,
+                'X_test': self.X_test,
+                'y_test': self.y_test,
+            }
+            return model_format.encode(fields, arrays, compression=compression)
         
-        if self.is_trained:
-            # Serialize the model and scaler
-            model_bytes = pickle.dumps(self.model)
-            scaler_bytes = pickle.dumps(self.scaler)
-            x_bytes = pickle.dumps(self.X)
-            y_bytes = pickle.dumps(self.y)
-            x_test_bytes = pickle.dumps(self.X_test)
-            y_test_bytes = pickle.dumps(self.y_test)
-            
-            model_data.update({
-                "model": base64.b64encode(model_bytes).decode('utf-8'),
-                "scaler": base64.b64encode(scaler_bytes).decode('utf-8'),
-                "X": base64.b64encode(x_bytes).decode('utf-8'),
-                "y": base64.b64encode(y_bytes).decode('utf-8'),
-                "X_test": base64.b64encode(x_test_bytes).decode('utf-8'),
-                "y_test": base64.b64encode(y_test_bytes).decode('utf-8')
-            })
-            
-        return json.dumps(model_data)
+    @classmethod
+    def from_bytes(cls, data, verify=True):
+        """
+        Create a model from the output of serialize
+        
+        Given an mmap of an uncompressed model, the training and test
+        arrays are used in place until new data is added.
+        
+        Raises:
+            ValueError: If data is not a valid serialized model
+        """
+        fields, arrays = model_format.decode(data, verify=verify)
+        model_obj = cls(load_dataset=False)
+        model_obj.n_neighbors = fields['n_neighbors']
+        model_obj.is_trained = bool(fields['flags'] & model_format.FLAG_TRAINED)
+        model_obj.data_count = fields['data_count']
+        model_obj._store = TrainingStore.wrap(arrays['X'], arrays['y'])
+        model_obj.X_test = arrays['X_test']
+        model_obj.y_test = arrays['y_test']
+        
+        if fields['flags'] & model_format.FLAG_SCALER_FITTED:
+            model_obj._scaler = cls._scaler_from_stats((
+                arrays['scaler_mean'].copy(),
+                arrays['scaler_var'].copy(),
+                arrays['scaler_scale'].copy(),
+                fields['n_samples_seen'],
+            ))
+            
+        # Leaves the empty snapshot stale, so the first read refits it
+        model_obj.version = fields['model_version'] + 1
+        return model_obj
         
     @classmethod
     def deserialize(cls, serialized_data):
-        """Create model from serialized string"""
-        model_obj = cls()
-        
+        """Create model from serialized bytes, or an empty model if invalid"""
         try:
-            model_data = json.loads(serialized_data)
-            model_obj.is_trained = model_data.get("is_trained", False)
-            model_obj.data_count = model_data.get("data_count", 0)
-            
-            if model_obj.is_trained:
-                model_bytes = base64.b64decode(model_data["model"])
-                scaler_bytes = base64.b64decode(model_data["scaler"])
-                x_bytes = base64.b64decode(model_data["X"])
-                y_bytes = base64.b64decode(model_data["y"])
-                
-                model_obj.model = pickle.loads(model_bytes)
-                model_obj.scaler = pickle.loads(scaler_bytes)
-                model_obj.X = pickle.loads(x_bytes)
-                model_obj.y = pickle.loads(y_bytes)
-                
-                # Load test data if available
-                if "X_test" in model_data and "y_test" in model_data:
-                    x_test_bytes = base64.b64decode(model_data["X_test"])
-                    y_test_bytes = base64.b64decode(model_data["y_test"])
-                    model_obj.X_test = pickle.loads(x_test_bytes)
-                    model_obj.y_test = pickle.loads(y_test_bytes)
-                
-            return model_obj
+            return cls.from_bytes(serialized_data)
         except Exception as e:
             print(f"Error deserializing model: {e}")
-            return model_obj
\ No newline at end of file
+            return cls(load_dataset=False)
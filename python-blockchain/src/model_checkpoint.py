@@ -0,0 +1,135 @@
+import json
+import mmap
+import os
+import re
+
+from .ml_model import IrisModel
+
+_CHECKPOINT_NAME = re.compile(r'^model-(\d{10})-([0-9a-f]+)\.ckpt$')
+
+
+class CheckpointManager:
+    """
+    Periodic model checkpoints anchored to a block
+    
+    Every `interval` blocks the serialized model is written together with
+    the height and hash of the block it reflects, plus any extra node
+    state: small JSON state (e.g. account snapshots) and binary sections
+    (e.g. the transaction index). A restarting node loads the newest
+    checkpoint still on its chain and only replays the blocks after it.
+    
+    File layout: one line of JSON metadata, padded so the serialized
+    model after it starts on an 8-byte boundary and can be memory-mapped,
+    then each binary section, also 8-byte aligned. The metadata records
+    the model size and the offset and size of every section, relative to
+    the end of the metadata line, so it stays small however large the
+    sections grow.
+    """
+    
+    def __init__(self, directory, interval=100, keep=3):
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+        
+    def should_checkpoint(self, height):
+        return height > 0 and height % self.interval == 0
+        
+    def save(self, model, height, block_hash, state=None, sections=None):
+        """
+        Atomically write a checkpoint for the block at height
+        
+        Args:
+            state (dict): JSON-serializable state kept in the metadata
+            sections (dict): name -> bytes, stored after the model
+        """
+        payload = model.serialize()
+        parts = [payload]
+        layout = {}
+        offset = len(payload)
+        for name, data in (sections or {}).items():
+            padding = b'\x00' * (-offset % 8)
+            offset += len(padding)
+            layout[name] = [offset, len(data)]
+            parts += [padding, data]
+            offset += len(data)
+        metadata = {
+            'height': height,
+            'block_hash': block_hash,
+            'state': state or {},
+            'model_size': len(payload),
+            'sections': layout,
+        }
+        
+        path = os.path.join(self.directory, f'model-{height:010d}-{block_hash[:16]}.ckpt')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            line = json.dumps(metadata, separators=(',', ':')).encode()
+            f.write(line + b' ' * (-(len(line) + 1) % 8) + b'\n')
+            for part in parts:
+                f.write(part)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._prune()
+        return path
+        
+    def checkpoints(self):
+        """Checkpoint paths with their heights, newest first"""
+        found = []
+        for name in os.listdir(self.directory):
+            match = _CHECKPOINT_NAME.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found, reverse=True)
+        
+    def load(self, path):
+        """
+        Read a checkpoint
+        
+        The 'sections' entry of the metadata maps each section name to a
+        memoryview of its bytes.
+        
+        Returns:
+            tuple: (metadata dict, IrisModel)
+        """
+        with open(path, 'rb') as f:
+            metadata = json.loads(f.readline())
+            offset = f.tell()
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # The model's arrays and the sections are views of the map, which
+        # stays open for as long as they are in use
+        view = memoryview(data)[offset:]
+        # Checkpoints from before sections existed hold only the model
+        model_size = metadata.get('model_size', len(view))
+        sections = {}
+        for name, (start, size) in metadata.get('sections', {}).items():
+            if start + size > len(view):
+                raise ValueError(f"Section {name} is truncated")
+            sections[name] = view[start:start + size]
+        metadata['sections'] = sections
+        return metadata, IrisModel.from_bytes(view[:model_size])
+        
+    def load_latest(self, chain):
+        """
+        Load the newest checkpoint whose block is still part of chain
+        
+        Returns:
+            tuple: (metadata, IrisModel), or None if no checkpoint matches
+        """
+        for height, path in self.checkpoints():
+            if height >= len(chain):
+                continue
+            with open(path, 'rb') as f:
+                block_hash = json.loads(f.readline())['block_hash']
+            if chain[height].hash != block_hash:
+                continue
+            try:
+                return self.load(path)
+            except ValueError as e:
+                print(f"Skipping checkpoint {path}: {e}")
+        return None
+        
+    def _prune(self):
+        for _, path in self.checkpoints()[self.keep:]:
+            os.remove(path)
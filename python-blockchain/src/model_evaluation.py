@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import deque
+
+
+class EvaluationTracker:
+    """
+    Serves model evaluations and records accuracy per block height
+
+    IrisModel memoizes its evaluation per model version, so evaluate()
+    costs nothing until a block changes the model. Each evaluation of a
+    new version is added to the history together with the height of the
+    chain tip at the time. With background=True the model is evaluated
+    on a worker thread after every connected block, so the history has
+    an entry for each block that changed the model and readers always
+    find a fresh result.
+    """
+
+    def __init__(self, blockchain, background=False, max_history=10000):
+        self.blockchain = blockchain
+        self.background = background
+        self.history = deque(maxlen=max_history)
+        self._last_version = None
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._stop = threading.Event()
+
+        self._worker = None
+        if background:
+            blockchain.add_block_listener(self._on_block)
+            self._worker = threading.Thread(target=self._run, name="model-evaluator", daemon=True)
+            self._worker.start()
+            # Evaluate the model the chain was loaded with
+            self._pending.set()
+
+    def evaluate(self):
+        """Evaluate the current model, recording new versions in the history"""
+        tip = self.blockchain.last_block
+        result = self.blockchain.evaluate_model()
+        self._record(tip, result)
+        return result
+
+    def entries(self, start=0, limit=None):
+        """
+        History entries for block heights >= start, oldest first
+
+        Returns:
+            list: Dicts with height, block_hash, model_version, accuracy,
+                data_points_trained and evaluated_at
+        """
+        with self._lock:
+            entries = [entry for entry in self.history if entry['height'] >= start]
+        return entries if limit is None else entries[:limit]
+
+    def stop(self):
+        if self._worker is None:
+            return
+        self.blockchain.remove_block_listener(self._on_block)
+        self._stop.set()
+        self._pending.set()
+        self._worker.join()
+        self._worker = None
+
+    def _record(self, block, result):
+        if 'accuracy' not in result:
+            return
+        with self._lock:
+            if result['model_version'] == self._last_version:
+                return
+            self._last_version = result['model_version']
+            self.history.append({
+                'height': block.index,
+                'block_hash': block.hash,
+                'model_version': result['model_version'],
+                'accuracy': result['accuracy'],
+                'data_points_trained': result['data_points_trained'],
+                'evaluated_at': time.time(),
+            })
+
+    def _on_block(self, block):
+        # Several blocks arriving while an evaluation runs collapse into one
+        self._pending.set()
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            if self._stop.is_set():
+                return
+            self._pending.clear()
+            try:
+                self.evaluate()
+            except Exception as e:
+                print(f"Background model evaluation failed: {e}")
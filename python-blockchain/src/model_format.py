@@ -0,0 +1,170 @@
+import hashlib
+import struct
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+# Binary model format
+#
+#   header   fixed-size little-endian struct (HEADER below)
+#   payload  the arrays of ARRAY_LAYOUT, in order, each starting on an
+#            8-byte boundary; optionally compressed as a whole
+#
+# The digest is the SHA-256 of the uncompressed payload. Uncompressed
+# payloads can be read straight out of a memory map without copying.
+MAGIC = b'IRISMDL\x00'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<8sHHIIIQQQQQQ32s')
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {None: CODEC_NONE, 'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'zstd': CODEC_ZSTD}
+
+FLAG_TRAINED = 1
+FLAG_SCALER_FITTED = 2
+
+ALIGNMENT = 8
+
+# (name, dtype, rows field); arrays with a rows field are (rows, n_features),
+# the others are 1-D of length n_features
+ARRAY_LAYOUT = (
+    ('scaler_mean', '<f8', None),
+    ('scaler_var', '<f8', None),
+    ('scaler_scale', '<f8', None),
+    ('X', '<f4', 'n_train'),
+    ('y', 'i1', 'n_train'),
+    ('X_test', '<f4', 'n_test'),
+    ('y_test', 'i1', 'n_test'),
+)
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+def _shape(name, rows_field, fields):
+    n_features = fields['n_features']
+    if rows_field is None:
+        return (n_features,)
+    if name.startswith('X'):
+        return (fields[rows_field], n_features)
+    return (fields[rows_field],)
+
+
+def encode(fields, arrays, compression=None, level=None):
+    """
+    Pack header fields and arrays into the binary model format
+
+    Args:
+        fields (dict): n_features, n_neighbors, flags, data_count,
+            model_version, n_train, n_test and n_samples_seen
+        arrays (dict): One array per ARRAY_LAYOUT entry
+        compression (str): None, 'zlib' or 'zstd'
+        level (int): Compression level, codec default if None
+
+    Returns:
+        bytes: The encoded model
+    """
+    if compression not in CODECS:
+        raise ValueError(f"Unknown compression: {compression}")
+    codec = CODECS[compression]
+
+    parts = []
+    for name, dtype, rows_field in ARRAY_LAYOUT:
+        array = np.ascontiguousarray(arrays[name], dtype=dtype)
+        if array.shape != _shape(name, rows_field, fields):
+            raise ValueError(f"Array {name} has shape {array.shape}")
+        data = array.tobytes()
+        parts.append(data)
+        parts.append(b'\x00' * _padding(len(data)))
+    payload = b''.join(parts)
+    digest = hashlib.sha256(payload).digest()
+
+    if codec == CODEC_ZLIB:
+        payload = zlib.compress(payload, 6 if level is None else level)
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        payload = zstandard.ZstdCompressor(level=3 if level is None else level).compress(payload)
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, codec,
+        fields['n_features'], fields['n_neighbors'], fields['flags'],
+        fields['data_count'], fields['model_version'],
+        fields['n_train'], fields['n_test'], fields['n_samples_seen'],
+        len(payload), digest
+    )
+    return header + payload
+
+
+def decode(buffer, verify=True):
+    """
+    Unpack a model encoded by encode
+
+    For an uncompressed model the returned arrays are read-only views of
+    buffer, so passing an mmap avoids reading or copying the data.
+
+    Args:
+        buffer: bytes, memoryview or mmap holding the encoded model
+        verify (bool): Check the payload against the stored digest
+
+    Returns:
+        tuple: (fields dict, arrays dict)
+
+    Raises:
+        ValueError: If the data is truncated, corrupt or not a model
+    """
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        raise ValueError("Model data is truncated")
+    (magic, version, codec, n_features, n_neighbors, flags, data_count,
+     model_version, n_train, n_test, n_samples_seen, payload_length,
+     digest) = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not a serialized model")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format version {version}")
+    fields = {
+        'n_features': n_features,
+        'n_neighbors': n_neighbors,
+        'flags': flags,
+        'data_count': data_count,
+        'model_version': model_version,
+        'n_train': n_train,
+        'n_test': n_test,
+        'n_samples_seen': n_samples_seen,
+    }
+
+    payload = view[HEADER.size:HEADER.size + payload_length]
+    if len(payload) != payload_length:
+        raise ValueError("Model data is truncated")
+    if codec == CODEC_ZLIB:
+        payload = memoryview(zlib.decompress(payload))
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd compressed model requires the zstandard package")
+        payload = memoryview(zstandard.ZstdDecompressor().decompress(payload))
+    elif codec != CODEC_NONE:
+        raise ValueError(f"Unknown model codec {codec}")
+    if verify and hashlib.sha256(payload).digest() != digest:
+        raise ValueError("Model digest mismatch")
+
+    arrays = {}
+    offset = 0
+    for name, dtype, rows_field in ARRAY_LAYOUT:
+        shape = _shape(name, rows_field, fields)
+        count = int(np.prod(shape))
+        size = count * np.dtype(dtype).itemsize
+        if offset + size > len(payload):
+            raise ValueError("Model data is truncated")
+        array = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        arrays[name] = array.reshape(shape)
+        offset += size + _padding(size)
+    return fields, arrays
@@ -1,23 +1,592 @@
+import argparse
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from ..block import Block
+from ..transaction import Transaction
+from .protocol import ProtocolError, encode_message, read_message
+from .sync import MAX_BLOCKS_PER_REQUEST, MAX_HEADERS, ChainSync
+
+INV_TX = 'tx'
+INV_BLOCK = 'block'
+
+# Most ids carried by a single inv or getdata message
+MAX_INV_ITEMS = 1000
+
+# Seconds before an unanswered getdata may be retried through another peer
+REQUEST_TIMEOUT = 5.0
+
+# Seconds allowed for the hello exchange on a new connection
+HANDSHAKE_TIMEOUT = 5.0
+
+# Rejections that may not hold later, e.g. once a block's parent or a
+# sender's funds arrive; such ids are not marked seen
+TRANSIENT_TX_ERRORS = {"Insufficient balance", "Mempool full"}
+
+
+def _inventory(message, key='items'):
+    """
+    The [kind, id, ...] items of an inv, getdata or notfound message
+
+    Raises:
+        ProtocolError: If the items are not lists starting with a kind and an id
+    """
+    items = message.get(key, [])
+    if not isinstance(items, list):
+        raise ProtocolError(f"{key} must be a list")
+    items = items[:MAX_INV_ITEMS]
+    for item in items:
+        if not isinstance(item, list) or len(item) < 2 or not isinstance(item[1], str):
+            raise ProtocolError("Malformed inventory item")
+    return items
+
+
+def _body(message, key):
+    """The object carried by a tx or block message"""
+    body = message.get(key)
+    if not isinstance(body, dict):
+        raise ProtocolError(f"{key} must be an object")
+    return body
+
+
+class SeenSet:
+    """Set of recently seen ids that forgets the oldest beyond maxsize"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        """Add an id; returns False if it was already present"""
+        if item in self._items:
+            self._items.move_to_end(item)
+            return False
+        self._items[item] = None
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return True
+
+
+class Peer:
+    """A connection to a remote node with a bounded outbound queue"""
+
+    def __init__(self, reader, writer, queue_size=1000, known_size=10000):
+        self.reader = reader
+        self.writer = writer
+        self.node_id = None
+        self.listen_address = None
+        self.height = 0
+        # Ids the peer is known to have, so they are not announced back
+        self.known = SeenSet(known_size)
+        self.pending_inv = []
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.closed = asyncio.Event()
+        # Futures of requests awaiting a reply from this peer, by id
+        self.requests = {}
+        self._queue = asyncio.Queue(queue_size)
+
+    def send_nowait(self, message):
+        """Queue a message unless the peer is backed up; False if dropped"""
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def send(self, message):
+        """Queue a message, waiting while the peer's queue is full"""
+        await self._queue.put(message)
+
+    async def write_loop(self):
+        try:
+            while True:
+                message = await self._queue.get()
+                data = encode_message(message)
+                self.writer.write(data)
+                self.bytes_sent += len(data)
+                await self.writer.drain()
+        except (ConnectionError, ProtocolError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.closed.set()
+        self.writer.close()
+        for future in self.requests.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Peer disconnected"))
+
+
 class Node:
-    def __init__(self, node_id):
-        self.node_id = node_id
-        self.peers = set()
-        self.blockchain = []
+    """
+    Asyncio TCP node gossiping transactions and blocks for a Blockchain
+
+    New objects are announced with inv messages carrying only their ids.
+    A peer that has not seen an id asks for it with getdata and gets the
+    body once, then announces it to its own peers. Bodies therefore cross
+    each connection at most once and every node only talks to its direct
+    peers, however large the cluster is. Ids are remembered in a bounded
+    seen-set so nothing is fetched or relayed twice.
+
+    Each peer has a bounded outbound queue. Announcements to a peer that
+    is not keeping up are dropped, while replies to its requests wait for
+    room, which stops reading from that peer until it catches up.
+
+    Blockchain calls (which may wait for the mining lock) run on a single
+    worker thread, so the event loop is never blocked and blocks are
+    applied in the order they arrive.
+    
+    A node that learns of a longer chain, from a peer's hello or from a
+    block that does not extend its tip, catches up through ChainSync.
+    """
+
+    def __init__(self, blockchain, host='127.0.0.1', port=0, node_id=None,
+                 max_peers=32, seen_size=100000, relay_size=10000, queue_size=1000):
+        self.blockchain = blockchain
+        self.host = host
+        self.port = port
+        self.node_id = node_id or uuid.uuid4().hex
+        self.max_peers = max_peers
+        self.queue_size = queue_size
+
+        self.peers = {}
+        self.seen = SeenSet(seen_size)
+        # Bodies of recently announced objects, served to getdata
+        self._relay = OrderedDict()
+        self._relay_size = relay_size
+        self._requested = {}
+        # Message counts by type, for monitoring
+        self.received = Counter()
+        self._request_ids = itertools.count(1)
+        self.sync = ChainSync(self)
+
+        self._loop = None
+        self._server = None
+        self._tasks = set()
+        self._stopping = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='node-chain')
+        self._thread = None
+
+    # Lifecycle
+
+    async def start(self):
+        """Listen for peers and start announcing local blocks and transactions"""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._on_inbound, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.blockchain.add_block_listener(self._on_local_block)
+        self.blockchain.add_transaction_listener(self._on_local_transactions)
+        print(f"Node {self.node_id[:8]} listening on {self.host}:{self.port}")
+
+    def connect(self, host, port):
+        """Keep a connection to host:port open, reconnecting with backoff"""
+        self._spawn(self._maintain(host, port))
+
+    async def wait_for_peers(self, count, timeout=10.0):
+        """Wait until at least count peers have completed the handshake"""
+        deadline = time.monotonic() + timeout
+        while len(self.peers) < count:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Only {len(self.peers)} of {count} peers connected")
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        self._stopping = True
+        self.blockchain.remove_block_listener(self._on_local_block)
+        self.blockchain.remove_transaction_listener(self._on_local_transactions)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for peer in list(self.peers.values()):
+            peer.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    def start_in_thread(self, peers=()):
+        """Run the node on its own event loop thread, e.g. next to Flask"""
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            for host, port in peers:
+                self.connect(host, port)
+            started.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="p2p-node", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop_thread(self):
+        if self._thread is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self.stop(), self._loop)
+        future.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    async def request(self, peer, message, timeout=REQUEST_TIMEOUT):
+        """Send a request to peer and wait for the reply carrying its id"""
+        request_id = next(self._request_ids)
+        future = self._loop.create_future()
+        peer.requests[request_id] = future
+        try:
+            await peer.send({**message, 'id': request_id})
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            peer.requests.pop(request_id, None)
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # Connections
+
+    async def _maintain(self, host, port):
+        backoff = 0.5
+        while not self._stopping:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                pass
+            else:
+                peer = await self._run_peer(reader, writer)
+                if peer is not None:
+                    backoff = 0.5
+                    # Connected, or already connected from the other side
+                    await peer.closed.wait()
+            if self._stopping:
+                return
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _on_inbound(self, reader, writer):
+        if len(self.peers) >= self.max_peers:
+            writer.close()
+            return
+        await self._run_peer(reader, writer)
+
+    async def _run_peer(self, reader, writer):
+        """
+        Handshake, then serve the connection until it closes
+
+        Returns:
+            Peer: The peer this connection (or an existing one) belongs
+                to, or None if the handshake failed
+        """
+        peer = Peer(reader, writer, queue_size=self.queue_size)
+        writer_task = self._spawn(peer.write_loop())
+        peer.send_nowait({
+            'type': 'hello',
+            'node_id': self.node_id,
+            'port': self.port,
+            'height': len(self.blockchain.chain) - 1,
+        })
+        try:
+            hello = await asyncio.wait_for(read_message(reader), HANDSHAKE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            hello = {}
+        existing = self.peers.get(hello.get('node_id'))
+        if hello.get('type') != 'hello' or hello.get('node_id') == self.node_id or existing is not None:
+            peer.close()
+            writer_task.cancel()
+            return existing
+
+        peer.node_id = hello['node_id']
+        peer.height = hello.get('height', 0)
+        peer.listen_address = f"{writer.get_extra_info('peername')[0]}:{hello.get('port')}"
+        self.peers[peer.node_id] = peer
+        self.blockchain.nodes.add(peer.listen_address)
+        self._spawn(self._read_loop(peer, writer_task))
+        if peer.height > len(self.blockchain.chain) - 1:
+            self.sync.schedule()
+        return peer
+
+    async def _read_loop(self, peer, writer_task):
+        try:
+            while not peer.closed.is_set():
+                message = await read_message(peer.reader)
+                await self._handle(peer, message)
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            peer.close()
+            writer_task.cancel()
+            if self.peers.get(peer.node_id) is peer:
+                del self.peers[peer.node_id]
+                self.blockchain.nodes.discard(peer.listen_address)
+
+    # Messages
+
+    async def _handle(self, peer, message):
+        kind = message['type']
+        handler = getattr(self, f'_handle_{kind}', None)
+        if handler is None:
+            raise ProtocolError(f"Unknown message type {kind}")
+        self.received[kind] += 1
+        try:
+            await handler(peer, message)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+            # Fields of the wrong shape deeper inside the message
+            raise ProtocolError(f"Malformed {kind} message: {e}") from e
+
+    async def _handle_inv(self, peer, message):
+        now = time.monotonic()
+        self._expire_requests(now)
+        wanted = []
+        for item in _inventory(message):
+            item_id = item[1]
+            peer.known.add(item_id)
+            if item_id in self.seen or item_id in self._requested:
+                continue
+            self._requested[item_id] = now
+            wanted.append(item)
+        if wanted:
+            await peer.send({'type': 'getdata', 'items': wanted})
+
+    def _expire_requests(self, now):
+        """Forget getdata requests that were never answered in time"""
+        # Entries are added in time order, so the expired ones come first
+        while self._requested:
+            item_id, requested = next(iter(self._requested.items()))
+            if now - requested < REQUEST_TIMEOUT:
+                return
+            del self._requested[item_id]
+
+    async def _handle_getdata(self, peer, message):
+        missing = []
+        for item in _inventory(message):
+            body = await self._find(item)
+            if body is None:
+                missing.append(item)
+            else:
+                await peer.send(body)
+        if missing:
+            await peer.send({'type': 'notfound', 'items': missing})
+
+    async def _handle_notfound(self, peer, message):
+        for item in _inventory(message):
+            self._requested.pop(item[1], None)
+
+    async def _handle_tx(self, peer, message):
+        tx = _body(message, 'tx')
+        tx_id = tx.get('id')
+        peer.known.add(tx_id)
+        try:
+            if tx_id is None or tx_id in self.seen:
+                return
+            try:
+                # Also checks the id against the content, so a bad body cannot
+                # get someone else's id marked seen
+                transaction = Transaction.from_dict(tx)
+            except ValueError:
+                return
+            results = await self._run_on_chain(self.blockchain.add_transactions, [transaction])
+            _, error = results[0]
+            if error in TRANSIENT_TX_ERRORS:
+                return
+            self.seen.add(tx_id)
+            if error is None:
+                self._announce([INV_TX, tx_id], message, exclude=peer)
+        finally:
+            # Only once settled, or an inv arriving meanwhile fetches it again
+            self._requested.pop(tx_id, None)
+
+    async def _handle_block(self, peer, message):
+        data = _body(message, 'block')
+        block_hash = data.get('hash')
+        peer.known.add(block_hash)
+        try:
+            if block_hash is None or block_hash in self.seen:
+                return
+            try:
+                block = Block.from_dict(data)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                return
+            peer.height = max(peer.height, block.index)
+            if block.index > len(self.blockchain.chain):
+                # Missing the blocks in between; fetch them headers-first
+                self.sync.schedule()
+                return
+            try:
+                connected = await self._run_on_chain(self.blockchain.add_external_block, block)
+            except ValueError as e:
+                if str(e) == "Unknown parent block":
+                    # A branch we have not seen; fetch it headers-first, and
+                    # accept this block again once its parent is known
+                    self.sync.schedule()
+                    return
+                print(f"Rejected block {block_hash[:16]} from {peer.node_id[:8]}: {e}")
+                # Only a body that really hashes to the id condemns it
+                if block.calculate_hash() == block_hash:
+                    self.seen.add(block_hash)
+                return
+            self.seen.add(block_hash)
+            if connected:
+                self._announce([INV_BLOCK, block_hash, block.index], message, exclude=peer)
+        finally:
+            self._requested.pop(block_hash, None)
+
+    async def _handle_getheaders(self, peer, message):
+        locator = (message.get('locator') or [])[:64]
+        limit = min(int(message.get('limit', MAX_HEADERS)), MAX_HEADERS)
+
+        def read():
+            fork = self.blockchain.find_fork(locator)
+            return fork, [] if fork is None else self.blockchain.headers(fork + 1, limit)
+
+        fork, headers = await self._read_chain(read)
+        await peer.send({'type': 'headers', 'id': message.get('id'), 'fork': fork, 'headers': headers})
+
+    async def _handle_getblocks(self, peer, message):
+        items = (message.get('items') or [])[:MAX_BLOCKS_PER_REQUEST]
+
+        def read():
+            blocks = []
+            for height, block_hash in items:
+                block = self.blockchain.block_at(height, block_hash)
+                if block is None:
+                    break
+                blocks.append(block.to_dict())
+            return blocks
+
+        blocks = await self._read_chain(read)
+        await peer.send({'type': 'blocks', 'id': message.get('id'), 'blocks': blocks})
+
+    async def _handle_headers(self, peer, message):
+        self._resolve(peer, message)
+
+    async def _handle_blocks(self, peer, message):
+        self._resolve(peer, message)
+
+    def _resolve(self, peer, message):
+        future = peer.requests.get(message.get('id'))
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    async def _find(self, item):
+        """Body message for an inv item, or None if it is not available"""
+        kind, item_id = item[0], item[1]
+        body = self._relay.get(item_id)
+        if body is not None:
+            return body
+        if kind == INV_TX:
+            tx = self.blockchain.mempool.get(item_id)
+            return {'type': 'tx', 'tx': tx} if tx is not None else None
+        if kind == INV_BLOCK and len(item) > 2:
+            block = await self._read_chain(self.blockchain.block_at, item[2], item_id)
+            if block is not None:
+                return {'type': 'block', 'block': block.to_dict()}
+        return None
+
+    async def _run_on_chain(self, func, *args):
+        return await self._loop.run_in_executor(self._executor, func, *args)
+
+    async def _read_chain(self, func, *args):
+        # Reads may hit the block store, so they stay off the event loop
+        # too, and hold the chain lock so a reorganization cannot cut the
+        # chain from under them
+        def read():
+            with self.blockchain.chain_lock:
+                return func(*args)
+        return await self._loop.run_in_executor(None, read)
+
+    # Announcements
+
+    def _announce(self, item, body, exclude=None):
+        """Remember body for getdata and queue an inv for every other peer"""
+        item_id = item[1]
+        self._relay[item_id] = body
+        if len(self._relay) > self._relay_size:
+            self._relay.popitem(last=False)
+        for peer in list(self.peers.values()):
+            if peer is exclude or item_id in peer.known:
+                continue
+            peer.known.add(item_id)
+            if not peer.pending_inv:
+                # Everything announced in this loop iteration goes in one inv
+                self._loop.call_soon(self._flush_inv, peer)
+            peer.pending_inv.append(item)
+
+    def _flush_inv(self, peer):
+        items, peer.pending_inv = peer.pending_inv, []
+        for start in range(0, len(items), MAX_INV_ITEMS):
+            peer.send_nowait({'type': 'inv', 'items': items[start:start + MAX_INV_ITEMS]})
+
+    def _call_soon_threadsafe(self, callback, *args):
+        if self._loop is not None and not self._stopping and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    def _on_local_block(self, block):
+        # Runs on the thread that connected the block
+        self._call_soon_threadsafe(self._announce_block, block.to_dict())
+
+    def _on_local_transactions(self, transactions):
+        self._call_soon_threadsafe(self._announce_transactions, transactions)
+
+    def _announce_block(self, data):
+        # Blocks received from peers are already seen and relayed
+        if self.seen.add(data['hash']):
+            self._announce([INV_BLOCK, data['hash'], data['index']], {'type': 'block', 'block': data})
+
+    def _announce_transactions(self, transactions):
+        for tx in transactions:
+            if self.seen.add(tx['id']):
+                self._announce([INV_TX, tx['id']], {'type': 'tx', 'tx': tx})
+
+
+def main():
+    """Run a standalone node: python -m src.networking.node --port 6001 --peer host:port"""
+    from ..blockchain import Blockchain
 
-    def connect_to_peer(self, peer_node):
-        self.peers.add(peer_node)
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6001)
+    parser.add_argument('--peer', action='append', default=[], help='host:port, repeatable')
+    parser.add_argument('--difficulty', type=int, default=4, help='genesis target, in leading zero hex digits')
+    parser.add_argument('--block-time', type=float, default=None, help='seconds; enables retargeting')
+    parser.add_argument('--retarget-interval', type=int, default=100)
+    args = parser.parse_args()
 
-    def broadcast_transaction(self, transaction):
-        for peer in self.peers:
-            peer.receive_transaction(transaction)
+    async def run():
+        blockchain = Blockchain(
+            difficulty=args.difficulty,
+            block_time=args.block_time,
+            retarget_interval=args.retarget_interval
+        )
+        node = Node(blockchain, host=args.host, port=args.port)
+        await node.start()
+        for peer in args.peer:
+            host, port = peer.rsplit(':', 1)
+            node.connect(host, int(port))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await node.stop()
 
-    def sync_blockchain(self, other_node):
-        if len(other_node.blockchain) > len(self.blockchain):
-            self.blockchain = other_node.blockchain
+    asyncio.run(run())
 
-    def receive_transaction(self, transaction):
-        # Logic to handle received transaction
-        pass
 
-    def add_block(self, block):
-        self.blockchain.append(block)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import json
+import struct
+
+# Every message is a 4-byte big-endian length followed by that many bytes
+# of UTF-8 JSON. Messages are dicts with a 'type' key.
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 32 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    """A peer sent a frame or message that breaks the protocol"""
+
+
+def encode_message(message):
+    """Frame a message dict for the wire"""
+    payload = json.dumps(message, separators=(',', ':')).encode()
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Message of {len(payload)} bytes exceeds the frame limit")
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def read_message(reader):
+    """
+    Read one framed message from an asyncio StreamReader
+
+    Raises:
+        asyncio.IncompleteReadError: If the connection closes mid-frame
+        ProtocolError: If the frame is too large or not a JSON object
+    """
+    header = await reader.readexactly(FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame of {length} bytes exceeds the limit")
+    payload = await reader.readexactly(length)
+    try:
+        message = json.loads(payload)
+    except ValueError as e:
+        raise ProtocolError(f"Invalid message: {e}")
+    if not isinstance(message, dict) or not isinstance(message.get('type'), str):
+        raise ProtocolError("Message must be an object with a type")
+    return message
@@ -0,0 +1,239 @@
+import asyncio
+from collections import deque
+
+from ..block import Block
+
+# Most headers a peer returns for one getheaders request
+MAX_HEADERS = 2000
+
+# Most blocks a peer returns for one getblocks request
+MAX_BLOCKS_PER_REQUEST = 64
+
+# Blocks fetched per getblocks request while downloading bodies
+WINDOW_SIZE = 16
+
+# getblocks requests kept in flight to each peer, so the download is
+# limited by bandwidth rather than by round trips
+MAX_IN_FLIGHT = 4
+
+# Blocks that may be downloaded ahead of the next one to be connected
+MAX_AHEAD = 1024
+
+# Seconds to wait for a single sync request
+SYNC_TIMEOUT = 30.0
+
+
+class ChainSync:
+    """
+    Headers-first chain synchronization for a Node
+
+    1. Every peer is sent a block locator and replies with the headers
+       following the last block the two chains share. Headers are a few
+       hundred bytes each, so their linkage and proof of work can be
+       checked for the whole chain before any body is downloaded.
+    2. Each candidate is compared with the local chain above the block
+       they share, and the one adding the most work over it wins.
+       Leading headers of blocks held locally are skipped. A candidate
+       that forks below the local tip is fed to the block tree, which
+       reorganizes onto it once its branch is heavier.
+    3. Bodies are downloaded in windows of consecutive blocks from every
+       peer whose headers agree with the chosen chain, several windows
+       per peer at a time, and connected in height order as they arrive.
+       A window that times out or comes back wrong is handed to another
+       peer.
+    """
+
+    def __init__(self, node, window_size=WINDOW_SIZE, max_in_flight=MAX_IN_FLIGHT,
+                 timeout=SYNC_TIMEOUT):
+        self.node = node
+        self.blockchain = node.blockchain
+        self.window_size = window_size
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._lock = asyncio.Lock()
+        self._scheduled = False
+
+    def schedule(self):
+        """Sync in the background soon, unless a sync is already waiting"""
+        if self._scheduled:
+            return
+        self._scheduled = True
+        self.node._spawn(self._run_scheduled())
+
+    async def sync(self):
+        """
+        Sync with all connected peers
+
+        Returns:
+            int: Number of blocks connected
+        """
+        async with self._lock:
+            return await self._sync()
+
+    async def _run_scheduled(self):
+        async with self._lock:
+            self._scheduled = False
+            try:
+                await self._sync()
+            except Exception as e:
+                print(f"Chain sync failed: {e}")
+
+    async def _sync(self):
+        peers = list(self.node.peers.values())
+        if not peers:
+            return 0
+        locator = await self.node._read_chain(self.blockchain.locator)
+        candidates = await asyncio.gather(*(self._fetch_headers(peer, locator) for peer in peers))
+
+        # Candidates fork at different heights, so each is measured by how
+        # much work it adds over the local chain above its own fork
+        best = None
+        local_work = {}
+        for peer, candidate in zip(peers, candidates):
+            if candidate is None or not candidate[1]:
+                continue
+            fork, headers = candidate
+            if fork not in local_work:
+                local_work[fork] = await self.node._read_chain(self.blockchain.chain_work, fork + 1)
+            work = sum(self.blockchain.pow.work(header['target']) for header in headers)
+            gain = work - local_work[fork]
+            if gain > 0 and (best is None or gain > best[2]):
+                best = (fork, headers, gain)
+        if best is None:
+            return 0
+
+        fork, headers, _ = best
+        sources = []
+        for peer, candidate in zip(peers, candidates):
+            if candidate is not None:
+                sources.append((peer, {header['hash'] for header in candidate[1]}))
+        connected = await self._download(headers, sources)
+        print(f"Synced {connected} blocks up to height {len(self.blockchain.chain) - 1}")
+        return connected
+
+    async def _fetch_headers(self, peer, locator):
+        """
+        Fetch and check a peer's headers past the last shared block
+
+        Returns:
+            tuple: (height of the last shared block, list of header dicts),
+                or None if the peer failed to answer or sent bad headers
+        """
+        known = dict((height, block_hash) for height, block_hash in locator)
+        headers = []
+        fork = None
+        request_locator = locator
+        while True:
+            try:
+                reply = await self.node.request(peer, {
+                    'type': 'getheaders', 'locator': request_locator, 'limit': MAX_HEADERS
+                }, timeout=self.timeout)
+            except (asyncio.TimeoutError, ConnectionError):
+                return None
+            batch = reply.get('headers') or []
+            if fork is None:
+                fork = reply.get('fork')
+                if fork not in known:
+                    return None
+                previous = {'index': fork, 'hash': known[fork]}
+            for header in batch:
+                try:
+                    valid = (
+                        header['index'] == previous['index'] + 1
+                        and header['previous_hash'] == previous['hash']
+                        and self.blockchain.pow.validate_header(header)
+                    )
+                except (KeyError, TypeError):
+                    valid = False
+                if not valid:
+                    print(f"Invalid header from peer {peer.node_id[:8]}")
+                    peer.close()
+                    return None
+                previous = header
+            headers.extend(batch)
+            if len(batch) < MAX_HEADERS:
+                break
+            request_locator = [[previous['index'], previous['hash']]]
+
+        skip = await self.node._read_chain(self._count_known, headers)
+        if skip:
+            fork = headers[skip - 1]['index']
+        return fork, headers[skip:]
+
+    def _count_known(self, headers):
+        """Length of the leading run of headers whose blocks are held locally"""
+        chain = self.blockchain.chain
+        low, high = 0, len(headers)
+        # Headers are linked, so the held ones form a prefix
+        while low < high:
+            middle = (low + high) // 2
+            header = headers[middle]
+            if header['index'] < len(chain) and chain[header['index']].hash == header['hash']:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    async def _download(self, headers, sources):
+        """Fetch the bodies for headers from sources and connect them in order"""
+        windows = deque(
+            headers[start:start + self.window_size]
+            for start in range(0, len(headers), self.window_size)
+        )
+        buffered = {}
+        state = {'next': headers[0]['index'], 'connected': 0, 'failed': False}
+        progress = asyncio.Condition()
+        connecting = asyncio.Lock()
+
+        def ready():
+            return not windows or state['failed'] or windows[0][0]['index'] - state['next'] < MAX_AHEAD
+
+        async def connect_ready():
+            async with connecting:
+                while state['next'] in buffered and not state['failed']:
+                    block = buffered.pop(state['next'])
+                    try:
+                        await self.node._run_on_chain(self.blockchain.add_external_block, block)
+                    except ValueError as e:
+                        print(f"Sync stopped at block {block.index}: {e}")
+                        state['failed'] = True
+                        return
+                    state['next'] += 1
+                    state['connected'] += 1
+
+        async def worker(peer, served):
+            while True:
+                async with progress:
+                    await progress.wait_for(ready)
+                if not windows or state['failed']:
+                    return
+                window = windows.popleft()
+                # A peer's headers agree with the chosen chain up to a point
+                if window[-1]['hash'] not in served:
+                    windows.appendleft(window)
+                    return
+                try:
+                    reply = await self.node.request(peer, {
+                        'type': 'getblocks',
+                        'items': [[header['index'], header['hash']] for header in window],
+                    }, timeout=self.timeout)
+                    blocks = [Block.from_dict(data) for data in reply.get('blocks') or []]
+                    if [block.hash for block in blocks] != [header['hash'] for header in window]:
+                        raise ValueError("unexpected blocks")
+                except (asyncio.TimeoutError, ConnectionError, KeyError, TypeError, ValueError):
+                    windows.appendleft(window)
+                    async with progress:
+                        progress.notify_all()
+                    return
+                for block in blocks:
+                    buffered[block.index] = block
+                await connect_ready()
+                async with progress:
+                    progress.notify_all()
+
+        await asyncio.gather(*(
+            worker(peer, served)
+            for peer, served in sources
+            for _ in range(self.max_in_flight)
+        ))
+        return state['connected']
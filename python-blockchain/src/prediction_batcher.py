@@ -0,0 +1,87 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Merges concurrent single predictions into batched model calls
+    
+    Callers submit one feature vector at a time; a background thread
+    collects everything that arrives within a short window (or until the
+    batch is full) and runs it through one predict_batch call.
+    """
+    
+    def __init__(self, predict_batch, window_ms=2.0, max_batch_size=64):
+        self.predict_batch = predict_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+        self._thread.start()
+        
+    def submit(self, features):
+        """Queue a feature vector, returning a Future for its prediction"""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((features, future))
+        return future
+        
+    def predict(self, features, timeout=None):
+        """Predict a single feature vector through the batcher"""
+        return self.submit(features).result(timeout)
+        
+    def close(self):
+        """Stop the batching thread once queued requests are served"""
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        
+    @property
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "average_batch_size": self.requests / self.batches if self.batches else 0.0
+        }
+        
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                
+            self._dispatch(batch)
+            if stopping:
+                return
+                
+    def _dispatch(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            results = self.predict_batch([features for features, _ in batch])
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        for future, result in zip(futures, results):
+            future.set_result(result)
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction results
+    
+    Keys combine the model version with the quantized feature vector, so
+    bumping the version invalidates every entry without touching the
+    cache; stale entries simply age out.
+    """
+    
+    def __init__(self, maxsize=4096, precision=6):
+        self.maxsize = maxsize
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+    def key(self, version, features):
+        return (version,) + tuple(round(float(f), self.precision) for f in features)
+        
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+            
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            
+    def __len__(self):
+        return len(self._entries)
+        
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils.crypto import verify_signature
+
+
+def _verify_chunk(items):
+    """
+    Check a chunk of (public_key, message, signature) triples, possibly
+    in a worker process with its own public key cache
+
+    Returns:
+        list: One bool per triple
+    """
+    return [verify_signature(public_key, message, signature) for public_key, message, signature in items]
+
+
+class SignatureVerifier:
+    """
+    Batched, cached verification of transaction signatures
+
+    The ids of transactions whose signatures checked out are remembered,
+    and an id covers the signature, the public key and the content, so a
+    transaction verified on entering the mempool is not verified again
+    when it arrives in a block. Batches larger than chunk_size are spread
+    over a pool of worker processes.
+    """
+
+    def __init__(self, workers=1, chunk_size=256, cache_size=100000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.hits = 0
+        self.checked = 0
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def verify(self, transactions):
+        """
+        Check the signatures of a batch of Transaction objects
+
+        A transaction passes if it is signed with the key its sender
+        address belongs to. Unsigned transactions fail.
+
+        Returns:
+            list: One bool per transaction
+        """
+        results = [False] * len(transactions)
+        tx_ids = [tx.tx_id for tx in transactions]
+        with self._lock:
+            for i, tx_id in enumerate(tx_ids):
+                if tx_id in self._verified:
+                    self._verified.move_to_end(tx_id)
+                    results[i] = True
+                    self.hits += 1
+
+        rows, items = [], []
+        for i, tx in enumerate(transactions):
+            if results[i] or not tx.is_signed or not tx.signed_by_sender():
+                continue
+            rows.append(i)
+            items.append((tx.public_key, tx.signing_hash(), tx.signature))
+        if not items:
+            return results
+
+        valid = self._verify_items(items)
+        with self._lock:
+            self.checked += len(items)
+            for i, ok in zip(rows, valid):
+                if ok:
+                    results[i] = True
+                    self._verified[tx_ids[i]] = None
+                    self._verified.move_to_end(tx_ids[i])
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return results
+
+    def _verify_items(self, items):
+        if self.workers <= 1 or len(items) <= self.chunk_size:
+            return _verify_chunk(items)
+        chunks = [items[start:start + self.chunk_size] for start in range(0, len(items), self.chunk_size)]
+        valid = []
+        for chunk_valid in self._ensure_pool().map(_verify_chunk, chunks):
+            valid.extend(chunk_valid)
+        return valid
+
+    def _ensure_pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    @property
+    def stats(self):
+        return {
+            "cached": len(self._verified),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "checked": self.checked,
+        }
+
+    def close(self):
+        """Shut down the worker pool, if any"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,264 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+from ..block import Block
+
+# Index entry per block height: segment number, byte offset, record length
+INDEX_ENTRY = struct.Struct('<IQI')
+# Record header in a segment file: payload length, crc32 of the payload
+RECORD_HEADER = struct.Struct('<II')
+
+
+class BlockStore:
+    """
+    Append-only on-disk block storage
+    
+    Blocks are appended as length-prefixed, checksummed JSON records to
+    numbered segment files. A fixed-width index file maps block height to
+    (segment, offset, length) and is memory-mapped, so any block can be
+    located in O(1). A lock serializes access to the map and files, so
+    blocks can be read from several threads while the chain is extended
+    or truncated. On open, records written after the last index entry
+    (e.g. by a process that crashed between the two writes) are replayed
+    into the index and a torn final record is truncated.
+    """
+    
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, sync=False):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync = sync
+        os.makedirs(directory, exist_ok=True)
+        
+        self._index_path = os.path.join(directory, 'index.bin')
+        self._index_file = open(self._index_path, 'a+b')
+        self._index_map = None
+        self._mapped_count = 0
+        self._readers = {}
+        self._lock = threading.RLock()
+        
+        size = os.path.getsize(self._index_path)
+        if size % INDEX_ENTRY.size:
+            # Drop a partially written index entry
+            size -= size % INDEX_ENTRY.size
+            self._index_file.truncate(size)
+        self._count = size // INDEX_ENTRY.size
+        
+        if self._count:
+            segment, offset, length = self._entry(self._count - 1)
+            self._segment = segment
+            self._offset = offset + RECORD_HEADER.size + length
+        else:
+            self._segment = 0
+            self._offset = 0
+        self._replay_tail()
+        self._writer = open(self._segment_path(self._segment), 'ab')
+        
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f'segment-{segment:06d}.log')
+        
+    def _replay_tail(self):
+        """Index complete records found past the last index entry"""
+        while True:
+            path = self._segment_path(self._segment)
+            if not os.path.exists(path):
+                return
+            with open(path, 'r+b') as f:
+                f.seek(self._offset)
+                while True:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    length, checksum = RECORD_HEADER.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != checksum:
+                        break
+                    self._write_index(self._segment, self._offset, length)
+                    self._offset += RECORD_HEADER.size + length
+                if os.path.getsize(path) > self._offset:
+                    f.truncate(self._offset)
+                    
+            next_path = self._segment_path(self._segment + 1)
+            if not os.path.exists(next_path):
+                return
+            self._segment += 1
+            self._offset = 0
+            
+    def _write_index(self, segment, offset, length):
+        self._index_file.write(INDEX_ENTRY.pack(segment, offset, length))
+        self._index_file.flush()
+        if self.sync:
+            os.fsync(self._index_file.fileno())
+        self._count += 1
+        
+    def _entry(self, height):
+        if height >= self._mapped_count:
+            self._remap()
+        start = height * INDEX_ENTRY.size
+        return INDEX_ENTRY.unpack_from(self._index_map, start)
+        
+    def _remap(self):
+        if self._index_map is not None:
+            self._index_map.close()
+        self._index_file.flush()
+        self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped_count = len(self._index_map) // INDEX_ENTRY.size
+        
+    def __len__(self):
+        return self._count
+        
+    def append(self, block):
+        """Append a block; its height must be the next one in the store"""
+        payload = json.dumps(block.to_dict(), separators=(',', ':')).encode()
+        with self._lock:
+            self._append(block, payload)
+            
+    def _append(self, block, payload):
+        if block.index != self._count:
+            raise ValueError(f"Expected block {self._count}, got {block.index}")
+            
+        if self._offset and self._offset + len(payload) > self.segment_size:
+            self._writer.close()
+            self._segment += 1
+            self._offset = 0
+            self._writer = open(self._segment_path(self._segment), 'ab')
+            
+        self._writer.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._writer.write(payload)
+        self._writer.flush()
+        if self.sync:
+            os.fsync(self._writer.fileno())
+        self._write_index(self._segment, self._offset, len(payload))
+        self._offset += RECORD_HEADER.size + len(payload)
+        
+    def truncate(self, height):
+        """
+        Drop every block at or above height, e.g. on a chain reorganization
+        
+        The index is cut first: should the process stop before the
+        segments are cut too, the dropped records are replayed on the
+        next open and the node is back on the old, still valid, chain.
+        """
+        with self._lock:
+            self._truncate(height)
+            
+    def _truncate(self, height):
+        if not 0 <= height <= self._count:
+            raise IndexError("Block height out of range")
+        if height == self._count:
+            return
+        segment, offset, _ = self._entry(height)
+        
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+            self._mapped_count = 0
+        self._index_file.truncate(height * INDEX_ENTRY.size)
+        self._index_file.flush()
+        self._count = height
+        
+        self._writer.close()
+        for later in range(segment + 1, self._segment + 1):
+            reader = self._readers.pop(later, None)
+            if reader is not None:
+                reader.close()
+            os.remove(self._segment_path(later))
+        with open(self._segment_path(segment), 'r+b') as f:
+            f.truncate(offset)
+        self._segment = segment
+        self._offset = offset
+        self._writer = open(self._segment_path(segment), 'ab')
+        
+    def read(self, height):
+        """Load the block at the given height"""
+        with self._lock:
+            if not 0 <= height < self._count:
+                raise IndexError("Block height out of range")
+            segment, offset, length = self._entry(height)
+            reader = self._readers.get(segment)
+            if reader is None:
+                reader = self._readers[segment] = open(self._segment_path(segment), 'rb')
+            payload = os.pread(reader.fileno(), length, offset + RECORD_HEADER.size)
+        return Block.from_dict(json.loads(payload))
+        
+    def iter_blocks(self, start=0, stop=None):
+        """Yield blocks in height order without holding them in memory"""
+        stop = self._count if stop is None else min(stop, self._count)
+        for height in range(start, stop):
+            yield self.read(height)
+            
+    def close(self):
+        with self._lock:
+            self._close()
+            
+    def _close(self):
+        self._writer.close()
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = {}
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+            self._mapped_count = 0
+        self._index_file.close()
+
+
+class PersistentChain:
+    """
+    List-like view of a chain kept in a BlockStore
+    
+    Only the most recently used blocks are held in memory, so resident
+    memory stays flat as the chain grows. The cache has its own lock so
+    several threads can read at once; reads that must not interleave
+    with pop() go through Blockchain.chain_lock.
+    """
+    
+    def __init__(self, store, cache_size=256):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self.store)
+        
+    def __getitem__(self, height):
+        if isinstance(height, slice):
+            return [self[i] for i in range(*height.indices(len(self)))]
+        if height < 0:
+            height += len(self)
+        with self._lock:
+            block = self._cache.get(height)
+            if block is not None:
+                self._cache.move_to_end(height)
+                return block
+        block = self.store.read(height)
+        self._remember(height, block)
+        return block
+        
+    def __iter__(self):
+        for height in range(len(self)):
+            yield self[height]
+            
+    def append(self, block):
+        self.store.append(block)
+        self._remember(block.index, block)
+        
+    def pop(self):
+        """Remove and return the last block"""
+        block = self[-1]
+        with self._lock:
+            self.store.truncate(block.index)
+            self._cache.pop(block.index, None)
+        return block
+        
+    def _remember(self, height, block):
+        with self._lock:
+            self._cache[height] = block
+            self._cache.move_to_end(height)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+class TrainingStore:
+    """
+    Columnar, append-only store for training rows
+    
+    Features live in one preallocated 2-D buffer and labels in a parallel
+    int8 array. Both grow by doubling, so appends are amortized O(1) and
+    the live rows are always available as contiguous NumPy views that
+    scikit-learn can consume without conversion.
+    """
+    
+    def __init__(self, n_features=4, dtype=np.float32, capacity=256):
+        self.n_features = n_features
+        self.dtype = np.dtype(dtype)
+        self._X = np.empty((capacity, n_features), dtype=self.dtype)
+        self._y = np.empty(capacity, dtype=np.int8)
+        self._size = 0
+        
+    @classmethod
+    def from_arrays(cls, X, y, n_features=4, dtype=np.float32):
+        """Create a store holding copies of the given rows and labels"""
+        X = np.asarray(X, dtype=dtype).reshape(-1, n_features)
+        store = cls(n_features=n_features, dtype=dtype, capacity=max(len(X), 1))
+        store.append(X, y)
+        return store
+        
+    @classmethod
+    def wrap(cls, X, y):
+        """
+        Create a store that uses the given arrays as its buffers
+        
+        No data is copied, so X and y may be read-only (e.g. views of an
+        mmap); the first append moves the rows into a new, larger buffer.
+        """
+        X = np.asarray(X)
+        y = np.asarray(y, dtype=np.int8)
+        if X.ndim != 2 or len(X) != len(y):
+            raise ValueError("Features and labels must have the same length")
+        store = cls(n_features=X.shape[1], dtype=X.dtype, capacity=0)
+        store._X, store._y = X, y
+        store._size = len(X)
+        return store
+        
+    def __len__(self):
+        return self._size
+        
+    @property
+    def X(self):
+        """Feature rows as a read-only view of the live part of the buffer"""
+        view = self._X[:self._size]
+        view.flags.writeable = False
+        return view
+        
+    @property
+    def y(self):
+        """Labels as a read-only view of the live part of the buffer"""
+        view = self._y[:self._size]
+        view.flags.writeable = False
+        return view
+        
+    @property
+    def nbytes(self):
+        """Bytes used by the live rows and labels"""
+        return self._size * (self._X.itemsize * self.n_features + self._y.itemsize)
+        
+    def append(self, X, y):
+        """Append rows and their labels, growing the buffers if needed"""
+        X = np.asarray(X, dtype=self.dtype).reshape(-1, self.n_features)
+        y = np.asarray(y, dtype=np.int8).reshape(-1)
+        if len(X) != len(y):
+            raise ValueError("Features and labels must have the same length")
+            
+        end = self._size + len(X)
+        # Wrapped buffers may be read-only; move to our own before writing
+        if end > len(self._X) or not self._X.flags.writeable:
+            self._grow(end)
+        self._X[self._size:end] = X
+        self._y[self._size:end] = y
+        self._size = end
+        
+    def truncate(self, size):
+        """Drop every row from position size onwards"""
+        if not 0 <= size <= self._size:
+            raise ValueError(f"Cannot truncate {self._size} rows to {size}")
+        self._size = size
+        
+    def _grow(self, required):
+        capacity = max(len(self._X), 1)
+        while capacity < required:
+            capacity *= 2
+        X = np.empty((capacity, self.n_features), dtype=self.dtype)
+        y = np.empty(capacity, dtype=np.int8)
+        X[:self._size] = self._X[:self._size]
+        y[:self._size] = self._y[:self._size]
+        self._X, self._y = X, y
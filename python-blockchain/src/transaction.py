@@ -1,44 +1,163 @@
+import math
+import numbers
 import time
 import json
 from enum import Enum
+import numpy as np
+from .utils.merkle import hash_transaction
+from .utils.crypto import address_from_public_key, sign_data, verify_signature
 
 class TransactionType(Enum):
     TRANSFER = "transfer"
     FLOWER_DATA = "flower_data"
 
+FLOWER_FEATURES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+FLOWER_TYPES = ["setosa", "versicolor", "virginica"]
+
+# Sender of the reward transaction that pays the miner of a block
+COINBASE_SENDER = "0"
+
+def _is_number(value):
+    """True for a finite real number other than a bool"""
+    return isinstance(value, numbers.Real) and not isinstance(value, bool) and math.isfinite(value)
+
+def _measurement(value):
+    """
+    A flower measurement as a float, or None if it is not one
+    
+    Only finite real numbers (or strings of one) count; bools and
+    containers are refused even where float() or NumPy would take them.
+    """
+    if isinstance(value, bool) or not isinstance(value, (numbers.Real, str)):
+        return None
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
 class Transaction:
-    def __init__(self, sender, recipient, amount=0, transaction_type=TransactionType.TRANSFER, data=None):
+    def __init__(self, sender, recipient, amount=0, transaction_type=TransactionType.TRANSFER, data=None, fee=0,
+                 public_key=None, signature=None):
         self.sender = sender
         self.recipient = recipient
         self.amount = amount
+        self.fee = fee
         self.timestamp = time.time()
         self.transaction_type = transaction_type
         self.data = data or {}
+        # Ed25519 public key (hex) of the sender's address and the
+        # signature (hex) of signing_hash(); both None if unsigned
+        self.public_key = public_key
+        self.signature = signature
         
-    def to_dict(self):
-        return {
+    def _content(self):
+        tx = {
             'sender': self.sender,
             'recipient': self.recipient,
             'amount': self.amount,
+            'fee': self.fee,
             'timestamp': self.timestamp,
             'type': self.transaction_type.value,
             'data': self.data
         }
+        if self.public_key is not None:
+            tx['public_key'] = self.public_key
+        return tx
+        
+    def to_dict(self):
+        tx = self._content()
+        if self.signature is not None:
+            tx['signature'] = self.signature
+        tx['id'] = hash_transaction(tx)
+        return tx
+        
+    def signing_hash(self):
+        """Hash of everything but the signature, which is what gets signed"""
+        return hash_transaction(self._content())
+        
+    def sign(self, private_key, public_key):
+        """Sign the transaction with a hex Ed25519 key pair of its sender"""
+        self.public_key = public_key
+        self.signature = sign_data(private_key, self.signing_hash())
+        return self.signature
         
-    def validate(self):
-        """Validate the transaction based on its type"""
+    @property
+    def is_signed(self):
+        return self.signature is not None
+        
+    def verify_signature(self):
+        """True if the transaction is signed by the key its sender address belongs to"""
+        if self.public_key is None or self.signature is None:
+            return False
+        return self.signed_by_sender() and verify_signature(
+            self.public_key, self.signing_hash(), self.signature
+        )
+        
+    def signed_by_sender(self):
+        """True if the attached public key belongs to the sender address"""
+        try:
+            return address_from_public_key(self.public_key) == self.sender
+        except (ValueError, TypeError):
+            return False
+        
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a transaction from the output of to_dict
+        
+        Raises:
+            ValueError: If a field is missing or malformed, or the id
+                does not match the transaction's contents
+        """
+        try:
+            tx = cls(
+                sender=data['sender'],
+                recipient=data['recipient'],
+                amount=data.get('amount', 0),
+                transaction_type=TransactionType(data['type']),
+                data=data.get('data'),
+                fee=data.get('fee', 0),
+                public_key=data.get('public_key'),
+                signature=data.get('signature')
+            )
+            tx.timestamp = data['timestamp']
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed transaction: {e}")
+        if 'id' in data and data['id'] != tx.tx_id:
+            raise ValueError("Transaction id does not match its contents")
+        return tx
+        
+    @property
+    def tx_id(self):
+        """Content hash identifying this transaction"""
+        return self.to_dict()['id']
+        
+    def validate(self, account_state=None):
+        """
+        Validate the transaction based on its type
+        
+        If an AccountState is given, transfers must also be covered by the
+        sender's available balance.
+        """
         if self.transaction_type == TransactionType.TRANSFER:
-            return self._validate_transfer()
+            return self._validate_transfer(account_state)
         elif self.transaction_type == TransactionType.FLOWER_DATA:
             return self._validate_flower_data()
         return False
         
-    def _validate_transfer(self):
+    def _validate_transfer(self, account_state=None):
         """Validate a cryptocurrency transfer transaction"""
+        if not _is_number(self.amount) or not _is_number(self.fee):
+            return False
         if self.amount <= 0:
             return False
+        if self.fee < 0:
+            return False
         if not self.sender or not self.recipient:
             return False
+        if account_state is not None and not account_state.can_spend(self.sender, self.amount + self.fee):
+            return False
         return True
         
     def _validate_flower_data(self):
@@ -47,26 +166,68 @@ class Transaction:
             return False
             
         # Check that data contains valid flower measurements
-        required_fields = ["sepal_length", "sepal_width", "petal_length", "petal_width", "flower_type"]
+        required_fields = FLOWER_FEATURES + ["flower_type"]
         if not all(field in self.data for field in required_fields):
             return False
             
         # Validate data types
-        try:
-            float(self.data["sepal_length"])
-            float(self.data["sepal_width"])
-            float(self.data["petal_length"])
-            float(self.data["petal_width"])
-        except (ValueError, TypeError):
+        if any(_measurement(self.data[field]) is None for field in FLOWER_FEATURES):
             return False
             
         # Check flower type is valid
-        valid_types = ["setosa", "versicolor", "virginica"]
-        if self.data["flower_type"] not in valid_types:
+        if self.data["flower_type"] not in FLOWER_TYPES:
             return False
             
         return True
         
+    @staticmethod
+    def validate_flower_batch(transactions):
+        """
+        Validate many flower data transactions at once
+        
+        Applies the same rules as _validate_flower_data, but converts the
+        measurements of the whole batch in one NumPy call and checks the
+        flower types with one membership test. Only a batch containing
+        anything but plain ints and floats falls back to checking each
+        measurement on its own.
+        
+        Args:
+            transactions (list): FLOWER_DATA Transaction objects
+        
+        Returns:
+            list: One bool per transaction
+        """
+        valid = np.array([
+            bool(tx.sender) and all(field in tx.data for field in FLOWER_FEATURES + ["flower_type"])
+            for tx in transactions
+        ], dtype=bool)
+        rows = np.flatnonzero(valid)
+        if not len(rows):
+            return valid.tolist()
+            
+        values = [[transactions[i].data[field] for field in FLOWER_FEATURES] for i in rows]
+        # NumPy would also take bools, None (as NaN) and one-element lists
+        if all(type(v) in (int, float) for row in values for v in row):
+            valid[rows] &= np.isfinite(np.asarray(values, dtype=np.float64)).all(axis=1)
+        else:
+            for i, row in zip(rows, values):
+                if any(_measurement(v) is None for v in row):
+                    valid[i] = False
+                    
+        flower_types = np.array([str(transactions[i].data["flower_type"]) for i in rows])
+        is_string = np.array([isinstance(transactions[i].data["flower_type"], str) for i in rows], dtype=bool)
+        valid[rows] &= np.isin(flower_types, FLOWER_TYPES) & is_string
+        return valid.tolist()
+        
+    @staticmethod
+    def create_coinbase_transaction(miner_address, amount):
+        """Factory method for the transaction rewarding a block's miner"""
+        return Transaction(
+            sender=COINBASE_SENDER,
+            recipient=miner_address,
+            amount=amount
+        )
+        
     @staticmethod
     def create_flower_data_transaction(sender, features, flower_type):
         """Factory method for creating flower data transactions"""
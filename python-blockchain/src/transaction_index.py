@@ -0,0 +1,218 @@
+import struct
+import threading
+from itertools import chain
+
+import numpy as np
+
+from .utils.merkle import hash_transaction
+
+# Binary form used in checkpoints
+#
+#   header   magic, format version, number of indexes, height
+#   indexes  per index: KIND_HEADER, the index name, the keys, the number
+#            of locations of each key, then every (height, position) pair
+#
+# Keys are the UTF-8 keys back to back, preceded by the byte length of
+# each, or with HASH_KEYS (every key a SHA-256 hex digest, as ids are)
+# just the raw 32-byte digests. All integers are little-endian; lengths,
+# counts and locations are uint32 arrays.
+MAGIC = b'TXINDEX\x00'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHHq')
+KIND_HEADER = struct.Struct('<HHQQQ')
+HASH_KEYS = 1
+HASH_SIZE = 32
+
+class TransactionIndex:
+    """
+    Secondary indexes over confirmed transactions
+    
+    Maps sender, recipient, transaction type, sender and type together,
+    and transaction id to the (block height, position in block) of every
+    matching transaction. The id index is what stops a confirmed
+    transaction from being replayed. Entries are appended as blocks are
+    connected, so each list is already in chain order and a page of
+    results is a plain slice.
+    """
+    
+    KINDS = ('sender', 'recipient', 'type', 'sender_type', 'id')
+    
+    def __init__(self, height=-1):
+        self._indexes = {kind: {} for kind in self.KINDS}
+        self.height = height
+        self._lock = threading.Lock()
+        
+    def add_block(self, block):
+        """Index every transaction in a connected block"""
+        with self._lock:
+            for position, tx in enumerate(block.transactions):
+                location = (block.index, position)
+                for kind in self.KINDS:
+                    key = self._key(tx, kind)
+                    if key is not None:
+                        self._indexes[kind].setdefault(key, []).append(location)
+            self.height = block.index
+                        
+    def remove_block(self, block):
+        """Drop the entries of the tip block, e.g. when it is disconnected"""
+        with self._lock:
+            for position in reversed(range(len(block.transactions))):
+                tx = block.transactions[position]
+                for kind in self.KINDS:
+                    key = self._key(tx, kind)
+                    locations = self._indexes[kind].get(key)
+                    # The tip block's entries are the last ones in each list
+                    if locations and locations[-1] == (block.index, position):
+                        locations.pop()
+                        if not locations:
+                            del self._indexes[kind][key]
+            self.height = block.index - 1
+                        
+    @staticmethod
+    def _key(tx, kind):
+        if kind == 'id':
+            # A block may carry a transaction without its id field
+            return tx.get('id') or hash_transaction(tx)
+        if kind == 'sender_type':
+            if tx.get('sender') is None or tx.get('type') is None:
+                return None
+            return TransactionIndex.sender_type_key(tx['sender'], tx['type'])
+        return tx.get(kind)
+        
+    @staticmethod
+    def sender_type_key(sender, tx_type):
+        """Key of the sender_type index, a string so snapshots stay JSON"""
+        return f"{tx_type}:{sender}"
+        
+    def contains(self, tx_id):
+        """True if a transaction with this id is confirmed"""
+        with self._lock:
+            return tx_id in self._indexes['id']
+            
+    def lookup(self, kind, key, offset=0, limit=50):
+        """
+        Return one page of locations for a key
+        
+        Returns:
+            tuple: (list of (height, position), total number of matches)
+        """
+        if kind not in self._indexes:
+            raise ValueError(f"Unknown index: {kind}")
+        with self._lock:
+            locations = self._indexes[kind].get(key, [])
+            return locations[offset:offset + limit], len(locations)
+            
+    def snapshot(self):
+        """JSON-serializable copy of the indexes"""
+        with self._lock:
+            return {
+                'height': self.height,
+                'indexes': {
+                    kind: {key: [list(location) for location in locations] for key, locations in index.items()}
+                    for kind, index in self._indexes.items()
+                },
+            }
+            
+    def serialize(self):
+        """
+        Encode the indexes in the compact binary form above
+        
+        Returns:
+            bytes: The encoded indexes
+        """
+        with self._lock:
+            parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(self._indexes), self.height)]
+            for kind, index in self._indexes.items():
+                name = kind.encode()
+                flags, keys = self._encode_keys([str(key) for key in index])
+                counts = np.fromiter(map(len, index.values()), dtype='<u4', count=len(index))
+                locations = np.fromiter(chain.from_iterable(chain.from_iterable(index.values())), dtype='<u4')
+                parts += [
+                    KIND_HEADER.pack(len(name), flags, len(index), len(keys), len(locations) // 2),
+                    name,
+                    keys,
+                    counts.tobytes(),
+                    locations.tobytes(),
+                ]
+            return b''.join(parts)
+            
+    @staticmethod
+    def _encode_keys(keys):
+        """Returns: tuple: (flags, encoded keys)"""
+        if keys and all(len(key) == 2 * HASH_SIZE for key in keys):
+            joined = ''.join(keys)
+            try:
+                digests = bytes.fromhex(joined)
+            except ValueError:
+                digests = None
+            # fromhex also takes upper case and spaces, which would not round-trip
+            if digests is not None and digests.hex() == joined:
+                return HASH_KEYS, digests
+        encoded = [key.encode() for key in keys]
+        lengths = np.fromiter(map(len, encoded), dtype='<u4', count=len(encoded))
+        return 0, lengths.tobytes() + b''.join(encoded)
+        
+    @staticmethod
+    def _decode_keys(flags, data, count):
+        if flags & HASH_KEYS:
+            digests = data.hex()
+            return [digests[i:i + 2 * HASH_SIZE] for i in range(0, len(digests), 2 * HASH_SIZE)]
+        ends = np.cumsum(np.frombuffer(data, '<u4', count)).tolist()
+        blob = data[4 * count:]
+        return [blob[start:end].decode() for start, end in zip([0] + ends, ends)]
+        
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuild an index from the output of serialize
+        
+        Raises:
+            ValueError: If data is truncated, corrupt or lacks one of KINDS
+        """
+        view = memoryview(data)
+        if len(view) < HEADER.size:
+            raise ValueError("Transaction index data is truncated")
+        magic, version, n_kinds, height = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a serialized transaction index")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported transaction index version {version}")
+            
+        index = cls(height=height)
+        found = set()
+        offset = HEADER.size
+        try:
+            for _ in range(n_kinds):
+                name_size, flags, n_keys, keys_size, n_locations = KIND_HEADER.unpack_from(view, offset)
+                offset += KIND_HEADER.size
+                kind = bytes(view[offset:offset + name_size]).decode()
+                offset += name_size
+                keys = cls._decode_keys(flags, bytes(view[offset:offset + keys_size]), n_keys)
+                offset += keys_size
+                location_ends = np.cumsum(np.frombuffer(view, '<u4', n_keys, offset)).tolist()
+                offset += 4 * n_keys
+                flat = np.frombuffer(view, '<u4', 2 * n_locations, offset).tolist()
+                offset += 8 * n_locations
+                if len(keys) != n_keys:
+                    raise ValueError("key count mismatch")
+                    
+                pairs = list(zip(flat[0::2], flat[1::2]))
+                index._indexes[kind] = {
+                    key: pairs[start:end] for key, start, end in zip(keys, [0] + location_ends, location_ends)
+                }
+                found.add(kind)
+        except (struct.error, ValueError) as e:
+            raise ValueError(f"Corrupt transaction index data: {e}")
+        missing = set(cls.KINDS) - found
+        if missing:
+            raise ValueError(f"Transaction index lacks {', '.join(sorted(missing))}")
+        return index
+        
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        index = cls(height=snapshot['height'])
+        for kind, entries in snapshot['indexes'].items():
+            index._indexes[kind] = {
+                key: [tuple(location) for location in locations] for key, locations in entries.items()
+            }
+        return index
@@ -1,39 +1,77 @@
+import hashlib
+from functools import lru_cache
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+
+# Parsed public keys kept by load_public_key
+PUBLIC_KEY_CACHE_SIZE = 4096
+
+
 def hash_data(data):
-    import hashlib
     return hashlib.sha256(data.encode()).hexdigest()
 
+
+def _encode(data):
+    return data.encode() if isinstance(data, str) else bytes(data)
+
+
+def generate_private_key():
+    """New Ed25519 private key as 64 hex digits"""
+    key = Ed25519PrivateKey.generate()
+    return key.private_bytes(
+        serialization.Encoding.Raw, serialization.PrivateFormat.Raw, serialization.NoEncryption()
+    ).hex()
+
+
+def public_key_from_private(private_key):
+    """Hex public key belonging to a hex private key"""
+    key = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(private_key))
+    return key.public_key().public_bytes(
+        serialization.Encoding.Raw, serialization.PublicFormat.Raw
+    ).hex()
+
+
+def address_from_public_key(public_key):
+    """Account address of a hex public key: the first 20 bytes of its SHA-256"""
+    return hashlib.sha256(bytes.fromhex(public_key)).hexdigest()[:40]
+
+
+def is_key_address(address):
+    """True if address has the shape of one derived from a public key"""
+    return isinstance(address, str) and len(address) == 40 and all(c in '0123456789abcdef' for c in address)
+
+
+@lru_cache(maxsize=PUBLIC_KEY_CACHE_SIZE)
+def load_public_key(public_key):
+    """
+    Parse a hex Ed25519 public key
+
+    Senders sign many transactions with the same key, so parsed keys are
+    cached.
+
+    Raises:
+        ValueError: If public_key is not a valid key
+    """
+    return Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_key))
+
+
 def sign_data(private_key, data):
-    from cryptography.hazmat.primitives.asymmetric import signing
-    from cryptography.hazmat.primitives import serialization
-    from cryptography.hazmat.backends import default_backend
-
-    private_key = serialization.load_pem_private_key(
-        private_key.encode(),
-        password=None,
-        backend=default_backend()
-    )
-    signature = private_key.sign(
-        data.encode(),
-        signing.Prehashed(hashlib.sha256())
-    )
-    return signature
+    """
+    Sign data with a hex Ed25519 private key
+
+    Returns:
+        str: The signature as 128 hex digits
+    """
+    key = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(private_key))
+    return key.sign(_encode(data)).hex()
+
 
 def verify_signature(public_key, data, signature):
-    from cryptography.hazmat.primitives.asymmetric import padding
-    from cryptography.hazmat.primitives import serialization
-    from cryptography.hazmat.backends import default_backend
-
-    public_key = serialization.load_pem_public_key(
-        public_key.encode(),
-        backend=default_backend()
-    )
+    """True if signature (hex) is public_key's signature of data"""
     try:
-        public_key.verify(
-            signature,
-            data.encode(),
-            padding.PKCS1v15(),
-            hashlib.sha256()
-        )
+        load_public_key(public_key).verify(bytes.fromhex(signature), _encode(data))
         return True
-    except Exception:
-        return False
\ No newline at end of file
+    except (InvalidSignature, ValueError, TypeError):
+        return False
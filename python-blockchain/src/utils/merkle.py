@@ -0,0 +1,88 @@
+import hashlib
+import json
+
+# Domain separation between leaves and interior nodes (as in RFC 6962), so
+# an interior node can never be passed off as a transaction.
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+
+def hash_transaction(transaction):
+    """
+    Hash a transaction dict over its canonical JSON encoding
+
+    The 'id' field, if present, is left out: it is this hash itself.
+    """
+    if 'id' in transaction:
+        transaction = {k: v for k, v in transaction.items() if k != 'id'}
+    encoded = json.dumps(transaction, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(LEAF_PREFIX + encoded).hexdigest()
+
+
+def hash_pair(left, right):
+    """Hash two child node digests (hex) into their parent digest"""
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+class MerkleTree:
+    """Merkle tree over transaction hashes, kept level by level for proofs"""
+
+    def __init__(self, leaves):
+        self.leaves = list(leaves)
+        self.levels = [self.leaves]
+        level = self.leaves
+        while len(level) > 1:
+            next_level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            # An unpaired node is promoted as-is instead of being duplicated
+            if len(level) % 2:
+                next_level.append(level[-1])
+            self.levels.append(next_level)
+            level = next_level
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        return cls(hash_transaction(tx) for tx in transactions)
+
+    @property
+    def root(self):
+        return self.levels[-1][0] if self.leaves else EMPTY_ROOT
+
+    def proof(self, position):
+        """
+        Build an inclusion proof for the leaf at the given position
+
+        Returns:
+            list: Sibling hashes from the leaf upwards, each as
+                {"hash": ..., "position": "left" | "right"}
+        """
+        if not 0 <= position < len(self.leaves):
+            raise IndexError("Leaf position out of range")
+
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = position ^ 1
+            if sibling < len(level):
+                proof.append({
+                    "hash": level[sibling],
+                    "position": "left" if sibling < position else "right"
+                })
+            position //= 2
+        return proof
+
+    @staticmethod
+    def verify_proof(leaf_hash, proof, root):
+        """Check that leaf_hash is committed to by root through proof"""
+        current = leaf_hash
+        for step in proof:
+            if step["position"] == "left":
+                current = hash_pair(step["hash"], current)
+            else:
+                current = hash_pair(current, step["hash"])
+        return current == root
+
+
+def merkle_root(transactions):
+    """Compute the Merkle root of a list of transaction dicts"""
+    return MerkleTree.from_transactions(transactions).root
@@ -1,20 +1,44 @@
+from .transaction import Transaction
+from .utils.crypto import (
+    address_from_public_key, generate_private_key, public_key_from_private, verify_signature
+)
+
+
 class Wallet:
-    def __init__(self):
-        self.private_key = self.generate_private_key()
+    """
+    An Ed25519 key pair and the account address derived from it
+
+    Keys are hex strings; pass an existing private key to restore a wallet.
+    """
+
+    def __init__(self, private_key=None):
+        self.private_key = private_key or self.generate_private_key()
         self.public_key = self.generate_public_key(self.private_key)
+        self.address = address_from_public_key(self.public_key)
 
     def generate_private_key(self):
-        # Implement private key generation logic
-        pass
+        return generate_private_key()
 
     def generate_public_key(self, private_key):
-        # Implement public key generation logic
-        pass
+        return public_key_from_private(private_key)
+
+    def create_transaction(self, recipient, amount, fee=0):
+        """Build a transfer from this wallet's address and sign it"""
+        transaction = Transaction(self.address, recipient, amount, fee=fee)
+        self.sign_transaction(transaction)
+        return transaction
 
     def sign_transaction(self, transaction):
-        # Implement transaction signing logic
-        pass
+        """
+        Sign a transaction sent from this wallet's address
+
+        Returns:
+            str: The signature, which is also attached to the transaction
+        """
+        if transaction.sender != self.address:
+            raise ValueError("Transaction is not sent from this wallet")
+        return transaction.sign(self.private_key, self.public_key)
 
     def validate_signature(self, transaction, signature):
-        # Implement signature validation logic
-        pass
\ No newline at end of file
+        """True if signature is this wallet's signature of the transaction"""
+        return verify_signature(self.public_key, transaction.signing_hash(), signature)
@@ -0,0 +1,97 @@
+import unittest
+from src.blockchain import Blockchain, MINING_REWARD
+from src.transaction import Transaction
+
+class TestAccountState(unittest.TestCase):
+
+    def setUp(self):
+        self.blockchain = Blockchain(difficulty=2, enforce_balances=True)
+        for _ in range(3):
+            self.blockchain.add_block(self.blockchain.last_block, miner_address="miner")
+
+    def test_mining_reward_credited(self):
+        self.assertEqual(self.blockchain.accounts.balance("miner"), 3 * MINING_REWARD)
+
+    def test_overspend_rejected(self):
+        with self.assertRaises(ValueError):
+            self.blockchain.add_transaction(Transaction("miner", "Bob", 4))
+        with self.assertRaises(ValueError):
+            self.blockchain.add_transaction(Transaction("0", "Bob", 1))
+
+    def test_pending_transfers_count_against_balance(self):
+        self.blockchain.add_transaction(Transaction("miner", "Bob", 2))
+        self.assertEqual(self.blockchain.accounts.available("miner"), 1)
+        with self.assertRaises(ValueError):
+            self.blockchain.add_transaction(Transaction("miner", "Carol", 2))
+
+        self.blockchain.add_block(self.blockchain.last_block, miner_address="miner")
+        balance = self.blockchain.balance("miner")
+        self.assertEqual(balance['balance'], 3 * MINING_REWARD - 2 + MINING_REWARD)
+        self.assertEqual(balance['nonce'], 1)
+        self.assertEqual(balance['pending'], 0)
+        self.assertEqual(self.blockchain.accounts.balance("Bob"), 2)
+
+    def test_balances_can_go_negative_unless_enforced(self):
+        blockchain = Blockchain(difficulty=2)
+        blockchain.add_transaction(Transaction("Alice", "Bob", 5, fee=1))
+        blockchain.add_block(blockchain.last_block, miner_address="miner")
+        balance = blockchain.balance("Alice")
+        self.assertEqual(balance['balance'], -6)
+        self.assertEqual(balance['nonce'], 1)
+        self.assertEqual(blockchain.accounts.balance("miner"), MINING_REWARD + 1)
+
+    def test_fees_paid_to_miner(self):
+        self.blockchain.add_transaction(Transaction("miner", "Bob", 1, fee=1))
+        self.blockchain.add_block(self.blockchain.last_block, miner_address="other")
+        self.assertEqual(self.blockchain.accounts.balance("other"), MINING_REWARD + 1)
+        self.assertEqual(self.blockchain.accounts.balance("miner"), 3 * MINING_REWARD - 2)
+
+    def test_rebuild_from_snapshot(self):
+        snapshot = self.blockchain.accounts.snapshot()
+        self.blockchain.add_transaction(Transaction("miner", "Bob", 2))
+        self.blockchain.add_block(self.blockchain.last_block, miner_address="miner")
+        expected = self.blockchain.accounts.snapshot()
+
+        self.assertEqual(self.blockchain.rebuild_account_state(snapshot).snapshot(), expected)
+        self.assertEqual(self.blockchain.rebuild_account_state().snapshot(), expected)
+
+    def _peer(self):
+        """A node that does not check balances, on the same chain"""
+        peer = Blockchain(difficulty=2)
+        for block in self.blockchain.chain[1:]:
+            peer.add_external_block(block)
+        return peer
+
+    def test_overspending_block_rejected(self):
+        peer = self._peer()
+        peer.add_transaction(Transaction("miner", "Bob", 10))
+        block = peer.add_block(peer.last_block, miner_address="peer")
+        with self.assertRaises(ValueError):
+            self.blockchain.add_external_block(block)
+        self.assertEqual(len(self.blockchain.chain), 4)
+        self.assertEqual(self.blockchain.accounts.balance("miner"), 3 * MINING_REWARD)
+
+        # Funds received earlier in the same block can be spent
+        peer = self._peer()
+        peer.add_transaction(Transaction("miner", "Bob", 3, fee=0))
+        peer.add_transaction(Transaction("Bob", "Carol", 2))
+        self.assertTrue(self.blockchain.add_external_block(peer.add_block(peer.last_block)))
+        self.assertEqual(self.blockchain.accounts.balance("Carol"), 2)
+
+    def test_overspending_branch_not_reorganized_onto(self):
+        peer = self._peer()
+        self.blockchain.add_block(self.blockchain.last_block, miner_address="miner")
+        tip = self.blockchain.last_block.hash
+        peer.add_transaction(Transaction("miner", "Bob", 10))
+        branch = [peer.add_block(peer.last_block) for _ in range(2)]
+
+        self.assertFalse(self.blockchain.add_external_block(branch[0]))
+        with self.assertRaises(ValueError):
+            self.blockchain.add_external_block(branch[1])
+        self.assertEqual(self.blockchain.last_block.hash, tip)
+        self.assertEqual(self.blockchain.accounts.balance("miner"), 4 * MINING_REWARD)
+        self.assertNotIn(branch[0].hash, self.blockchain.tree)
+        self.assertTrue(self.blockchain.validate_chain(full=True))
+
+if __name__ == '__main__':
+    unittest.main()
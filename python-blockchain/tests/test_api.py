@@ -0,0 +1,59 @@
+import json
+import unittest
+from src import api
+
+GOOD_FLOWER = {'sender': 'Alice', 'sepal_length': 5.1, 'sepal_width': 3.5,
+               'petal_length': 1.4, 'petal_width': 0.2, 'flower_type': 'setosa'}
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self):
+        self.client = api.app.test_client()
+
+    def test_malformed_flower_features_rejected(self):
+        bad_features = [[5.1], {'cm': 5.1}, 'wide']
+        items = [GOOD_FLOWER] + [dict(GOOD_FLOWER, sepal_length=value) for value in bad_features]
+        items.append(dict(GOOD_FLOWER, **{field: [GOOD_FLOWER[field]] for field in api.FEATURE_FIELDS}))
+
+        response = self.client.post('/flower/add/bulk', json=items)
+        self.assertEqual(response.status_code, 201)
+        statuses = [result['status'] for result in response.get_json()['results']]
+        self.assertEqual(statuses, ['accepted'] + ['rejected'] * 4)
+
+        for item in items[1:]:
+            # On its own in a batch, too, where nothing forces the slow path
+            results = self.client.post('/flower/add/bulk', json=[GOOD_FLOWER, item]).get_json()['results']
+            self.assertEqual([result['status'] for result in results], ['accepted', 'rejected'])
+            self.assertEqual(self.client.post('/flower/add', json=item).status_code, 400)
+
+    def test_non_numeric_amount_or_fee_rejected(self):
+        transfer = {'sender': 'Alice', 'recipient': 'Bob', 'amount': 5}
+        for bad in [{'fee': 'x'}, {'amount': '5'}, {'amount': True}, {'fee': [1]}, {'amount': None}]:
+            response = self.client.post('/transactions/new', json=dict(transfer, **bad))
+            self.assertEqual(response.status_code, 400)
+        results = self.client.post('/transactions/bulk', json=[dict(transfer, fee='x')]).get_json()['results']
+        self.assertEqual(results[0]['status'], 'rejected')
+
+    def test_bad_ndjson_line_rejects_only_that_item(self):
+        lines = [
+            json.dumps({'sender': 'Alice', 'recipient': 'Bob', 'amount': 1}),
+            '{"sender": "Alice", "recipient"',
+            json.dumps({'sender': 'Alice', 'recipient': 'Carol', 'amount': 2}),
+        ]
+        response = self.client.post('/transactions/bulk', data='\n'.join(lines),
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        results = response.get_json()['results']
+        self.assertEqual([result['status'] for result in results], ['accepted', 'rejected', 'accepted'])
+        self.assertEqual(results[1], {'index': 1, 'status': 'rejected', 'error': 'Invalid JSON'})
+
+    def test_balance_reports_negative_balances(self):
+        self.assertFalse(api.ENFORCE_BALANCES)
+        self.assertEqual(self.client.post('/transactions/new', json={
+            'sender': 'Overdrawn', 'recipient': 'Bob', 'amount': 3
+        }).status_code, 201)
+        api.blockchain.add_block(api.blockchain.last_block)
+        self.assertEqual(self.client.get('/balance/Overdrawn').get_json()['balance'], -3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,5 +27,25 @@ class TestBlock(unittest.TestCase):
         self.block.hash = self.block.calculate_hash()
         self.assertNotEqual(initial_hash, self.block.hash)
 
+    def test_midstate_hash_matches_full_hash(self):
+        block = Block(2, 'a' * 64, self.timestamp, [{'sender': 'Alice', 'recipient': 'Bob', 'amount': i} for i in range(50)])
+        midstate = block.midstate()
+        for nonce in (0, 1, 12345):
+            block.nonce = nonce
+            self.assertEqual(Block.hash_with_nonce(midstate, nonce), block.calculate_hash())
+
+    def test_header_size_independent_of_transactions(self):
+        small = Block(2, 'a' * 64, self.timestamp, [{'amount': 1}])
+        large = Block(2, 'a' * 64, self.timestamp, [{'amount': i} for i in range(1000)])
+        self.assertEqual(len(small.hash_prefix()), len(large.hash_prefix()))
+        self.assertNotEqual(small.merkle_root, large.merkle_root)
+
+    def test_header_dict_omits_transactions(self):
+        block = Block(2, 'a' * 64, self.timestamp, [{'amount': 1}, {'amount': 2}])
+        header = block.header_dict()
+        self.assertNotIn('transactions', header)
+        self.assertEqual(header['transaction_count'], 2)
+        self.assertEqual(header['merkle_root'], block.merkle_root)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
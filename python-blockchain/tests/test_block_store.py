@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.blockchain import Blockchain
+from src.storage.block_store import BlockStore, INDEX_ENTRY
+
+class TestBlockStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _chain_with_blocks(self, count):
+        blockchain = Blockchain(difficulty=1, store=BlockStore(self.directory, segment_size=512))
+        for i in range(count):
+            blockchain.add_flower_data(f"sender_{i}", [5.0, 3.4, 1.5, 0.2], "setosa")
+            blockchain.add_block(blockchain.last_block)
+        return blockchain
+
+    def test_restart_reloads_chain(self):
+        blockchain = self._chain_with_blocks(5)
+        hashes = [block.hash for block in blockchain.chain]
+        data_count = blockchain.ml_model.data_count
+        blockchain.store.close()
+
+        restarted = Blockchain(difficulty=1, store=BlockStore(self.directory, segment_size=512))
+        self.assertEqual([block.hash for block in restarted.chain], hashes)
+        self.assertEqual(restarted.ml_model.data_count, data_count)
+        self.assertTrue(restarted.validate_chain())
+        self.assertGreater(len([f for f in os.listdir(self.directory) if f.startswith('segment-')]), 1)
+
+        restarted.add_block(restarted.last_block)
+        self.assertEqual(restarted.chain[-1].previous_hash, hashes[-1])
+        restarted.store.close()
+
+    def test_unindexed_tail_is_replayed(self):
+        blockchain = self._chain_with_blocks(3)
+        last_hash = blockchain.last_block.hash
+        blockchain.store.close()
+
+        # Simulate a crash between the segment write and the index write
+        index_path = os.path.join(self.directory, 'index.bin')
+        with open(index_path, 'r+b') as f:
+            f.truncate(os.path.getsize(index_path) - INDEX_ENTRY.size)
+
+        store = BlockStore(self.directory, segment_size=512)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.read(3).hash, last_hash)
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
+import itertools
 import unittest
+from unittest.mock import patch
 from src.blockchain import Blockchain
 from src.block import Block
 from src.transaction import Transaction
@@ -17,6 +19,29 @@ class TestBlockchain(unittest.TestCase):
         new_block = self.blockchain.add_block(previous_block)
         self.assertEqual(new_block.index, previous_block.index + 1)
 
+    def test_failed_connect_returns_transactions_to_pool(self):
+        self.blockchain.add_flower_data("Alice", [5.1, 3.5, 1.4, 0.2], "setosa")
+        self.blockchain.add_transaction(Transaction("Alice", "Bob", 5))
+        data_count = self.blockchain.ml_model.data_count
+        with patch.object(self.blockchain.accounts, 'apply_block', side_effect=TypeError("unexpected failure")):
+            with self.assertRaises(TypeError):
+                self.blockchain.add_block(self.blockchain.last_block)
+        self.assertEqual(len(self.blockchain.chain), 1)
+        self.assertEqual(len(self.blockchain.current_transactions), 2)
+        self.assertEqual(self.blockchain.ml_model.data_count, data_count)
+
+        block = self.blockchain.add_block(self.blockchain.last_block)
+        self.assertEqual(len(block.transactions), 2)
+
+    def test_add_block_on_stale_tip_rejected(self):
+        blockchain = Blockchain(difficulty=1)
+        previous_block = blockchain.last_block
+        blockchain.add_block(previous_block)
+        with self.assertRaises(ValueError):
+            blockchain.add_block(previous_block)
+        self.assertEqual(len(blockchain.chain), 2)
+        self.assertTrue(blockchain.validate_chain(full=True))
+
     def test_validate_chain(self):
         self.blockchain.add_block(self.blockchain.chain[-1])
         self.assertTrue(self.blockchain.validate_chain())
@@ -25,10 +50,142 @@ class TestBlockchain(unittest.TestCase):
         self.blockchain.chain[1].previous_hash = 'invalid_hash'
         self.assertFalse(self.blockchain.validate_chain())
 
+    def test_incremental_validation(self):
+        for _ in range(3):
+            self.blockchain.add_block(self.blockchain.chain[-1])
+        self.assertTrue(self.blockchain.validate_chain())
+
+        # Tampering below the watermark is only caught by a full audit
+        self.blockchain.chain[1].transactions.append({'sender': 'Mallory', 'amount': 1})
+        self.assertTrue(self.blockchain.validate_chain())
+        self.assertFalse(self.blockchain.validate_chain(full=True))
+
+    def test_incremental_validation_detects_new_block(self):
+        self.blockchain.add_block(self.blockchain.chain[-1])
+        self.assertTrue(self.blockchain.validate_chain())
+        self.blockchain.add_block(self.blockchain.chain[-1])
+        self.blockchain.chain[-1].previous_hash = 'invalid_hash'
+        self.assertFalse(self.blockchain.validate_chain())
+
+    def test_parallel_full_validation(self):
+        for _ in range(6):
+            self.blockchain.add_block(self.blockchain.chain[-1])
+        self.assertIsNone(self.blockchain.find_invalid_height(workers=2))
+
+        self.blockchain.chain[4].transactions.append({'sender': 'Mallory', 'amount': 1})
+        self.assertEqual(self.blockchain.find_invalid_height(workers=2), 4)
+        self.assertFalse(self.blockchain.validate_chain(full=True, workers=2))
+
+    def test_locator_and_headers(self):
+        blockchain = Blockchain(difficulty=1)
+        for _ in range(20):
+            blockchain.add_block(blockchain.last_block)
+        locator = blockchain.locator()
+        self.assertEqual(locator[0], [20, blockchain.last_block.hash])
+        self.assertEqual(locator[-1][0], 0)
+        self.assertEqual(blockchain.find_fork(locator), 20)
+        self.assertEqual(blockchain.find_fork([[25, 'x'], [3, blockchain.chain[3].hash]]), 3)
+
+        headers = blockchain.headers(5, 3)
+        self.assertEqual([header['index'] for header in headers], [5, 6, 7])
+        self.assertTrue(all(blockchain.pow.validate_header(header) for header in headers))
+        headers[0]['nonce'] += 1
+        self.assertFalse(blockchain.pow.validate_header(headers[0]))
+
+    def test_retarget_toward_block_time(self):
+        blockchain = Blockchain(difficulty=1, block_time=60, retarget_interval=4)
+        for _ in range(9):
+            blockchain.add_block(blockchain.last_block)
+        targets = [block.target for block in blockchain.chain]
+        # Blocks come far faster than one a minute, so the target drops
+        # by the maximum factor at height 8 and holds until the next retarget
+        self.assertEqual(targets[1:8], [targets[0]] * 7)
+        self.assertEqual(targets[8], targets[0] // 4)
+        self.assertEqual(targets[9], targets[8])
+        self.assertTrue(blockchain.validate_chain(full=True))
+
+        blockchain.chain[9].target = targets[0]
+        self.assertEqual(blockchain.find_invalid_height(), 9)
+
+    def test_external_blocks_honor_target_schedule(self):
+        local = Blockchain(difficulty=1, block_time=60, retarget_interval=4)
+        remote = Blockchain(difficulty=1, block_time=60, retarget_interval=4)
+        for _ in range(8):
+            local.add_block(local.last_block)
+        # The remote branch crosses a retarget height as a side branch
+        for _ in range(9):
+            remote.add_block(remote.last_block)
+        for block in remote.chain[1:]:
+            local.add_external_block(block)
+        self.assertEqual(local.last_block.hash, remote.last_block.hash)
+        self.assertEqual(local.last_block.target, remote.chain[0].target // 4)
+
+        stale = Block(10, local.last_block.hash, local.last_block.timestamp + 1, [],
+                      target=remote.chain[0].target)
+        local.pow.mine(stale)
+        with self.assertRaises(ValueError):
+            local.add_external_block(stale)
+
+    def test_longer_but_lighter_branch(self):
+        def mine(blockchain, blocks, spacing):
+            clock = itertools.count(1000, spacing)
+            with patch('src.blockchain.time.time', side_effect=lambda: next(clock)):
+                for _ in range(blocks):
+                    blockchain.add_block(blockchain.last_block)
+
+        local = Blockchain(difficulty=2, block_time=10, retarget_interval=2)
+        remote = Blockchain(difficulty=2, block_time=10, retarget_interval=2)
+        # Fast blocks raise the difficulty, slow blocks lower it
+        mine(local, 6, 1)
+        mine(remote, 8, 100)
+        self.assertGreater(local.chain_work(), remote.chain_work())
+
+        results = [local.add_external_block(block) for block in remote.chain[1:]]
+        self.assertEqual(results, [False] * 8)
+        self.assertEqual(len(local.chain), 7)
+        self.assertIn(remote.last_block.hash, local.tree)
+
     def test_add_transaction(self):
         transaction = Transaction("Alice", "Bob", 50)
         self.blockchain.add_transaction(transaction)
         self.assertEqual(len(self.blockchain.current_transactions), 1)
 
+    def test_find_transactions_by_index(self):
+        self.blockchain.add_transaction(Transaction("Alice", "Bob", 5))
+        self.blockchain.add_flower_data("Alice", [5.1, 3.5, 1.4, 0.2], "setosa")
+        self.blockchain.add_block(self.blockchain.chain[-1])
+        self.blockchain.add_transaction(Transaction("Alice", "Carol", 7))
+        self.blockchain.add_block(self.blockchain.chain[-1])
+
+        sent = self.blockchain.find_transactions('sender', 'Alice')
+        self.assertEqual(sent['total'], 3)
+        self.assertEqual([t['block_index'] for t in sent['transactions']], [1, 1, 2])
+
+        page = self.blockchain.find_transactions('sender', 'Alice', offset=2, limit=1)
+        self.assertEqual(page['transactions'][0]['transaction']['recipient'], 'Carol')
+
+        flowers = self.blockchain.find_transactions('type', 'flower_data')
+        self.assertEqual(flowers['total'], 1)
+        own_flowers = self.blockchain.find_transactions('sender', 'Alice', tx_type='flower_data')
+        self.assertEqual(own_flowers['total'], 1)
+        self.assertEqual(own_flowers['transactions'][0]['transaction']['type'], 'flower_data')
+        self.assertEqual(self.blockchain.find_transactions('sender', 'Bob', tx_type='transfer')['total'], 0)
+        self.assertEqual(self.blockchain.find_transactions('recipient', 'Nobody')['total'], 0)
+
+    def test_add_transactions_reports_per_item(self):
+        duplicate = Transaction("Alice", "Bob", 5)
+        results = self.blockchain.add_transactions([
+            duplicate,
+            Transaction("Alice", "Bob", -1),
+            Transaction.create_flower_data_transaction("Carol", [5.1, 3.5, 1.4, 0.2], "setosa"),
+            Transaction.create_flower_data_transaction("Carol", [5.1, 3.5, 1.4, 0.2], "rose"),
+            duplicate,
+        ])
+        self.assertEqual([error for _, error in results], [
+            None, "Invalid transaction", None, "Invalid transaction", "Duplicate transaction"
+        ])
+        self.assertEqual(results[0][0], duplicate.tx_id)
+        self.assertEqual(len(self.blockchain.current_transactions), 2)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
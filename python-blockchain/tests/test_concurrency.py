@@ -0,0 +1,41 @@
+import threading
+import unittest
+from benchmarks.stress_mempool import run
+from src.ml_model import IrisModel
+
+class TestConcurrency(unittest.TestCase):
+
+    def test_no_transactions_lost_under_parallel_submission(self):
+        result = run(threads=4, per_thread=100, difficulty=2)
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(result['mined'], result['submitted'])
+        self.assertEqual(result['unique'], result['submitted'])
+        self.assertTrue(result['valid'])
+
+    def test_predictions_during_training(self):
+        model = IrisModel()
+        errors = []
+        done = threading.Event()
+
+        def train():
+            for _ in range(50):
+                model.add_data_points([[6.3, 3.3, 6.0, 2.5]] * 10, ['virginica'] * 10)
+                model.predict([6.3, 3.3, 6.0, 2.5])
+            done.set()
+
+        def predict():
+            while not done.is_set():
+                result = model.predict([5.1, 3.5, 1.4, 0.2])
+                if result.get('predicted_class') != 'setosa':
+                    errors.append(result)
+
+        threads = [threading.Thread(target=train)] + [threading.Thread(target=predict) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(model.data_count, 120 + 500)
+
+if __name__ == '__main__':
+    unittest.main()
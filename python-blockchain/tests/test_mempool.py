@@ -0,0 +1,76 @@
+import unittest
+from src.mempool import Mempool
+from src.transaction import Transaction
+from src.utils.merkle import hash_transaction
+
+class TestMempool(unittest.TestCase):
+
+    def setUp(self):
+        self.mempool = Mempool(max_size=10, max_block_transactions=3)
+
+    def _tx(self, amount, fee=0, timestamp=None):
+        tx = Transaction("Alice", "Bob", amount, fee=fee)
+        if timestamp is not None:
+            tx.timestamp = timestamp
+        return tx.to_dict()
+
+    def test_transaction_id_is_content_hash(self):
+        tx = self._tx(5)
+        self.assertEqual(self.mempool.add(tx), tx['id'])
+        self.assertEqual(tx['id'], hash_transaction(tx))
+
+    def test_duplicate_rejected(self):
+        tx = self._tx(5)
+        self.mempool.add(tx)
+        with self.assertRaises(ValueError):
+            self.mempool.add(dict(tx))
+        self.assertEqual(len(self.mempool), 1)
+
+    def test_pool_size_cap(self):
+        for i in range(10):
+            self.mempool.add(self._tx(i + 1))
+        with self.assertRaises(ValueError):
+            self.mempool.add(self._tx(100))
+
+    def test_select_orders_by_fee_then_age(self):
+        low = self._tx(1, fee=0, timestamp=1)
+        old = self._tx(2, fee=1, timestamp=2)
+        new = self._tx(3, fee=1, timestamp=3)
+        high = self._tx(4, fee=5, timestamp=4)
+        for tx in (low, new, high, old):
+            self.mempool.add(tx)
+
+        self.assertEqual(self.mempool.select(), [high, old, new])
+        self.assertEqual(self.mempool.pending(), [low])
+        self.assertEqual(self.mempool.oldest_timestamp(), 1)
+
+    def test_select_respects_byte_limit(self):
+        mempool = Mempool(max_block_bytes=Mempool.transaction_size(self._tx(1)) + 10)
+        first, second = self._tx(1, timestamp=1), self._tx(2, timestamp=2)
+        mempool.add(first)
+        mempool.add(second)
+        self.assertEqual(mempool.select(), [first])
+        self.assertEqual(mempool.select(), [second])
+
+    def test_restore_after_select(self):
+        tx = self._tx(1)
+        self.mempool.add(tx)
+        self.mempool.restore(self.mempool.select())
+        self.assertEqual(self.mempool.pending(), [tx])
+
+    def test_heaps_stay_bounded_behind_old_transaction(self):
+        pool = Mempool(max_block_transactions=10)
+        # An old, low-fee transaction sits at the top of the age heap
+        pool.add(self._tx(1, fee=0, timestamp=1))
+        for round in range(500):
+            for i in range(10):
+                pool.add(self._tx(1, fee=1, timestamp=2 + round * 10 + i))
+            self.assertEqual(len(pool.select()), 10)
+            pool.oldest_timestamp()
+        self.assertEqual(len(pool), 1)
+        self.assertLess(len(pool._by_priority), 100)
+        self.assertLess(len(pool._by_age), 100)
+        self.assertEqual(pool.oldest_timestamp(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
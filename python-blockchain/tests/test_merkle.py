@@ -0,0 +1,40 @@
+import unittest
+import time
+from src.block import Block
+from src.utils.merkle import MerkleTree, EMPTY_ROOT, hash_transaction, merkle_root
+
+class TestMerkleTree(unittest.TestCase):
+
+    def setUp(self):
+        self.transactions = [
+            {'sender': f'sender_{i}', 'recipient': 'Bob', 'amount': i}
+            for i in range(9)
+        ]
+
+    def test_empty_tree(self):
+        self.assertEqual(merkle_root([]), EMPTY_ROOT)
+
+    def test_proofs_verify_for_every_size(self):
+        for size in range(1, len(self.transactions) + 1):
+            tree = MerkleTree.from_transactions(self.transactions[:size])
+            for position, tx in enumerate(self.transactions[:size]):
+                proof = tree.proof(position)
+                self.assertLessEqual(len(proof), size.bit_length())
+                self.assertTrue(MerkleTree.verify_proof(hash_transaction(tx), proof, tree.root))
+
+    def test_proof_rejects_other_transaction(self):
+        tree = MerkleTree.from_transactions(self.transactions)
+        proof = tree.proof(2)
+        self.assertFalse(MerkleTree.verify_proof(hash_transaction(self.transactions[3]), proof, tree.root))
+
+    def test_block_inclusion_proof(self):
+        block = Block(1, '0' * 64, time.time(), self.transactions)
+        tx_id = block.transaction_ids()[4]
+        result = block.inclusion_proof(tx_id)
+        self.assertEqual(result['position'], 4)
+        self.assertEqual(result['transaction'], self.transactions[4])
+        self.assertTrue(MerkleTree.verify_proof(tx_id, result['proof'], block.merkle_root))
+        self.assertIsNone(block.inclusion_proof('f' * 64))
+
+if __name__ == '__main__':
+    unittest.main()
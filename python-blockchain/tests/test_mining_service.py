@@ -0,0 +1,38 @@
+import time
+import unittest
+from src.blockchain import Blockchain
+from src.mining_service import BackgroundMiner
+from src.transaction import Transaction
+
+class TestBackgroundMiner(unittest.TestCase):
+
+    def setUp(self):
+        self.blockchain = Blockchain(difficulty=2)
+
+    def test_submit_and_wait(self):
+        miner = BackgroundMiner(self.blockchain)
+        try:
+            self.blockchain.add_transaction(Transaction("Alice", "Bob", 5))
+            job_id = miner.submit()
+            job = miner.wait(job_id, timeout=10)
+        finally:
+            miner.stop()
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['block']['index'], 1)
+        self.assertEqual(len(self.blockchain.chain), 2)
+        self.assertIsNone(miner.status('unknown'))
+
+    def test_auto_mine_on_pool_size(self):
+        miner = BackgroundMiner(self.blockchain, auto_mine_size=2, poll_interval=0.01)
+        try:
+            self.blockchain.add_transaction(Transaction("Alice", "Bob", 5))
+            self.blockchain.add_transaction(Transaction("Bob", "Carol", 2))
+            deadline = time.time() + 10
+            while len(self.blockchain.chain) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            miner.stop()
+        self.assertEqual(len(self.blockchain.chain[1].transactions), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+from unittest import mock
+import numpy as np
+from src.ml_model import IrisModel
+from src.training_store import TrainingStore
+from src.prediction_batcher import MicroBatcher
+
+class TestIrisModel(unittest.TestCase):
+
+    def setUp(self):
+        self.model = IrisModel()
+        self.new_points = [
+            [5.0, 3.4, 1.5, 0.2],
+            [6.1, 2.8, 4.7, 1.2],
+            [7.7, 3.0, 6.1, 2.3],
+        ]
+        self.new_labels = ['setosa', 'versicolor', 'virginica']
+
+    def test_add_data_point(self):
+        count = self.model.data_count
+        self.assertTrue(self.model.add_data_point(self.new_points[0], 'setosa'))
+        self.assertFalse(self.model.add_data_point(self.new_points[0], 'rose'))
+        self.assertEqual(self.model.data_count, count + 1)
+
+    def test_batched_update_matches_full_refit(self):
+        added = self.model.add_data_points(self.new_points + [[1, 2]], self.new_labels + ['setosa'])
+        self.assertEqual(added, 3)
+
+        incremental_mean = self.model.scaler.mean_.copy()
+        incremental_var = self.model.scaler.var_.copy()
+        incremental_prediction = self.model.predict([6.0, 2.9, 4.5, 1.5])
+
+        self.model._train_model()
+        np.testing.assert_allclose(incremental_mean, self.model.scaler.mean_)
+        np.testing.assert_allclose(incremental_var, self.model.scaler.var_)
+        self.assertEqual(incremental_prediction, self.model.predict([6.0, 2.9, 4.5, 1.5]))
+
+    def test_serialize_round_trip(self):
+        self.model.add_data_points(self.new_points, self.new_labels)
+        restored = IrisModel.deserialize(self.model.serialize())
+        np.testing.assert_array_equal(restored.X, self.model.X)
+        np.testing.assert_array_equal(restored.y, self.model.y)
+        self.assertEqual(restored.data_count, self.model.data_count)
+        np.testing.assert_allclose(restored.scaler.mean_, self.model.scaler.mean_)
+        self.assertEqual(restored.predict([6.0, 2.9, 4.5, 1.5]), self.model.predict([6.0, 2.9, 4.5, 1.5]))
+
+    def test_serialized_format(self):
+        data = self.model.serialize()
+        self.assertTrue(data.startswith(b'IRISMDL'))
+        compressed = self.model.serialize(compression='zlib')
+        self.assertLess(len(compressed), len(data))
+        restored = IrisModel.from_bytes(compressed)
+        np.testing.assert_array_equal(restored.X_test, self.model.X_test)
+
+        # Uncompressed arrays are used in place until new rows arrive
+        restored = IrisModel.from_bytes(data)
+        self.assertFalse(restored.X.flags.owndata)
+        restored.add_data_points(self.new_points, self.new_labels)
+        self.assertEqual(len(restored.X), len(self.model.X) + 3)
+
+        corrupt = bytearray(data)
+        corrupt[-1] ^= 0xFF
+        with self.assertRaises(ValueError):
+            IrisModel.from_bytes(bytes(corrupt))
+        self.assertFalse(IrisModel.deserialize(b'not a model').is_trained)
+
+    def test_evaluation_is_memoized_per_version(self):
+        first = self.model.evaluate_model()
+        with mock.patch('src.ml_model.classification_report') as report:
+            second = self.model.evaluate_model()
+            report.assert_not_called()
+        self.assertEqual(first, second)
+
+        self.model.add_data_points(self.new_points, self.new_labels)
+        third = self.model.evaluate_model()
+        self.assertGreater(third['model_version'], first['model_version'])
+        self.assertEqual(third['data_points_trained'], first['data_points_trained'] + 3)
+
+    def test_rollback_restores_training_state(self):
+        mark = self.model.mark()
+        X, mean = self.model.X.copy(), self.model.scaler.mean_.copy()
+        prediction = self.model.predict([6.0, 2.9, 4.5, 1.5])
+        self.model.add_data_points(self.new_points * 5, self.new_labels * 5)
+
+        self.model.rollback(mark)
+        np.testing.assert_array_equal(self.model.X, X)
+        np.testing.assert_allclose(self.model.scaler.mean_, mean)
+        self.assertEqual(self.model.data_count, len(X))
+        self.assertEqual(self.model.predict([6.0, 2.9, 4.5, 1.5]), prediction)
+
+    def test_predict_batch_matches_predict(self):
+        rows = self.new_points + [[1, 2]]
+        results = self.model.predict_batch(rows)
+        self.assertEqual(len(results), 4)
+        for features, result in zip(self.new_points, results):
+            self.assertEqual(result, self.model.predict(features))
+        self.assertIn('error', results[3])
+
+    def test_prediction_cache(self):
+        features = [5.8, 2.7, 5.1, 1.9]
+        first = self.model.predict(features)
+        first['confidence'] = -1
+        second = self.model.predict(features)
+        self.assertNotEqual(second['confidence'], -1)
+        self.assertEqual(self.model.prediction_cache.hits, 1)
+
+        version = self.model.version
+        self.model.add_data_point(features, 'versicolor')
+        self.assertGreater(self.model.version, version)
+        self.model.predict(features)
+        self.assertEqual(self.model.prediction_cache.hits, 1)
+        self.assertEqual(self.model.prediction_cache.misses, 2)
+
+    def test_micro_batcher(self):
+        batcher = MicroBatcher(self.model.predict_batch, window_ms=20)
+        try:
+            futures = [batcher.submit(features) for features in self.new_points]
+            results = [future.result(timeout=5) for future in futures]
+        finally:
+            batcher.close()
+        self.assertEqual(results, self.model.predict_batch(self.new_points))
+        self.assertLessEqual(batcher.stats['batches'], 3)
+
+
+class TestTrainingStore(unittest.TestCase):
+
+    def test_append_grows_by_doubling(self):
+        store = TrainingStore(capacity=2)
+        for i in range(5):
+            store.append([[i, i, i, i]], [i % 3])
+        self.assertEqual(len(store), 5)
+        self.assertEqual(len(store._X), 8)
+        self.assertEqual(store.X.shape, (5, 4))
+        self.assertEqual(store.y.tolist(), [0, 1, 2, 0, 1])
+        self.assertEqual(store.nbytes, 5 * 17)
+
+    def test_wrap_copies_on_first_append(self):
+        X = np.arange(8, dtype=np.float32).reshape(2, 4)
+        X.flags.writeable = False
+        store = TrainingStore.wrap(X, np.array([0, 1], dtype=np.int8))
+        self.assertTrue(np.shares_memory(store.X, X))
+        store.append([[9, 9, 9, 9]], [2])
+        self.assertEqual(store.X.tolist()[-1], [9, 9, 9, 9])
+        self.assertEqual(X.tolist()[0], [0, 1, 2, 3])
+
+    def test_views_are_read_only(self):
+        store = TrainingStore.from_arrays([[1, 2, 3, 4]], [0])
+        with self.assertRaises(ValueError):
+            store.X[0, 0] = 9
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from src.blockchain import Blockchain
+from src.model_checkpoint import CheckpointManager
+from src.storage.block_store import BlockStore
+from src.transaction_index import TransactionIndex
+
+class TestModelCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint_dir = os.path.join(self.directory, 'checkpoints')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _open(self, interval=2):
+        return Blockchain(
+            difficulty=1,
+            store=BlockStore(self.directory),
+            checkpoints=CheckpointManager(self.checkpoint_dir, interval=interval, keep=2)
+        )
+
+    def _mine(self, blockchain, count):
+        for i in range(count):
+            blockchain.add_flower_data(f"sender_{i}", [6.7, 3.0, 5.2, 2.3], "virginica")
+            blockchain.add_block(blockchain.last_block, miner_address="miner")
+
+    def test_checkpoints_are_written_and_pruned(self):
+        blockchain = self._open()
+        self._mine(blockchain, 7)
+        heights = [height for height, _ in blockchain.checkpoints.checkpoints()]
+        self.assertEqual(heights, [6, 4])
+        blockchain.store.close()
+
+    def test_restart_resumes_from_checkpoint(self):
+        blockchain = self._open()
+        self._mine(blockchain, 5)
+        data_count = blockchain.ml_model.data_count
+        balance = blockchain.balance("miner")
+        by_type = blockchain.find_transactions('type', 'flower_data')
+        blockchain.store.close()
+
+        # The bundled dataset must not be reloaded when a checkpoint exists
+        with mock.patch('src.ml_model.load_iris') as load_dataset:
+            restarted = self._open()
+            load_dataset.assert_not_called()
+
+        self.assertEqual(restarted.ml_model.data_count, data_count)
+        self.assertEqual(restarted.balance("miner"), balance)
+        self.assertEqual(restarted.find_transactions('type', 'flower_data'), by_type)
+        self.assertIsNotNone(restarted.predict_flower_type([6.7, 3.0, 5.2, 2.3]))
+        restarted.store.close()
+
+    def test_transaction_index_kept_in_binary_section(self):
+        blockchain = self._open()
+        self._mine(blockchain, 4)
+        by_sender = blockchain.find_transactions('sender', 'sender_1')
+        blockchain.store.close()
+
+        _, path = blockchain.checkpoints.checkpoints()[0]
+        metadata, _ = blockchain.checkpoints.load(path)
+        self.assertNotIn('tx_index', metadata['state'])
+        index = TransactionIndex.from_bytes(metadata['sections']['tx_index'])
+        self.assertEqual(index.height, 4)
+        restarted = self._open()
+        self.assertEqual(restarted.find_transactions('sender', 'sender_1'), by_sender)
+        restarted.store.close()
+
+        # A damaged section is rebuilt from the blocks instead
+        with open(path, 'r+b') as f:
+            header = f.readline()
+            start, size = json.loads(header)['sections']['tx_index']
+            f.seek(len(header) + start)
+            f.write(b'\x00' * size)
+        restarted = self._open()
+        self.assertEqual(restarted.find_transactions('sender', 'sender_1'), by_sender)
+        restarted.store.close()
+
+    def test_checkpoint_off_the_chain_is_ignored(self):
+        blockchain = self._open()
+        self._mine(blockchain, 2)
+        data_count = blockchain.ml_model.data_count
+        blockchain.store.close()
+
+        manager = CheckpointManager(self.checkpoint_dir)
+        _, path = manager.checkpoints()[0]
+        os.rename(path, path.replace('model-0000000002-', 'model-0000000001-'))
+
+        restarted = self._open()
+        self.assertEqual(restarted.ml_model.data_count, data_count)
+        restarted.store.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import time
+import unittest
+from src.blockchain import Blockchain
+from src.model_evaluation import EvaluationTracker
+
+class TestEvaluationTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.blockchain = Blockchain(difficulty=1)
+
+    def _wait_for(self, tracker, count):
+        deadline = time.time() + 5
+        while len(tracker.history) < count and time.time() < deadline:
+            time.sleep(0.01)
+        return tracker.entries()
+
+    def test_history_records_new_versions_only(self):
+        tracker = EvaluationTracker(self.blockchain)
+        first = tracker.evaluate()
+        self.assertEqual(tracker.evaluate(), first)
+
+        self.blockchain.add_flower_data("sender", [6.3, 2.9, 5.6, 1.8], "virginica")
+        self.blockchain.add_block(self.blockchain.last_block)
+        tracker.evaluate()
+
+        entries = tracker.entries()
+        self.assertEqual([entry['height'] for entry in entries], [0, 1])
+        self.assertEqual(tracker.entries(start=1), entries[1:])
+
+    def test_background_evaluation_after_blocks(self):
+        tracker = EvaluationTracker(self.blockchain, background=True)
+        try:
+            self._wait_for(tracker, 1)
+            for i in range(2):
+                self.blockchain.add_flower_data(f"sender_{i}", [5.1, 3.5, 1.4, 0.2], "setosa")
+                self.blockchain.add_block(self.blockchain.last_block)
+                self._wait_for(tracker, i + 2)
+            # A block without flower data leaves the model unchanged
+            self.blockchain.add_block(self.blockchain.last_block)
+            time.sleep(0.1)
+        finally:
+            tracker.stop()
+
+        entries = tracker.entries()
+        self.assertEqual([entry['height'] for entry in entries], [0, 1, 2])
+        self.assertEqual(entries[-1]['data_points_trained'], self.blockchain.ml_model.data_count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import asyncio
+import unittest
+from src.blockchain import Blockchain
+from src.networking.node import REQUEST_TIMEOUT, Node, SeenSet
+from src.networking.protocol import ProtocolError
+from src.transaction import Transaction
+
+class TestNode(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.nodes = [Node(Blockchain(difficulty=1)) for _ in range(4)]
+        for node in self.nodes:
+            await node.start()
+        # A ring plus one chord
+        for a, b in [(0, 1), (1, 2), (2, 3), (3, 0), (0, 2)]:
+            self.nodes[a].connect('127.0.0.1', self.nodes[b].port)
+        for node, degree in zip(self.nodes, [3, 2, 3, 2]):
+            await node.wait_for_peers(degree)
+
+    async def asyncTearDown(self):
+        for node in self.nodes:
+            await node.stop()
+
+    async def _until(self, condition, timeout=5.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            self.assertLess(asyncio.get_running_loop().time(), deadline, "condition not reached")
+            await asyncio.sleep(0.01)
+
+    async def test_transaction_and_block_gossip(self):
+        tx = Transaction("alice", "bob", 5)
+        tx_id = tx.tx_id
+        self.nodes[0].blockchain.add_transaction(tx)
+        await self._until(lambda: all(tx_id in node.blockchain.mempool for node in self.nodes))
+
+        # Every other node fetched the body exactly once
+        self.assertEqual([node.received['tx'] for node in self.nodes], [0, 1, 1, 1])
+
+        miner = self.nodes[1].blockchain
+        block = await asyncio.to_thread(miner.add_block, miner.last_block)
+        await self._until(lambda: all(len(node.blockchain.chain) == 2 for node in self.nodes))
+
+        for node in self.nodes:
+            self.assertEqual(node.blockchain.last_block.hash, block.hash)
+            self.assertNotIn(tx_id, node.blockchain.mempool)
+            self.assertLessEqual(node.received['block'], 1)
+        self.assertEqual(self.nodes[1].received['block'], 0)
+
+    async def test_invalid_block_is_not_relayed(self):
+        source = self.nodes[0].blockchain
+        block = await asyncio.to_thread(Blockchain(difficulty=1).add_block, source.last_block)
+        block.hash = '1' * 64
+        with self.assertRaises(ValueError):
+            source.add_external_block(block)
+        self.assertEqual(len(source.chain), 1)
+
+
+    async def test_transient_rejection_not_marked_seen(self):
+        node = self.nodes[0]
+        node.sync.schedule = lambda: None
+        peer = next(iter(node.peers.values()))
+        other = Blockchain(difficulty=1)
+        first = other.add_block(other.last_block)
+        second = other.add_block(other.last_block)
+
+        # Arrives before its parent; it must be accepted once the parent is in
+        await node._handle_block(peer, {'type': 'block', 'block': second.to_dict()})
+        self.assertNotIn(second.hash, node.seen)
+
+        # A body that does not match its id does not condemn the real block
+        forged = first.to_dict()
+        forged['nonce'] += 1
+        await node._handle_block(peer, {'type': 'block', 'block': forged})
+        self.assertNotIn(first.hash, node.seen)
+
+        await node._handle_block(peer, {'type': 'block', 'block': first.to_dict()})
+        await node._handle_block(peer, {'type': 'block', 'block': second.to_dict()})
+        self.assertEqual(node.blockchain.last_block.hash, second.hash)
+        self.assertIn(second.hash, node.seen)
+
+    async def test_malformed_messages_raise_protocol_error(self):
+        node = self.nodes[0]
+        peer = next(iter(node.peers.values()))
+        for message in [
+            {'type': 'inv', 'items': [5]},
+            {'type': 'inv', 'items': 'abc'},
+            {'type': 'getdata', 'items': [['block', 'x', 'not a height']]},
+            {'type': 'tx', 'tx': []},
+            {'type': 'block', 'block': 'abc'},
+            {'type': 'block', 'block': {**node.blockchain.last_block.to_dict(), 'hash': 'x', 'index': 'one'}},
+            {'type': 'getheaders', 'locator': [[1]]},
+            {'type': 'nonsense'},
+        ]:
+            with self.assertRaises(ProtocolError, msg=message):
+                await node._handle(peer, message)
+
+    async def test_unanswered_requests_expire(self):
+        node = self.nodes[0]
+        peer = next(iter(node.peers.values()))
+        peer.send = lambda message: asyncio.sleep(0)
+        await node._handle(peer, {'type': 'inv', 'items': [['tx', 'a' * 64], ['tx', 'b' * 64]]})
+        self.assertEqual(len(node._requested), 2)
+        node._expire_requests(asyncio.get_running_loop().time() + 1000 + REQUEST_TIMEOUT)
+        self.assertEqual(len(node._requested), 0)
+
+class TestChainSync(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        source = Blockchain(difficulty=1)
+        for i in range(30):
+            source.add_flower_data(f"sender_{i}", [5.9, 3.0, 5.1, 1.8], "virginica")
+            source.add_block(source.last_block)
+        self.blocks = list(source.chain)
+        self.nodes = []
+
+    async def asyncTearDown(self):
+        for node in self.nodes:
+            await node.stop()
+
+    async def _node(self, height):
+        blockchain = Blockchain(difficulty=1)
+        for block in self.blocks[1:height + 1]:
+            blockchain.add_external_block(block)
+        node = Node(blockchain)
+        node.sync.window_size = 4
+        await node.start()
+        self.nodes.append(node)
+        return node
+
+    async def test_headers_first_sync_from_several_peers(self):
+        first = await self._node(30)
+        second = await self._node(30)
+        fresh = await self._node(10)
+        # Connected by hand so the test drives the sync itself
+        fresh.sync.schedule = lambda: None
+        fresh.connect('127.0.0.1', first.port)
+        fresh.connect('127.0.0.1', second.port)
+        await fresh.wait_for_peers(2)
+
+        connected = await fresh.sync.sync()
+        self.assertEqual(connected, 20)
+        self.assertEqual(
+            [block.hash for block in fresh.blockchain.chain],
+            [block.hash for block in self.blocks]
+        )
+        self.assertEqual(fresh.blockchain.ml_model.data_count, 120 + 30)
+        # Bodies came from both peers and only the missing ones were fetched
+        self.assertGreater(first.received['getblocks'], 0)
+        self.assertGreater(second.received['getblocks'], 0)
+        self.assertEqual(fresh.received['blocks'], 5)
+        self.assertEqual(await fresh.sync.sync(), 0)
+
+    async def test_sync_reorganizes_onto_heavier_fork(self):
+        source = await self._node(30)
+        forked = await self._node(10)
+        forked.sync.schedule = lambda: None
+        for _ in range(3):
+            forked.blockchain.add_block(forked.blockchain.last_block)
+        forked.connect('127.0.0.1', source.port)
+        await forked.wait_for_peers(1)
+
+        await forked.sync.sync()
+        self.assertEqual(forked.blockchain.last_block.hash, self.blocks[-1].hash)
+        self.assertEqual(len(forked.blockchain.chain), 31)
+
+    async def test_stale_fork_does_not_block_sync(self):
+        stale = await self._node(2)
+        for _ in range(7):
+            stale.blockchain.add_block(stale.blockchain.last_block)
+        honest = await self._node(13)
+        local = await self._node(10)
+        local.sync.schedule = lambda: None
+        local.connect('127.0.0.1', stale.port)
+        local.connect('127.0.0.1', honest.port)
+        await local.wait_for_peers(2)
+
+        # The stale peer sends more headers, but they add less work
+        self.assertEqual(await local.sync.sync(), 3)
+        self.assertEqual(local.blockchain.last_block.hash, self.blocks[13].hash)
+
+    async def test_sync_starts_on_connect(self):
+        source = await self._node(30)
+        fresh = await self._node(0)
+        fresh.connect('127.0.0.1', source.port)
+        deadline = asyncio.get_running_loop().time() + 10
+        while len(fresh.blockchain.chain) < 31:
+            self.assertLess(asyncio.get_running_loop().time(), deadline)
+            await asyncio.sleep(0.01)
+        self.assertEqual(fresh.blockchain.last_block.hash, self.blocks[-1].hash)
+
+
+class TestSeenSet(unittest.TestCase):
+
+    def test_forgets_oldest(self):
+        seen = SeenSet(2)
+        self.assertTrue(seen.add('a'))
+        self.assertFalse(seen.add('a'))
+        seen.add('b')
+        seen.add('c')
+        self.assertNotIn('a', seen)
+        self.assertEqual(len(seen), 2)
+
+if __name__ == '__main__':
+    unittest.main()
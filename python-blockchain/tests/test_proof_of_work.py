@@ -0,0 +1,67 @@
+import unittest
+import time
+from src.block import Block
+from src.consensus.proof_of_work import ProofOfWork
+from src.consensus.difficulty import Retargeter, difficulty_to_target
+
+class TestProofOfWork(unittest.TestCase):
+
+    def setUp(self):
+        self.transactions = [{'sender': 'Alice', 'recipient': 'Bob', 'amount': 10}]
+        self.timestamp = time.time()
+
+    def _new_block(self, difficulty):
+        return Block(1, '0' * 64, self.timestamp, list(self.transactions),
+                     target=difficulty_to_target(difficulty))
+
+    def test_serial_mine(self):
+        pow = ProofOfWork(difficulty=2)
+        block = self._new_block(2)
+        block_hash = pow.mine(block)
+        self.assertTrue(block_hash.startswith('00'))
+        self.assertEqual(block_hash, block.calculate_hash())
+        self.assertTrue(pow.validate(block))
+
+    def test_parallel_mine_matches_serial(self):
+        serial_block = self._new_block(3)
+        serial_hash = ProofOfWork(difficulty=3).mine(serial_block)
+
+        pow = ProofOfWork(difficulty=3, workers=2)
+        pow._miner.chunk_size = 500
+        try:
+            parallel_block = self._new_block(3)
+            parallel_hash = pow.mine(parallel_block)
+        finally:
+            pow.close()
+
+        self.assertEqual(parallel_block.nonce, serial_block.nonce)
+        self.assertEqual(parallel_hash, serial_hash)
+        self.assertGreater(pow.last_hashrate, 0)
+
+    def test_target_is_numeric(self):
+        pow = ProofOfWork(difficulty=2)
+        block = self._new_block(2)
+        # A target between two whole hex digits of difficulty
+        block.target = difficulty_to_target(2) // 3
+        pow.mine(block)
+        self.assertLessEqual(int(block.hash, 16), block.target)
+        self.assertTrue(pow.validate(block))
+        self.assertTrue(pow.validate_header(block.header_dict()))
+        self.assertEqual(pow.work(difficulty_to_target(2)), 16 ** 2)
+
+    def test_retarget_adjust(self):
+        retarget = Retargeter(block_time=10, interval=5)
+        target = difficulty_to_target(3)
+        self.assertIsNone(retarget.window_start(4))
+        self.assertIsNone(retarget.window_start(5))
+        self.assertEqual(retarget.window_start(10), 4)
+        # On schedule the target is unchanged; twice as slow doubles it
+        self.assertEqual(retarget.adjust(target, 50), target)
+        self.assertEqual(retarget.adjust(target, 100), target * 2)
+        # Changes are clamped to a factor of four
+        self.assertEqual(retarget.adjust(target, 1), target // 4)
+        self.assertEqual(retarget.adjust(target, 10000), target * 4)
+        self.assertIsNone(Retargeter().window_start(100))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import shutil
+import tempfile
+import threading
+import unittest
+import numpy as np
+from src.blockchain import Blockchain
+from src.storage.block_store import BlockStore
+from src.transaction import Transaction
+
+class TestReorganization(unittest.TestCase):
+
+    def setUp(self):
+        self.local = Blockchain(difficulty=1)
+        self.remote = Blockchain(difficulty=1)
+        shared = self.remote.add_block(self.remote.last_block, miner_address="remote")
+        self.local.add_external_block(shared)
+
+    def _mine(self, blockchain, miner, flowers):
+        for features, label in flowers:
+            blockchain.add_flower_data(miner, features, label)
+        return blockchain.add_block(blockchain.last_block, miner_address=miner)
+
+    def _assert_same_state(self, a, b):
+        self.assertEqual([block.hash for block in a.chain], [block.hash for block in b.chain])
+        np.testing.assert_array_equal(a.ml_model.X, b.ml_model.X)
+        np.testing.assert_array_equal(a.ml_model.y, b.ml_model.y)
+        np.testing.assert_allclose(a.ml_model.scaler.mean_, b.ml_model.scaler.mean_)
+        np.testing.assert_allclose(a.ml_model.scaler.var_, b.ml_model.scaler.var_)
+        self.assertEqual(a.ml_model.data_count, b.ml_model.data_count)
+        for address in ("local", "remote", "alice"):
+            self.assertEqual(a.balance(address)['balance'], b.balance(address)['balance'])
+        for kind, key in [('sender', 'local'), ('sender', 'remote'), ('type', 'flower_data'),
+                          ('sender_type', 'flower_data:local')]:
+            self.assertEqual(a.find_transactions(kind, key), b.find_transactions(kind, key))
+
+    def test_heavier_branch_wins(self):
+        orphaned = []
+        for i in range(2):
+            self._mine(self.local, "local", [([6.0 + i, 3.0, 4.8, 1.8], "virginica")])
+            orphaned.append(self.local.last_block)
+        self.local.add_transaction(Transaction("local", "alice", 1))
+        self._mine(self.local, "local", [])
+        pending_transfer = self.local.find_transactions('recipient', 'alice')['transactions'][0]
+
+        branch = [
+            self._mine(self.remote, "remote", [([5.0, 3.4, 1.5, 0.2], "setosa")]),
+            self._mine(self.remote, "remote", [([5.9, 2.8, 4.3, 1.3], "versicolor")]),
+            self._mine(self.remote, "remote", []),
+            self._mine(self.remote, "remote", [([5.1, 3.5, 1.4, 0.3], "setosa")]),
+        ]
+        results = [self.local.add_external_block(block) for block in branch]
+        # Equal work does not displace the current tip
+        self.assertEqual(results, [False, False, False, True])
+
+        self._assert_same_state(self.local, self.remote)
+        # Transactions of the abandoned blocks are pending again
+        pending_ids = {tx['id'] for tx in self.local.current_transactions}
+        for block in orphaned:
+            self.assertIn(block.transactions[1]['id'], pending_ids)
+        self.assertIn(pending_transfer['transaction']['id'], pending_ids)
+        self.assertEqual(self.local.accounts.pending("local"), 1)
+        self.assertTrue(self.local.validate_chain())
+
+    def test_branch_failing_part_way_is_rolled_back(self):
+        self._mine(self.local, "local", [([6.1, 3.0, 4.9, 1.8], "virginica")])
+        tip = self.local.last_block.hash
+        data_count = self.local.ml_model.data_count
+        branch = [self._mine(self.remote, "remote", [([5.0, 3.4, 1.5, 0.2], "setosa")]) for _ in range(2)]
+
+        apply_block = self.local.accounts.apply_block
+
+        def fail_on_last(block):
+            if block.hash == branch[-1].hash:
+                raise TypeError("unexpected failure")
+            return apply_block(block)
+
+        self.local.accounts.apply_block = fail_on_last
+        self.assertFalse(self.local.add_external_block(branch[0]))
+        with self.assertRaises(TypeError):
+            self.local.add_external_block(branch[1])
+
+        self.assertEqual(len(self.local.chain), 3)
+        self.assertEqual(self.local.last_block.hash, tip)
+        self.assertEqual(self.local.ml_model.data_count, data_count)
+        self.assertEqual(self.local.find_transactions('sender', 'remote')['total'], 0)
+        self.assertTrue(self.local.validate_chain(full=True))
+
+    def test_reorg_back_to_abandoned_branch(self):
+        self._mine(self.local, "local", [([6.1, 3.0, 4.9, 1.8], "virginica")])
+        abandoned = self.local.last_block
+        for _ in range(2):
+            self.local.add_external_block(self._mine(self.remote, "remote", []))
+        self.assertEqual(self.local.chain[2].hash, self.remote.chain[2].hash)
+
+        # The old branch is kept and can become the heaviest again
+        other = Blockchain(difficulty=1)
+        other.add_external_block(self.local.chain[1])
+        other.add_external_block(abandoned)
+        results = [self.local.add_external_block(self._mine(other, "other", [])) for _ in range(2)]
+        self.assertEqual(results, [False, True])
+        self._assert_same_state(self.local, other)
+
+    def test_fork_below_window_is_refused(self):
+        local = Blockchain(difficulty=1, max_reorg_depth=2)
+        for _ in range(4):
+            local.add_block(local.last_block)
+        with self.assertRaises(ValueError):
+            local.add_external_block(self.remote.add_block(self.remote.last_block))
+
+    def test_reorg_with_block_store(self):
+        directory = tempfile.mkdtemp()
+        try:
+            local = Blockchain(difficulty=1, store=BlockStore(directory, segment_size=512))
+            local.add_external_block(self.remote.chain[1])
+            for _ in range(2):
+                self._mine(local, "local", [([6.3, 3.3, 6.0, 2.5], "virginica")])
+            for _ in range(3):
+                local.add_external_block(self._mine(self.remote, "remote", []))
+            self._assert_same_state(local, self.remote)
+            local.store.close()
+
+            restarted = Blockchain(difficulty=1, store=BlockStore(directory, segment_size=512))
+            self.assertEqual(len(restarted.chain), len(self.remote.chain))
+            self.assertEqual(restarted.last_block.hash, self.remote.last_block.hash)
+            restarted.store.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_reads_during_reorgs(self):
+        directory = tempfile.mkdtemp()
+        try:
+            local = Blockchain(difficulty=1, store=BlockStore(directory, segment_size=256))
+            # A tiny block cache so reads go to the store
+            local.chain.cache_size = 2
+            local.add_external_block(self.remote.chain[1])
+            other = Blockchain(difficulty=1)
+            other.add_external_block(self.remote.chain[1])
+
+            errors = []
+            stop = threading.Event()
+
+            def read():
+                while not stop.is_set():
+                    try:
+                        headers = local.headers(0, 100)
+                        for parent, header in zip(headers, headers[1:]):
+                            self.assertEqual(header['previous_hash'], parent['hash'])
+                        local.locator()
+                        local.chain_work()
+                    except Exception as e:
+                        errors.append(e)
+                        return
+
+            reader = threading.Thread(target=read)
+            reader.start()
+            try:
+                # Each round the other branch pulls ahead by one block
+                for _ in range(4):
+                    for chain in (self.remote, other):
+                        while len(chain.chain) <= len(local.chain):
+                            chain.add_block(chain.last_block)
+                        for block in chain.chain[2:]:
+                            local.add_external_block(block)
+            finally:
+                stop.set()
+                reader.join()
+            self.assertEqual(errors, [])
+            self.assertTrue(local.validate_chain(full=True))
+            local.store.close()
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,5 +21,45 @@ class TestTransaction(unittest.TestCase):
         invalid_transaction = Transaction(self.sender, self.recipient, -10)
         self.assertFalse(invalid_transaction.validate())
 
+    def test_amount_and_fee_must_be_numbers(self):
+        for amount, fee in [("50", 0), (50, "1"), (True, 0), (50, None), (float("nan"), 0)]:
+            self.assertFalse(Transaction(self.sender, self.recipient, amount, fee=fee).validate())
+
+    def test_validate_flower_batch_matches_single_validation(self):
+        transactions = [
+            Transaction.create_flower_data_transaction("Alice", [5.1, 3.5, 1.4, 0.2], "setosa"),
+            Transaction.create_flower_data_transaction("Alice", ["6.1", 2.8, 4.7, 1.2], "versicolor"),
+            Transaction.create_flower_data_transaction("Alice", [5.1, "wide", 1.4, 0.2], "setosa"),
+            Transaction.create_flower_data_transaction("Alice", [5.1, None, 1.4, 0.2], "setosa"),
+            Transaction.create_flower_data_transaction("", [5.1, 3.5, 1.4, 0.2], "setosa"),
+            Transaction.create_flower_data_transaction("Alice", [5.1, 3.5, 1.4, 0.2], "rose"),
+            Transaction.create_flower_data_transaction("Alice", [[5.1], [3.5], [1.4], [0.2]], "setosa"),
+            Transaction.create_flower_data_transaction("Alice", [5.1, {"cm": 3.5}, 1.4, 0.2], "setosa"),
+            Transaction.create_flower_data_transaction("Alice", [True, 3.5, 1.4, float("nan")], "setosa"),
+        ]
+        self.assertEqual(
+            Transaction.validate_flower_batch(transactions),
+            [tx.validate() for tx in transactions]
+        )
+        self.assertEqual(Transaction.validate_flower_batch([]), [])
+
+        # Plain numbers take the vectorized path, which must agree as well
+        plain = [
+            Transaction.create_flower_data_transaction("Alice", [5.1, 3.5, 1.4, 0.2], "setosa"),
+            Transaction.create_flower_data_transaction("Alice", [5.1, float("inf"), 1.4, 0.2], "setosa"),
+        ]
+        self.assertEqual(Transaction.validate_flower_batch(plain), [True, False])
+
+    def test_from_dict_round_trip(self):
+        transaction = Transaction(self.sender, self.recipient, 10, fee=1)
+        data = transaction.to_dict()
+        self.assertEqual(Transaction.from_dict(data).to_dict(), data)
+
+        data['amount'] = 20
+        with self.assertRaises(ValueError):
+            Transaction.from_dict(data)
+        with self.assertRaises(ValueError):
+            Transaction.from_dict({'sender': self.sender})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
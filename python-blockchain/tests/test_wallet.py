@@ -0,0 +1,136 @@
+import unittest
+from src.blockchain import Blockchain
+from src.block import Block
+from src.signature_verifier import SignatureVerifier
+from src.transaction import Transaction
+from src.utils.crypto import load_public_key
+from src.wallet import Wallet
+
+class TestWallet(unittest.TestCase):
+
+    def setUp(self):
+        self.wallet = Wallet()
+
+    def test_sign_and_verify(self):
+        transaction = self.wallet.create_transaction("Bob", 5)
+        self.assertTrue(transaction.verify_signature())
+        self.assertTrue(self.wallet.validate_signature(transaction, transaction.signature))
+
+        restored = Transaction.from_dict(transaction.to_dict())
+        self.assertTrue(restored.verify_signature())
+        self.assertEqual(restored.tx_id, transaction.tx_id)
+
+    def test_restore_from_private_key(self):
+        restored = Wallet(self.wallet.private_key)
+        self.assertEqual(restored.public_key, self.wallet.public_key)
+        self.assertEqual(restored.address, self.wallet.address)
+
+    def test_tampering_breaks_signature(self):
+        transaction = self.wallet.create_transaction("Bob", 5)
+        transaction.amount = 500
+        self.assertFalse(transaction.verify_signature())
+
+        # A valid signature by another key does not cover the sender
+        other = Wallet()
+        forged = Transaction(self.wallet.address, "Mallory", 5)
+        forged.sign(other.private_key, other.public_key)
+        self.assertFalse(forged.verify_signature())
+        with self.assertRaises(ValueError):
+            other.sign_transaction(Transaction(self.wallet.address, "Mallory", 5))
+
+    def test_public_keys_are_cached(self):
+        load_public_key.cache_clear()
+        for _ in range(3):
+            self.wallet.create_transaction("Bob", 1).verify_signature()
+        info = load_public_key.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 2)
+
+class TestSignatureVerifier(unittest.TestCase):
+
+    def test_batch_with_pool_and_cache(self):
+        wallets = [Wallet() for _ in range(3)]
+        transactions = [wallets[i % 3].create_transaction("Bob", i + 1) for i in range(12)]
+        transactions[5].amount = 1000
+        transactions.append(Transaction("Alice", "Bob", 1))
+
+        verifier = SignatureVerifier(workers=2, chunk_size=4)
+        try:
+            expected = [i != 5 for i in range(12)] + [False]
+            self.assertEqual(verifier.verify(transactions), expected)
+            self.assertEqual(verifier.checked, 12)
+            # Verified ids are not checked again
+            self.assertEqual(verifier.verify(transactions), expected)
+            self.assertEqual(verifier.hits, 11)
+            self.assertEqual(verifier.checked, 13)
+        finally:
+            verifier.close()
+
+class TestSignedTransactions(unittest.TestCase):
+
+    def setUp(self):
+        self.wallet = Wallet()
+
+    def test_signatures_checked_when_present(self):
+        blockchain = Blockchain(difficulty=1)
+        transaction = self.wallet.create_transaction("Bob", 5)
+        tampered = self.wallet.create_transaction("Bob", 6)
+        tampered.fee = 1
+        results = blockchain.add_transactions([transaction, tampered, Transaction("Alice", "Bob", 1)])
+        self.assertEqual([error for _, error in results], [None, "Invalid signature", None])
+
+    def test_required_signatures(self):
+        blockchain = Blockchain(difficulty=1, require_signatures=True)
+        with self.assertRaises(ValueError):
+            blockchain.add_transaction(Transaction("Alice", "Bob", 1))
+        blockchain.add_transaction(self.wallet.create_transaction("Bob", 5))
+        block = blockchain.add_block(blockchain.last_block)
+        self.assertEqual(len(block.transactions), 1)
+
+        # Blocks from elsewhere are held to the same rule
+        remote = Blockchain(difficulty=1)
+        remote.add_transaction(Transaction("Alice", "Bob", 1))
+        with self.assertRaises(ValueError):
+            blockchain.add_external_block(remote.add_block(remote.last_block))
+
+    def test_wallet_addresses_always_need_signatures(self):
+        blockchain = Blockchain(difficulty=1)
+        results = blockchain.add_transactions([Transaction(self.wallet.address, "Mallory", 5),
+                                               Transaction("Alice", "Bob", 1)])
+        self.assertEqual([error for _, error in results], ["Missing signature", None])
+
+        remote = Blockchain(difficulty=1)
+        remote.mempool.add(Transaction(self.wallet.address, "Mallory", 5).to_dict())
+        with self.assertRaises(ValueError):
+            blockchain.add_external_block(remote.add_block(remote.last_block))
+
+    def test_block_with_forged_signature_rejected(self):
+        blockchain = Blockchain(difficulty=1)
+        forged = self.wallet.create_transaction("Bob", 5).to_dict()
+        forged['amount'] = 50
+        forged.pop('id')
+        block = Block(1, blockchain.last_block.hash, blockchain.last_block.timestamp + 1, [forged],
+                      target=blockchain.next_target(blockchain.last_block))
+        blockchain.pow.mine(block)
+        with self.assertRaises(ValueError):
+            blockchain.add_external_block(block)
+
+    def test_confirmed_transaction_not_replayed(self):
+        blockchain = Blockchain(difficulty=1)
+        transaction = self.wallet.create_transaction("Bob", 5)
+        blockchain.add_transaction(transaction)
+        blockchain.add_block(blockchain.last_block)
+
+        replay = Transaction.from_dict(transaction.to_dict())
+        self.assertEqual(blockchain.add_transactions([replay]), [(None, "Transaction already confirmed")])
+
+        # Nor can a peer's block carry it again
+        block = Block(2, blockchain.last_block.hash, blockchain.last_block.timestamp + 1, [transaction.to_dict()],
+                      target=blockchain.next_target(blockchain.last_block))
+        blockchain.pow.mine(block)
+        with self.assertRaises(ValueError):
+            blockchain.add_external_block(block)
+        self.assertEqual(len(blockchain.chain), 2)
+
+if __name__ == '__main__':
+    unittest.main()